@@ -3,6 +3,14 @@ import sys
 import google.generativeai as genai
 from dotenv import load_dotenv
 
+# Shared helpers (llm_coalesce) live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fake_llm
+import llm_hedge
+from llm_coalesce import coalesced_call, coalesced_stream
+from llm_metrics import gemini_usage, track, tracked_stream
+from rego_stream import extract_rego_code, stream_rego
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -34,32 +42,95 @@ def generate_rego_policy(user_prompt: str):
 
     try:
         # Initialize the generative model
-        model = genai.GenerativeModel('gemini-1.5-flash')
+        provider, model_name = 'gemini', 'gemini-1.5-flash'
+        model = fake_llm.generative_model(genai, model_name)
         
         # Combine the system prompt and user prompt
         full_prompt = f"{SYSTEM_PROMPT}\n\nUser Request: {user_prompt}"
         
-        # Generate content
-        response = model.generate_content(full_prompt)
-        
-        # Extract the generated code from the LLM's response
-        llm_response = response.text
-        
-        # Use simple string manipulation to get the Rego code block
-        rego_code_start = llm_response.find("```rego") + len("```rego")
-        rego_code_end = llm_response.rfind("```")
-        rego_code = llm_response[rego_code_start:rego_code_end].strip()
+        def generate():
+            with track("rego_bot", "gemini", model_name) as call:
+                response = model.generate_content(full_prompt)
+                call.set_usage(*gemini_usage(response))
+            return response.text
+
+        if llm_hedge.enabled():
+            # LLM_HEDGE_PROVIDERS is set: race the providers on first-token deadlines instead
+            provider = model_name = "hedge"
+            generate = lambda: llm_hedge.hedge_policy("rego_bot").generate(full_prompt)[0]
+
+        # Generate content; identical requests already in flight share that call
+        with track("rego_bot", provider, model_name, kind="request") as request_call:
+            llm_response = coalesced_call(full_prompt, model_name, request_call.wrap(generate))
         
+        # Pull the Rego code block(s) out of the answer; a missing block is an error, not a guess
+        rego_code, problems = extract_rego_code(llm_response)
+        if not rego_code:
+            return {"error": " ".join(problems)}
+
         response = {
             "rego_code": rego_code
         }
-        
+        if problems:
+            response["warnings"] = problems
+
         return response
 
     except Exception as e:
         # General error handling
         return {"error": str(e)}
 
+def stream_rego_policy(user_prompt: str):
+    """
+    Yields the LLM's response text as it arrives. Identical requests already streaming
+    share that stream.
+    """
+    model_name = 'gemini-1.5-flash'
+    model = fake_llm.generative_model(genai, model_name)
+    full_prompt = f"{SYSTEM_PROMPT}\n\nUser Request: {user_prompt}"
+    def generate():
+        with track("rego_bot", "gemini", model_name, prompt=full_prompt) as call:
+            yield from tracked_stream((chunk.text for chunk in model.generate_content(full_prompt, stream=True)), call)
+
+    return coalesced_stream(full_prompt, model_name, generate)
+
+def print_rego_policy(user_prompt: str):
+    """
+    Streams the policy to the terminal: Rego lines are printed as soon as the model has
+    written them, and a missing or unterminated code block is reported as an error.
+    With LLM_HEDGE_PROVIDERS set, the hedged answer is printed once it has won instead.
+    """
+    print("Generating policy...")
+    if llm_hedge.enabled():
+        # The hedge picks the first provider to return a valid Rego block, so print its answer whole
+        result = generate_rego_policy(user_prompt)
+        if "error" in result:
+            print(f"\nError: {result['error']}")
+        else:
+            print("\n--- Generated Rego Policy ---")
+            print(result["rego_code"])
+            for warning in result.get("warnings", []):
+                print(f"Warning: {warning}")
+        print("\n")
+        return
+    prose, printed = [], False
+    try:
+        for event in stream_rego(stream_rego_policy(user_prompt)):
+            if event.kind == "open":
+                print("\n--- Generated Rego Policy ---" if not printed else "")
+                printed = True
+            elif event.kind == "line":
+                print(event.text, flush=True)
+            elif event.kind == "prose" and event.text.strip():
+                prose.append(event.text.strip())
+            elif event.kind == "error":
+                print(f"\nError: {event.text}")
+                if not printed and prose:
+                    print("Model said: " + " ".join(prose))
+    except Exception as e:
+        print(f"Error: {e}")
+    print("\n")
+
 def main():
     """
     Main function to run the Rego policy generator.
@@ -68,15 +139,7 @@ def main():
     if len(sys.argv) > 1:
         # Command-line argument mode
         user_prompt = " ".join(sys.argv[1:])
-        print("Generating policy...")
-        result = generate_rego_policy(user_prompt)
-
-        if "error" in result:
-            print(f"Error: {result['error']}")
-        else:
-            print("\n--- Generated Rego Policy ---")
-            print(result["rego_code"])
-            print("\n")
+        print_rego_policy(user_prompt)
     else:
         # Interactive mode
         print("Rego Policy Generator")
@@ -88,15 +151,7 @@ def main():
                 if user_prompt.lower() == 'exit':
                     break
 
-                print("Generating policy...")
-                result = generate_rego_policy(user_prompt)
-
-                if "error" in result:
-                    print(f"Error: {result['error']}")
-                else:
-                    print("\n--- Generated Rego Policy ---")
-                    print(result["rego_code"])
-                    print("\n")
+                print_rego_policy(user_prompt)
             except EOFError:
                 print("\n\nThis environment does not support interactive input. Please run the script with a command-line argument:")
                 print("python rego_bot.py \"<your policy request>\"")
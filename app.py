@@ -1,9 +1,11 @@
 # app.py
-from flask import Flask, render_template, request, jsonify, session
-import pandas as pd
+from flask import Flask, Response, render_template, request, jsonify, session, url_for
 import re
 import os
 import secrets # For generating a strong secret key
+from dataset_registry import DatasetRegistry
+from consistency_bundle import bundle_files, compile_consistency, render_bundle_text
+from policy_archive import FORMATS, stream_archive
 
 app = Flask(__name__)
 
@@ -12,24 +14,35 @@ app = Flask(__name__)
 # In a production environment, this should be loaded from an environment variable
 # or a secure configuration file, NOT hardcoded.
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', secrets.token_hex(16))
+# Policies larger than this are offered as a download (see /download) instead of chat text
+POLICY_INLINE_BYTES = int(os.environ.get('POLICY_INLINE_BYTES', 64 * 1024))
 
-# --- Data Loading ---
-# Load the CSV data. Ensure 'master.csv' is in the same directory as app.py
+# --- Datasets ---
+# Rule sheets are served from the dataset registry (datasets.json, see dataset_registry.py);
+# without a config it holds just master.csv and the metamodel_index.json hierarchy. Each
+# dataset is loaded, with its precomputed lookups, on first use and evicted LRU under the
+# memory budget. The default one is loaded at import, so under serve.py the master process
+# loads it before forking and the workers share it copy-on-write.
+registry = DatasetRegistry.from_config()
 try:
-    df = pd.read_csv('master.csv')
-    # Convert relevant columns to string type to avoid errors with .str.contains()
-    # if they contain non-string data (e.g., numbers, NaN).
-    df['MO Type'] = df['MO Type'].astype(str)
-    df['Checking Attribute'] = df['Checking Attribute'].astype(str)
-    print("master.csv loaded successfully.")
+    default_dataset = registry.get()
+    print(f"Dataset '{default_dataset.key}' loaded successfully ({len(default_dataset.df)} rows).")
+    if default_dataset.hierarchy is not None:
+        print(f"Metamodel hierarchy index loaded ({len(default_dataset.hierarchy)} types).")
 except FileNotFoundError:
-    df = pd.DataFrame(columns=['MO Type', 'Checking Attribute']) # Create a DataFrame with expected columns
-    print("master.csv not found. Starting with an empty DataFrame.")
+    print(f"{registry.entries[registry.default]['path']} not found. It will be loaded on first use.")
 except Exception as e:
-    df = pd.DataFrame(columns=['MO Type', 'Checking Attribute'])
-    print(f"Error loading master.csv: {e}. Starting with an empty DataFrame.")
+    print(f"Error loading dataset '{registry.default}': {e}. It will be retried on first use.")
 
-def process_user_query(query):
+def current_dataset():
+    """The dataset picked by this chat session (the registry default until one is chosen)."""
+    return registry.get(session.get('dataset'))
+
+def clear_conversation():
+    for key in ('awaiting_filter_value', 'filter_by', 'clarification_needed', 'filter'):
+        session.pop(key, None)
+
+def process_user_query(query, dataset):
     intent = None
     entities = {}
 
@@ -45,35 +58,140 @@ def process_user_query(query):
         entities['checking_attribute'] = True
 
     # Try to extract specific values for MO Type or Checking Attribute
-    for col_name in df.columns:
-        if col_name.lower() == 'mo type':
-            for unique_val in df[col_name].dropna().unique():
-                if re.search(r'\b' + re.escape(unique_val.lower()) + r'\b', query.lower()):
-                    entities['mo_type_value'] = unique_val
-                    break
-        elif col_name.lower() == 'checking attribute':
-            for unique_val in df[col_name].dropna().unique():
-                if re.search(r'\b' + re.escape(unique_val.lower()) + r'\b', query.lower()):
-                    entities['checking_attribute_value'] = unique_val
-                    break
+    query_lower = query.lower()
+    for unique_val, pattern in dataset.mo_type_patterns:
+        if pattern.search(query_lower):
+            entities['mo_type_value'] = unique_val
+            break
+    for unique_val, pattern in dataset.checking_attribute_patterns:
+        if pattern.search(query_lower):
+            entities['checking_attribute_value'] = unique_val
+            break
+
+    # Parent MO Types (e.g. ENODEBFUNCTION) may not appear in the rule sheet themselves
+    hierarchy = dataset.hierarchy
+    if 'mo_type_value' not in entities and hierarchy is not None:
+        for word in re.findall(r'[A-Za-z][A-Za-z0-9_]*', query):
+            if word.lower() not in rego_keywords and word in hierarchy:
+                entities['mo_type_value'] = hierarchy.resolve(word)
+                break
 
     return intent, entities
 
+# --- Policy output ---
+def filter_rows(dataset, filter_by, filter_value):
+    """The rule rows matching a filter, or None for an unknown filter type."""
+    df = dataset.df
+    if filter_by == 'mo type':
+        return df[dataset.mo_type_mask(filter_value)]
+    if filter_by == 'checking attribute':
+        return df[dataset.checking_attribute_mask(filter_value)]
+    if filter_by == 'both':
+        return df[dataset.mo_type_mask(filter_value) | dataset.checking_attribute_mask(filter_value)]
+    return None
+
+def package_name(mo_type):
+    return f"ericsson.consistency.{mo_type.lower().replace(' ', '_')}"
+
+def render_rule_policy(rows):
+    """One package and allow rule per row, as shown in the chat."""
+    rego_policy = "# Rego Policy Generated\n\n"
+    for row in rows:
+        mo_type = row.get('MO Type', 'N/A')
+        checking_attribute = row.get('Checking Attribute', 'N/A')
+        rego_policy += f"package {package_name(mo_type)}\n\n"
+        rego_policy += f"default allow = false\n\n"
+        rego_policy += f"allow {{\n"
+        rego_policy += f"    input.mo_type == \"{mo_type}\"\n"
+        rego_policy += f"    input.checking_attribute == \"{checking_attribute}\"\n"
+        rego_policy += f"}}\n\n"
+    return rego_policy
+
+def rule_package_files(rows):
+    """
+    Yields (path, text) per package for the download: every row with the same MO Type
+    becomes an allow rule under one package line, rendered when the archive asks for it.
+    """
+    packages = {}
+    for row in rows:
+        packages.setdefault(str(row.get('MO Type', 'N/A')), []).append(str(row.get('Checking Attribute', 'N/A')))
+    for mo_type, attributes in packages.items():
+        package = package_name(mo_type)
+        lines = [f"package {package}", "", "default allow = false", ""]
+        for checking_attribute in dict.fromkeys(attributes):
+            lines += ["allow {", f'    input.mo_type == "{mo_type}"',
+                      f'    input.checking_attribute == "{checking_attribute}"', "}", ""]
+        yield re.sub(r'[^a-z0-9_.]', '_', package).replace('.', '/') + '.rego', "\n".join(lines)
+
+def policy_reply(response_message, rego_policy, kind, rows):
+    """The policy inline, or above POLICY_INLINE_BYTES a summary with links to /download."""
+    size = len(rego_policy.encode('utf-8'))
+    if size <= POLICY_INLINE_BYTES:
+        return jsonify({'response': response_message, 'rego_policy': rego_policy})
+    filter_by, filter_value = session['filter']
+    links = {archive_format: url_for('download', kind=kind, format=archive_format, filter_by=filter_by,
+                                     value=filter_value, dataset=session.get('dataset', registry.default))
+             for archive_format in FORMATS}
+    mo_types = len({row.get('MO Type') for row in rows})
+    what = 'one .rego file per package' if kind == 'rules' else 'policy.rego, data.json and .manifest'
+    summary = (f"The policy covers {len(rows)} rows across {mo_types} MO Type(s) and is {size / 1024:.0f} KB, "
+               f"too large to show here. Download it as an archive with {what}.")
+    return jsonify({'response': summary, 'download': links, 'size': size})
+
 @app.route('/')
 def index():
     """Renders the main chat interface."""
     return render_template('index.html')
 
+@app.route('/ready')
+def ready():
+    """Readiness probe: 200 once the default dataset is loaded, 503 otherwise."""
+    try:
+        dataset = registry.get()
+    except Exception:
+        dataset = None
+    is_ready = dataset is not None and dataset.ready
+    status = {'ready': is_ready, 'dataset': registry.default, 'rows': len(dataset.df) if dataset is not None else 0,
+              'hierarchy': dataset is not None and dataset.hierarchy is not None, 'pid': os.getpid()}
+    return jsonify(status), 200 if is_ready else 503
+
+@app.route('/datasets')
+def datasets():
+    """Lists the configured datasets, which are loaded and which one this session uses."""
+    return jsonify({'datasets': registry.describe(), 'selected': session.get('dataset', registry.default)})
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """Handles incoming chat messages and directs the conversation flow."""
     user_message = request.json.get('message', '').strip()
     response = ""
 
+    # Dataset selection: a 'dataset' field in the request, or "use dataset <name[@version]>"
+    requested = request.json.get('dataset')
+    switch = re.match(r'^use dataset\s+(\S+)$', user_message, re.IGNORECASE)
+    if switch:
+        requested = switch.group(1)
+    if requested:
+        try:
+            key = registry.resolve(requested)
+        except KeyError as e:
+            return jsonify({'response': str(e.args[0])})
+        if key != session.get('dataset', registry.default):
+            clear_conversation()
+        session['dataset'] = key
+        if switch:
+            return jsonify({'response': f"Using dataset '{key}'.", 'dataset': key})
+
     if not user_message:
         return jsonify({'response': "Please type a message."})
 
-    intent, entities = process_user_query(user_message)
+    try:
+        dataset = current_dataset()
+    except Exception as e:
+        return jsonify({'response': f"Dataset '{session.get('dataset', registry.default)}' could not be loaded: {e}"})
+    df = dataset.df
+
+    intent, entities = process_user_query(user_message, dataset)
 
     # State 1: Awaiting filter value after clarification
     if session.get('awaiting_filter_value'):
@@ -82,21 +200,14 @@ def chat():
         session.pop('awaiting_filter_value')
         session.pop('filter_by') # Clear filter_by after use
 
-        if filter_by == 'mo type':
-            filtered_df = df[df['MO Type'].str.contains(filter_value, case=False, na=False)]
-        elif filter_by == 'checking attribute':
-            filtered_df = df[df['Checking Attribute'].str.contains(filter_value, case=False, na=False)]
-        elif filter_by == 'both':
-            filtered_df = df[
-                df['MO Type'].str.contains(filter_value, case=False, na=False) |
-                df['Checking Attribute'].str.contains(filter_value, case=False, na=False)
-            ]
-        else:
+        filtered_df = filter_rows(dataset, filter_by, filter_value)
+        if filtered_df is None:
             return jsonify({'response': 'No filter criteria specified.'})
 
         if not filtered_df.empty:
-            session['filtered_data'] = filtered_df.to_dict(orient='records')
-            return jsonify({'response': 'Filtered data found. Now I can generate the Rego policy. Would you like to generate it?'})
+            # Keep the filter, not the rows: the cookie session cannot hold large results
+            session['filter'] = [filter_by, filter_value]
+            return jsonify({'response': "Filtered data found. Now I can generate the Rego policy. Would you like to generate it? (Reply 'yes' for one rule per row, or 'bundle' for a data.json + policy.rego bundle.)"})
         else:
             return jsonify({'response': 'No data found matching your criteria. Please try again.'})
 
@@ -130,13 +241,11 @@ def chat():
 
         suggestions = []
         if user_message.lower() == 'mo type':
-            suggestions = df['MO Type'].dropna().unique().tolist()
+            suggestions = list(dataset.mo_types)
         elif user_message.lower() == 'checking attribute':
-            suggestions = df['Checking Attribute'].dropna().unique().tolist()
+            suggestions = list(dataset.checking_attributes)
         elif user_message.lower() == 'both':
-            mo_type_suggestions = df['MO Type'].dropna().unique().tolist()
-            checking_attribute_suggestions = df['Checking Attribute'].dropna().unique().tolist()
-            suggestions = list(set(mo_type_suggestions + checking_attribute_suggestions))
+            suggestions = list(set(dataset.mo_types + dataset.checking_attributes))
 
         response_message = f'You selected to filter by {user_message}. Please provide the value for {user_message}.'
         if suggestions:
@@ -145,27 +254,65 @@ def chat():
         return jsonify({'response': response_message})
     
     # State 4: User confirms Rego generation
-    elif user_message.lower() == 'yes' and session.get('filtered_data'):
+    elif user_message.lower() == 'yes' and session.get('filter'):
         # Directly call generate_rego logic here instead of redirecting
-        if 'filtered_data' in session and session['filtered_data']:
-            rego_policy = "# Rego Policy Generated\n\n"
-            for row in session['filtered_data']:
-                mo_type = row.get('MO Type', 'N/A')
-                checking_attribute = row.get('Checking Attribute', 'N/A')
-                rego_policy += f"package ericsson.consistency.{mo_type.lower().replace(' ', '_')}\n\n"
-                rego_policy += f"default allow = false\n\n"
-                rego_policy += f"allow {{\n"
-                rego_policy += f"    input.mo_type == \"{mo_type}\"\n"
-                rego_policy += f"    input.checking_attribute == \"{checking_attribute}\"\n"
-                rego_policy += f"}}\n\n"
-            session.pop('filtered_data', None) # Clear filtered data after generation
-            return jsonify({'response': 'Here is your Rego policy:', 'rego_policy': rego_policy})
+        rows = filter_rows(dataset, *session['filter']).to_dict(orient='records')
+        if rows:
+            reply = policy_reply('Here is your Rego policy:', render_rule_policy(rows), 'rules', rows)
+            session.pop('filter', None) # Clear the filter after generation
+            return reply
         else:
             return jsonify({'response': 'No filtered data available to generate Rego policy.'})
 
+    # State 4b: User asks for the lookup-table bundle instead of per-row rules
+    elif user_message.lower() == 'bundle' and session.get('filter'):
+        filtered_df = filter_rows(dataset, *session['filter'])
+        rules, skipped = compile_consistency(filtered_df)
+        response_message = 'Here is your consistency bundle (save the two parts as policy.rego and data.json):'
+        if skipped:
+            response_message += f' {len(skipped)} row(s) were skipped because their operation is not supported.'
+        reply = policy_reply(response_message, render_bundle_text(rules), 'bundle', filtered_df.to_dict(orient='records'))
+        session.pop('filter', None)
+        return reply
+
     # Default response if no intent or state matches
     else:
         return jsonify({'response': "I'm sorry, I can only generate Rego policies for parameter consistency checking for Ericsson data models at the moment."})
 
+@app.route('/download')
+def download():
+    """
+    Streams the policy for a filter as a zip or tar.gz archive. The files are generated while
+    the archive is sent (chunked), so neither the policy text nor the archive is held in memory.
+    """
+    archive_format = request.args.get('format', 'zip')
+    kind = request.args.get('kind', 'rules')
+    if archive_format not in FORMATS or kind not in ('rules', 'bundle'):
+        return jsonify({'error': f"Use format={' or '.join(FORMATS)} and kind=rules or bundle."}), 400
+    try:
+        dataset = registry.get(request.args.get('dataset') or None)
+    except KeyError as e:
+        return jsonify({'error': str(e.args[0])}), 404
+    except Exception as e:
+        return jsonify({'error': f"Dataset could not be loaded: {e}"}), 503
+
+    filter_value = request.args.get('value', '')
+    filtered_df = filter_rows(dataset, request.args.get('filter_by', ''), filter_value)
+    if filtered_df is None:
+        return jsonify({'error': "Use filter_by='mo type', 'checking attribute' or 'both'."}), 400
+    if filtered_df.empty:
+        return jsonify({'error': 'No data found matching your criteria.'}), 404
+
+    if kind == 'bundle':
+        rules, _ = compile_consistency(filtered_df)
+        files = bundle_files(rules).items()
+    else:
+        files = rule_package_files(filtered_df.to_dict(orient='records'))
+    mimetype, extension = FORMATS[archive_format]
+    filename = f"rego_{kind}_{re.sub(r'[^A-Za-z0-9_-]+', '_', filter_value) or 'policy'}{extension}"
+    return Response(stream_archive(files, archive_format), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
 if __name__ == '__main__':
+    # Development server; for production use 'python serve.py' (see gunicorn.conf.py)
     app.run(debug=True)
\ No newline at end of file
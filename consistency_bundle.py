@@ -0,0 +1,302 @@
+"""
+Compiles the master.csv consistency rules into an OPA bundle: one data document plus a
+small generic policy, instead of one 'allow' rule per row.
+
+    data.json    {"consistency": {vendor: {mo_type: {attribute: [{"op": "eq", "value": 63}, ...]}}}}
+    policy.rego  package policy.consistency, looks the rules up by vendor, MO Type and attribute
+    .manifest    bundle revision and roots
+
+OPA resolves data.consistency[vendor][mo_type][attribute] as indexed lookups, so the cost of
+a decision depends on the parameters being checked, not on how many rows master.csv has.
+
+Input to the policy, either for one attribute or for a whole MO:
+    {"vendor": "Nokia", "mo_type": "BTS", "attribute": "interferenceAveragingProcessBoundary5", "value": 63}
+    {"vendor": "Nokia", "mo_type": "BTS", "parameters": {"interferenceAveragingProcessBoundary5": 63, ...}}
+
+Usage:
+    python consistency_bundle.py                         # writes ./bundle/
+    python consistency_bundle.py --tar bundle.tar.gz     # also writes an OPA bundle archive
+    python consistency_bundle.py --check input.json      # evaluates an input with the same semantics
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import tarfile
+
+import pandas as pd
+
+# --- Configuration ---
+CSV_PATH = "master.csv"
+BUNDLE_DIR = "bundle"
+DATA_ROOT = "consistency"
+POLICY_PACKAGE = "policy.consistency"
+
+# Operation cell -> operator code used in the data document
+OPERATIONS = {
+    "EQUALS": "eq",
+    "EQUAL": "eq",
+    "NOT EQUALS": "ne",
+    "NOT EQUAL": "ne",
+    "GREATER THAN": "gt",
+    "GREATER THAN OR EQUAL": "ge",
+    "GREATER THAN OR EQUALS": "ge",
+    "LESS THAN": "lt",
+    "LESS THAN OR EQUAL": "le",
+    "LESS THAN OR EQUALS": "le",
+}
+
+_NUMBER_RE = re.compile(r"^[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?$")
+
+POLICY_REGO = """package policy.consistency
+
+# Generic evaluator for the rules compiled into data.consistency by consistency_bundle.py.
+# Every lookup below is indexed by vendor, MO Type and attribute; nothing iterates the rule set.
+
+default allow := false
+
+rules := data.consistency[input.vendor][input.mo_type]
+
+parameters := input.parameters if input.parameters
+
+parameters := {input.attribute: input.value} if {
+    not input.parameters
+    input.attribute
+}
+
+violations contains violation if {
+    some attribute, actual in parameters
+    some check in rules[attribute]
+    not satisfied(check.op, actual, check.value)
+    violation := {"attribute": attribute, "op": check.op, "expected": check.value, "actual": actual}
+}
+
+# Allowed when at least one supplied parameter has rules and none of them is violated
+allow if {
+    some attribute, _ in parameters
+    rules[attribute]
+    count(violations) == 0
+}
+
+satisfied("eq", actual, expected) if actual == expected
+
+satisfied("ne", actual, expected) if actual != expected
+
+satisfied("gt", actual, expected) if {
+    ordered(actual, expected)
+    actual > expected
+}
+
+satisfied("ge", actual, expected) if {
+    ordered(actual, expected)
+    actual >= expected
+}
+
+satisfied("lt", actual, expected) if {
+    ordered(actual, expected)
+    actual < expected
+}
+
+satisfied("le", actual, expected) if {
+    ordered(actual, expected)
+    actual <= expected
+}
+
+# Rego orders values across types ("63" > 50, null < 5); the rules only order numbers
+# against numbers and strings against strings, anything else is unmet
+ordered(actual, expected) if {
+    type_name(actual) == type_name(expected)
+    type_name(expected) in {"number", "string"}
+}
+"""
+
+
+def parse_value(raw):
+    """
+    Types a master.csv value: empty cells, NaN and 'null' become None, numbers become
+    int/float, 'true'/'false' become booleans and quoted strings are unquoted.
+    """
+    if raw is None:
+        return None
+    if isinstance(raw, bool):
+        return raw
+    if isinstance(raw, (int, float)):
+        if raw != raw:  # NaN
+            return None
+        return int(raw) if float(raw).is_integer() else float(raw)
+    text = str(raw).strip()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'":
+        return text[1:-1]
+    lowered = text.lower()
+    if lowered in ("", "null", "none", "nan"):
+        return None
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    if _NUMBER_RE.match(text):
+        number = float(text)
+        return int(number) if number.is_integer() and "." not in text and "e" not in lowered else number
+    return text
+
+
+def normalize_operation(operation):
+    """Maps an Operation cell ('EQUALS', 'not_equals', 'Greater Than') to an operator code."""
+    key = " ".join(re.sub(r"[_-]", " ", str(operation)).split()).upper()
+    if key not in OPERATIONS:
+        raise ValueError(f"Unsupported operation '{operation}'")
+    return OPERATIONS[key]
+
+
+def compile_consistency(df):
+    """
+    Compiles the rule rows into {vendor: {mo_type: {attribute: [{"op", "value"}, ...]}}}.
+    Identical checks are kept once. Returns (rules, skipped) where skipped lists (row, reason).
+    """
+    rules = {}
+    skipped = []
+    for row in df.to_dict(orient="records"):
+        vendor = str(row.get("Vendor", "")).strip()
+        mo_type = str(row.get("MO Type", "")).strip()
+        attribute = str(row.get("Checking Attribute", "")).strip()
+        if not vendor or not mo_type or not attribute:
+            skipped.append((row, "missing Vendor, MO Type or Checking Attribute"))
+            continue
+        try:
+            op = normalize_operation(row.get("Operation") or "EQUALS")
+        except ValueError as e:
+            skipped.append((row, str(e)))
+            continue
+        check = {"op": op, "value": parse_value(row.get("Value"))}
+        checks = rules.setdefault(vendor, {}).setdefault(mo_type, {}).setdefault(attribute, [])
+        if check not in checks:
+            checks.append(check)
+    return rules, skipped
+
+
+def bundle_files(rules):
+    """The bundle contents as {relative path: bytes}."""
+    data = json.dumps({DATA_ROOT: rules}, indent=2, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    policy = POLICY_REGO.encode("utf-8")
+    revision = hashlib.sha256(data + policy).hexdigest()[:16]
+    manifest = json.dumps({"revision": revision, "roots": [DATA_ROOT, POLICY_PACKAGE.replace(".", "/")]},
+                          indent=2).encode("utf-8")
+    return {"data.json": data, "policy.rego": policy, ".manifest": manifest}
+
+
+def write_bundle(rules, out_dir=BUNDLE_DIR):
+    """Writes data.json, policy.rego and .manifest into out_dir. Returns the file paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for name, content in bundle_files(rules).items():
+        path = os.path.join(out_dir, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        paths.append(path)
+    return paths
+
+
+def write_bundle_tar(rules, tar_path):
+    """Writes an OPA bundle archive (tar.gz) that can be served to 'opa run --bundle' or a bundle server."""
+    with tarfile.open(tar_path, "w:gz") as tar:
+        for name, content in bundle_files(rules).items():
+            info = tarfile.TarInfo(name="/" + name)
+            info.size = len(content)
+            info.mode = 0o644
+            tar.addfile(info, io.BytesIO(content))
+    return tar_path
+
+
+def render_bundle_text(rules):
+    """policy.rego and data.json as one text block, for showing a bundle in a chat reply."""
+    files = bundle_files(rules)
+    return (f"# policy.rego\n{files['policy.rego'].decode('utf-8')}\n"
+            f"# data.json\n{files['data.json'].decode('utf-8')}\n")
+
+
+# --- Reference evaluation (same semantics as policy.rego) ---
+_COMPARE = {
+    "eq": lambda a, b: a == b,
+    "ne": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "ge": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "le": lambda a, b: a <= b,
+}
+
+
+def _rego_type(value):
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    return type(value).__name__
+
+
+def _satisfied(op, actual, expected):
+    # Values of different types are never equal in Rego (true != 1, "63" != 63), and
+    # policy.rego's ordered() only orders numbers with numbers and strings with strings
+    if _rego_type(actual) != _rego_type(expected):
+        return op == "ne"
+    if op not in ("eq", "ne") and _rego_type(expected) not in ("number", "string"):
+        return False
+    return _COMPARE[op](actual, expected)
+
+
+def _defined(doc, key):
+    # A Rego reference holds unless it is undefined or false ({} and "" count as true)
+    return key in doc and doc[key] is not False
+
+
+def evaluate(rules, input_doc):
+    """Returns {"allow": bool, "violations": [...]} for an input document, mirroring policy.rego."""
+    mo_rules = rules.get(input_doc.get("vendor"), {}).get(input_doc.get("mo_type"), {})
+    parameters = {}
+    if _defined(input_doc, "parameters"):
+        parameters = input_doc["parameters"]
+    elif _defined(input_doc, "attribute") and "value" in input_doc:
+        parameters = {input_doc["attribute"]: input_doc["value"]}
+    if not isinstance(parameters, dict):
+        parameters = {}
+    violations = [{"attribute": attribute, "op": check["op"], "expected": check["value"], "actual": actual}
+                  for attribute, actual in parameters.items()
+                  for check in mo_rules.get(attribute, [])
+                  if not _satisfied(check["op"], actual, check["value"])]
+    checked = any(attribute in mo_rules for attribute in parameters)
+    return {"allow": checked and not violations, "violations": violations}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile master.csv into an OPA data bundle with a generic evaluator.")
+    parser.add_argument("--csv", default=CSV_PATH, help="Rule sheet to compile.")
+    parser.add_argument("--out", default=BUNDLE_DIR, help="Bundle directory to write.")
+    parser.add_argument("--tar", help="Also write the bundle as this .tar.gz archive.")
+    parser.add_argument("--check", help="Evaluate this input JSON file against the compiled rules and print the result.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.csv):
+        print(f"Error: The file '{args.csv}' was not found.")
+        return
+    rules, skipped = compile_consistency(pd.read_csv(args.csv))
+    for row, reason in skipped:
+        print(f"Skipped row ({row.get('MO Type')}/{row.get('Checking Attribute')}): {reason}")
+
+    if args.check:
+        with open(args.check, "r", encoding="utf-8") as f:
+            print(json.dumps(evaluate(rules, json.load(f)), indent=2))
+        return
+
+    paths = write_bundle(rules, args.out)
+    checks = sum(len(c) for mos in rules.values() for attrs in mos.values() for c in attrs.values())
+    print(f"Wrote {', '.join(paths)} ({checks} checks).")
+    if args.tar:
+        print(f"Wrote {write_bundle_tar(rules, args.tar)}.")
+
+
+if __name__ == "__main__":
+    main()
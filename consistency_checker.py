@@ -0,0 +1,303 @@
+"""
+Vectorized consistency checker: applies the master.csv rules to a table of MO instances
+column by column instead of evaluating a policy per instance.
+
+The instance table has one row per MO instance, an 'MO Type' column, optionally a 'Vendor'
+column, and one column per parameter (the layout of a parameter dump). Rules are grouped by
+MO Type and attribute; for each MO Type present in the table every rule is one NumPy
+comparison over that MO's rows. Cells are typed like consistency_bundle.parse_value(), so
+'63' in a dump matches the rule value 63. Parameters that are not columns of the table are
+not checked; empty cells count as null.
+
+The violations come back as a compact frame (categorical columns):
+    row, instance, vendor, mo_type, attribute, op, expected, actual
+
+Since it implements the same semantics as the generated policy.rego, it doubles as an
+oracle: --cross-check compares it row by row with consistency_bundle.evaluate(), or with
+'opa eval' when --opa points at a bundle directory.
+
+Usage:
+    python consistency_checker.py dump.csv --out violations.csv
+    python consistency_checker.py dump.csv --cross-check
+    python consistency_checker.py dump.csv --cross-check --opa bundle
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import time
+
+import numpy as np
+import pandas as pd
+
+from consistency_bundle import CSV_PATH, compile_consistency, evaluate, normalize_operation, parse_value
+
+VIOLATION_COLUMNS = ["row", "instance", "vendor", "mo_type", "attribute", "op", "expected", "actual"]
+
+
+def load_instances(path):
+    """Reads a parameter dump (.csv, .jsonl/.ndjson, .json or .parquet) as strings/objects."""
+    lower = path.lower()
+    if lower.endswith((".jsonl", ".ndjson")):
+        return pd.read_json(path, lines=True, dtype=False)
+    if lower.endswith(".json"):
+        return pd.read_json(path, dtype=False)
+    if lower.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[""])
+
+
+def _typed(series):
+    """
+    parse_value() over a column (object dtype, None for null). Dumps repeat a handful of
+    values per parameter, so each distinct value is parsed once and broadcast back.
+    """
+    codes, uniques = pd.factorize(series)
+    typed = np.empty(len(uniques) + 1, dtype=object)
+    typed[:-1] = [parse_value(value) for value in uniques]
+    typed[-1] = None  # code -1 (missing) indexes the last slot
+    return pd.Series(typed[codes], index=series.index, dtype=object)
+
+
+def _compare(actual, op, expected):
+    """
+    Boolean mask of the rows whose typed values satisfy 'actual <op> expected'.
+    Values of another type than the expected one never satisfy eq/gt/ge/lt/le and
+    always satisfy ne, and only numbers and strings are ordered, as in policy.rego.
+    """
+    if expected is None:
+        is_null = actual.isna().to_numpy()
+        return is_null if op == "eq" else ~is_null if op == "ne" else np.zeros(len(actual), dtype=bool)
+
+    if isinstance(expected, bool):
+        same_type = actual.map(lambda v: isinstance(v, bool)).to_numpy(dtype=bool)
+        values = np.where(same_type, actual.to_numpy(dtype=object), None)
+        equal = same_type & (values == expected)
+        if op in ("eq", "ne"):
+            return equal if op == "eq" else ~equal
+        return np.zeros(len(actual), dtype=bool)
+
+    if isinstance(expected, (int, float)):
+        same_type = actual.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)).to_numpy(dtype=bool)
+        numbers = pd.to_numeric(actual.where(same_type), errors="coerce").to_numpy(dtype=float)
+    else:
+        same_type = actual.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+        numbers = actual.where(same_type, "").to_numpy(dtype=object)
+
+    with np.errstate(invalid="ignore"):
+        if op == "eq":
+            return same_type & (numbers == expected)
+        if op == "ne":
+            return ~(same_type & (numbers == expected))
+        if op == "gt":
+            return same_type & (numbers > expected)
+        if op == "ge":
+            return same_type & (numbers >= expected)
+        if op == "lt":
+            return same_type & (numbers < expected)
+        if op == "le":
+            return same_type & (numbers <= expected)
+    raise ValueError(f"Unknown operator '{op}'")
+
+
+class RuleSet:
+    """master.csv rules grouped as {mo_type: {attribute: [(vendor, op, value), ...]}}."""
+
+    def __init__(self, rules=None):
+        self.rules = rules or {}
+
+    @classmethod
+    def from_frame(cls, df):
+        rules = {}
+        for row in df.to_dict(orient="records"):
+            vendor = str(row.get("Vendor", "")).strip()
+            mo_type = str(row.get("MO Type", "")).strip()
+            attribute = str(row.get("Checking Attribute", "")).strip()
+            if not mo_type or not attribute:
+                continue
+            try:
+                op = normalize_operation(row.get("Operation") or "EQUALS")
+            except ValueError:
+                continue
+            checks = rules.setdefault(mo_type, {}).setdefault(attribute, [])
+            check = (vendor, op, parse_value(row.get("Value")))
+            if check not in checks:
+                checks.append(check)
+        return cls(rules)
+
+    @classmethod
+    def from_csv(cls, path=CSV_PATH):
+        return cls.from_frame(pd.read_csv(path))
+
+    def __len__(self):
+        return sum(len(checks) for attributes in self.rules.values() for checks in attributes.values())
+
+    def mo_types(self):
+        return set(self.rules)
+
+    def subset(self, mo_types):
+        """Only the rules of the given MO Types."""
+        return RuleSet({mo: self.rules[mo] for mo in mo_types if mo in self.rules})
+
+    def check(self, instances, mo_type_column="MO Type", vendor_column="Vendor", id_column=None, row_offset=0):
+        """
+        Evaluates every rule against the instance table. Returns the violations frame;
+        'row' is the instance's position in the table plus row_offset.
+        """
+        parts = []
+        if mo_type_column not in instances.columns or instances.empty:
+            return empty_violations()
+        has_vendor = vendor_column in instances.columns
+        groups = instances.groupby(instances[mo_type_column].astype(str).str.strip(), sort=False).indices
+        for mo_type, positions in groups.items():
+            attributes = self.rules.get(mo_type)
+            if not attributes:
+                continue
+            subset = instances.iloc[positions]
+            vendors = subset[vendor_column].astype(str).str.strip().to_numpy() if has_vendor else None
+            for attribute, checks in attributes.items():
+                if attribute not in subset.columns:
+                    continue
+                actual = _typed(subset[attribute])
+                for vendor, op, expected in checks:
+                    failed = ~_compare(actual, op, expected)
+                    if vendors is not None and vendor:
+                        failed &= vendors == vendor
+                    if not failed.any():
+                        continue
+                    hit = np.flatnonzero(failed)
+                    parts.append(pd.DataFrame({
+                        "row": positions[hit] + row_offset,
+                        "instance": subset[id_column].to_numpy()[hit] if id_column else positions[hit] + row_offset,
+                        "vendor": vendors[hit] if vendors is not None else vendor,
+                        "mo_type": mo_type,
+                        "attribute": attribute,
+                        "op": op,
+                        "expected": [expected] * len(hit),
+                        "actual": actual.to_numpy()[hit],
+                    }))
+        if not parts:
+            return empty_violations()
+        return compact(pd.concat(parts, ignore_index=True).sort_values(["row", "attribute"], kind="stable",
+                                                                        ignore_index=True))
+
+
+def empty_violations():
+    return compact(pd.DataFrame({column: pd.Series(dtype=object) for column in VIOLATION_COLUMNS}))
+
+
+def compact(violations):
+    """Categorical dtypes for the repetitive columns."""
+    for column in ("vendor", "mo_type", "attribute", "op"):
+        violations[column] = violations[column].astype("category")
+    return violations
+
+
+# --- Oracle ---
+def instance_input(row, mo_type_column="MO Type", vendor_column="Vendor"):
+    """The policy.rego input document for one instance row."""
+    skip = {mo_type_column, vendor_column}
+    return {
+        "vendor": str(row.get(vendor_column, "")).strip(),
+        "mo_type": str(row.get(mo_type_column, "")).strip(),
+        "parameters": {k: parse_value(v) for k, v in row.items() if k not in skip},
+    }
+
+
+def opa_evaluator(bundle_dir, opa_binary="opa"):
+    """Per-instance evaluator that asks 'opa eval' for data.policy.consistency.violations."""
+    if shutil.which(opa_binary) is None:
+        raise FileNotFoundError(f"'{opa_binary}' not found on PATH")
+
+    def run(input_doc):
+        completed = subprocess.run(
+            [opa_binary, "eval", "--format", "json", "--bundle", bundle_dir, "--stdin-input",
+             "data.policy.consistency.violations"],
+            input=json.dumps(input_doc), capture_output=True, text=True, check=True)
+        result = json.loads(completed.stdout).get("result") or []
+        return {"violations": result[0]["expressions"][0]["value"] if result else []}
+
+    return run
+
+
+def cross_check(ruleset, instances, evaluator, mo_type_column="MO Type", vendor_column="Vendor"):
+    """
+    Compares the vectorized violations with a per-instance evaluator (consistency_bundle.evaluate
+    or opa_evaluator()). Returns a list of {"row", "checker", "evaluator"} disagreements.
+    """
+    violations = ruleset.check(instances, mo_type_column, vendor_column)
+    by_row = {}
+    for row in violations.itertuples(index=False):
+        by_row.setdefault(int(row.row), set()).add((str(row.attribute), str(row.op)))
+    has_vendor = vendor_column in instances.columns
+    mismatches = []
+    for position, row in enumerate(instances.to_dict(orient="records")):
+        input_doc = instance_input(row, mo_type_column, vendor_column)
+        if not has_vendor:
+            # Without a vendor column every vendor's rules apply; ask the evaluator once per vendor
+            vendors = {vendor for checks in ruleset.rules.get(input_doc["mo_type"], {}).values()
+                       for vendor, _, _ in checks}
+        else:
+            vendors = {input_doc["vendor"]}
+        found = set()
+        for vendor in vendors:
+            result = evaluator(dict(input_doc, vendor=vendor))
+            found |= {(v["attribute"], v["op"]) for v in result["violations"]}
+        expected = by_row.get(position, set())
+        if found != expected:
+            mismatches.append({"row": position, "checker": sorted(expected), "evaluator": sorted(found)})
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check a parameter dump against the master.csv rules.")
+    parser.add_argument("instances", help="Parameter dump: .csv, .jsonl, .json or .parquet, one row per MO instance.")
+    parser.add_argument("--rules", default=CSV_PATH, help="Rule sheet.")
+    parser.add_argument("--mo-type-column", default="MO Type")
+    parser.add_argument("--vendor-column", default="Vendor")
+    parser.add_argument("--id-column", default=None, help="Column identifying an instance (e.g. a DN).")
+    parser.add_argument("--out", help="Write the violations to this .csv or .parquet file.")
+    parser.add_argument("--cross-check", action="store_true",
+                        help="Compare with the per-instance bundle evaluator and report disagreements.")
+    parser.add_argument("--opa", metavar="BUNDLE_DIR", help="With --cross-check, evaluate through 'opa eval' on this bundle.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.rules):
+        print(f"Error: The file '{args.rules}' was not found.")
+        return
+    ruleset = RuleSet.from_csv(args.rules)
+    instances = load_instances(args.instances)
+
+    start = time.perf_counter()
+    violations = ruleset.check(instances, args.mo_type_column, args.vendor_column, args.id_column)
+    seconds = time.perf_counter() - start
+    print(f"Checked {len(instances)} instances against {len(ruleset)} rules in {seconds:.3f}s: "
+          f"{len(violations)} violations.")
+    if not violations.empty:
+        print(violations.groupby(["mo_type", "attribute"], observed=True).size().sort_values(ascending=False)
+              .head(20).to_string())
+
+    if args.out:
+        if args.out.endswith(".parquet"):
+            violations.to_parquet(args.out, index=False)
+        else:
+            violations.to_csv(args.out, index=False)
+        print(f"Violations written to {args.out}.")
+
+    if args.cross_check:
+        if args.opa:
+            evaluator = opa_evaluator(args.opa)
+        else:
+            rules, _ = compile_consistency(pd.read_csv(args.rules))
+            evaluator = lambda input_doc: evaluate(rules, input_doc)
+        mismatches = cross_check(ruleset, instances, evaluator, args.mo_type_column, args.vendor_column)
+        if mismatches:
+            print(f"{len(mismatches)} instance(s) disagree with the evaluator, e.g. {mismatches[0]}")
+        else:
+            print("The evaluator agrees with the checker on every instance.")
+
+
+if __name__ == "__main__":
+    main()
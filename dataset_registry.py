@@ -0,0 +1,222 @@
+"""
+Registry of rule datasets: one rules CSV (plus optional metamodel hierarchy index) per
+vendor and model version, addressed as 'name' or 'name@version'.
+
+Datasets are listed in DATASETS_CONFIG (datasets.json by default, see
+datasets.example.json):
+
+    {
+      "default": "ericsson",
+      "memory_budget_mb": 512,
+      "datasets": [
+        {"name": "ericsson", "version": "23.Q4", "path": "master.csv", "metamodel_index": "metamodel_index.json"},
+        {"name": "huawei", "version": "5.1", "path": "rules/huawei_5_1.csv", "vendor": "Huawei"}
+      ]
+    }
+
+Nothing is read until a dataset is first asked for. Loaded datasets are kept in
+least-recently-used order; when their estimated size exceeds the memory budget the
+oldest ones are dropped (the dataset just loaded is always kept) and reloaded on their
+next use. Without a config file the registry holds a single dataset, master.csv.
+
+Usage:
+    python dataset_registry.py list
+    python dataset_registry.py load huawei@5.1
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from metamodel_index import DEFAULT_INDEX_PATH, load_index_if_available
+
+# --- Configuration ---
+DATASETS_CONFIG = os.environ.get("DATASETS_CONFIG", "datasets.json")
+DEFAULT_CSV_PATH = "master.csv"
+DEFAULT_MEMORY_MB = int(os.environ.get("DATASET_MEMORY_MB", 512))
+
+
+class Dataset:
+    """A loaded rules sheet with the lookups the chat flow needs, built once per load."""
+
+    def __init__(self, entry, df, hierarchy=None):
+        self.entry = entry
+        self.key = dataset_key(entry)
+        self.df = df
+        self.hierarchy = hierarchy
+        self.mo_types = tuple(df['MO Type'].dropna().unique().tolist())
+        self.checking_attributes = tuple(df['Checking Attribute'].dropna().unique().tolist())
+        self.mo_type_folded = df['MO Type'].str.casefold()
+        # (value, whole-word pattern) pairs for entity extraction
+        self.mo_type_patterns = _word_patterns(self.mo_types)
+        self.checking_attribute_patterns = _word_patterns(self.checking_attributes)
+        self.nbytes = int(df.memory_usage(deep=True).sum() + self.mo_type_folded.memory_usage(deep=True))
+
+    @property
+    def ready(self):
+        return 'MO Type' in self.df.columns and not self.df.empty
+
+    def mo_type_mask(self, filter_value):
+        """Rows whose MO Type matches the filter value or sits under it in the metamodel hierarchy."""
+        mask = self.df['MO Type'].str.contains(filter_value, case=False, na=False)
+        if self.hierarchy is not None and filter_value in self.hierarchy:
+            child_types = {name.casefold() for name in self.hierarchy.expand(filter_value)}
+            mask |= self.mo_type_folded.isin(child_types)
+        return mask
+
+    def checking_attribute_mask(self, filter_value):
+        return self.df['Checking Attribute'].str.contains(filter_value, case=False, na=False)
+
+
+def _word_patterns(values):
+    return tuple((value, re.compile(r'\b' + re.escape(value.lower()) + r'\b')) for value in values)
+
+
+def dataset_key(entry):
+    return f"{entry['name']}@{entry['version']}" if entry.get("version") else entry["name"]
+
+
+def load_dataset(entry):
+    """Reads the rules CSV of a config entry (and its hierarchy index, if any) into a Dataset."""
+    df = pd.read_csv(entry["path"])
+    # String columns so .str.contains() works when a sheet has numbers or NaN in them
+    for column in ('MO Type', 'Checking Attribute'):
+        df[column] = df[column].astype(str) if column in df.columns else pd.Series(dtype=str)
+    hierarchy = load_index_if_available(entry["metamodel_index"]) if entry.get("metamodel_index") else None
+    return Dataset(entry, df, hierarchy)
+
+
+class DatasetRegistry:
+    """Loads datasets on first use and keeps the most recently used ones within a memory budget."""
+
+    def __init__(self, entries, default=None, memory_budget_mb=DEFAULT_MEMORY_MB):
+        if not entries:
+            raise ValueError("A dataset registry needs at least one dataset")
+        self.entries = OrderedDict((dataset_key(entry), entry) for entry in entries)
+        self.default = self.resolve(default) if default else next(iter(self.entries))
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    @classmethod
+    def from_config(cls, path=DATASETS_CONFIG):
+        """The registry described by the config file, or just master.csv when there is none."""
+        if not os.path.exists(path):
+            entry = {"name": os.path.splitext(os.path.basename(DEFAULT_CSV_PATH))[0], "path": DEFAULT_CSV_PATH,
+                     "metamodel_index": os.environ.get("METAMODEL_INDEX", DEFAULT_INDEX_PATH)}
+            return cls([entry])
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        base = os.path.dirname(os.path.abspath(path))
+        entries = []
+        for entry in config.get("datasets", []):
+            entry = dict(entry)
+            for key in ("path", "metamodel_index"):
+                if entry.get(key) and not os.path.isabs(entry[key]):
+                    entry[key] = os.path.join(base, entry[key])
+            entries.append(entry)
+        return cls(entries, config.get("default"), config.get("memory_budget_mb", DEFAULT_MEMORY_MB))
+
+    def resolve(self, name):
+        """
+        'name@version' or 'name' -> registry key. A bare name picks the version listed last
+        for it in the config. Raises KeyError for unknown datasets.
+        """
+        name = (name or "").strip()
+        if name in self.entries:
+            return name
+        matches = [key for key, entry in self.entries.items() if entry["name"].casefold() == name.casefold()]
+        if not matches:
+            raise KeyError(f"Unknown dataset '{name}'. Available: {', '.join(self.entries)}")
+        return matches[-1]
+
+    def get(self, name=None):
+        """The loaded Dataset for 'name' (the default dataset when None), loading it if needed."""
+        key = self.resolve(name) if name else self.default
+        with self._lock:
+            if key in self._loaded:
+                self._loaded.move_to_end(key)
+                return self._loaded[key]
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        # One loader per dataset; requests for other datasets are not held up meanwhile
+        with loading:
+            with self._lock:
+                if key in self._loaded:
+                    self._loaded.move_to_end(key)
+                    return self._loaded[key]
+            dataset = load_dataset(self.entries[key])
+            with self._lock:
+                self._loaded[key] = dataset
+                self._evict()
+                self._loading.pop(key, None)
+            return dataset
+
+    def _evict(self):
+        """Drops least recently used datasets while over budget, never the most recent one."""
+        while len(self._loaded) > 1 and self.loaded_bytes() > self.memory_budget:
+            key, dataset = self._loaded.popitem(last=False)
+            print(f"Dataset '{key}' evicted ({dataset.nbytes / 1e6:.1f} MB).")
+
+    def loaded_bytes(self):
+        return sum(dataset.nbytes for dataset in self._loaded.values())
+
+    def describe(self):
+        """One dict per configured dataset, for listings."""
+        with self._lock:
+            loaded = dict(self._loaded)
+        return [{
+            "key": key,
+            "name": entry["name"],
+            "version": entry.get("version"),
+            "vendor": entry.get("vendor"),
+            "description": entry.get("description"),
+            "default": key == self.default,
+            "loaded": key in loaded,
+            "rows": len(loaded[key].df) if key in loaded else None,
+            "memory_mb": round(loaded[key].nbytes / 1e6, 2) if key in loaded else None,
+        } for key, entry in self.entries.items()]
+
+
+def dataset_entry(name=None, config_path=DATASETS_CONFIG):
+    """Config entry of a dataset ('path', optional 'metamodel_index', ...), for scripts that read the files themselves."""
+    registry = DatasetRegistry.from_config(config_path)
+    key = registry.resolve(name) if name else registry.default
+    return registry.entries[key]
+
+
+def dataset_path(name=None, config_path=DATASETS_CONFIG):
+    """Rules CSV path of a dataset, for scripts that read the file themselves."""
+    return dataset_entry(name, config_path)["path"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List and load the configured rule datasets.")
+    parser.add_argument("command", choices=("list", "load"))
+    parser.add_argument("name", nargs="?", help="Dataset name or name@version (default: the default dataset).")
+    parser.add_argument("--config", default=DATASETS_CONFIG, help="Dataset config file.")
+    args = parser.parse_args()
+
+    registry = DatasetRegistry.from_config(args.config)
+    if args.command == "load":
+        try:
+            dataset = registry.get(args.name)
+        except (KeyError, FileNotFoundError) as e:
+            print(f"Error: {e}")
+            return
+        print(f"Loaded '{dataset.key}': {len(dataset.df)} rows, {len(dataset.mo_types)} MO Types, "
+              f"{dataset.nbytes / 1e6:.1f} MB.")
+    for info in registry.describe():
+        marker = "*" if info["default"] else " "
+        state = f"loaded, {info['rows']} rows, {info['memory_mb']} MB" if info["loaded"] else "not loaded"
+        print(f"{marker} {info['key']:30s} {registry.entries[info['key']]['path']} ({state})")
+
+
+if __name__ == "__main__":
+    main()
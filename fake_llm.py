@@ -0,0 +1,323 @@
+"""
+Record/replay stand-in for the Groq, Gemini and Ollama models, for offline runs and
+benchmarks.
+
+A cassette is a JSON lines file of recorded calls:
+
+    {"key": "<sha256>", "model": "llama3-70b-8192", "prompt": "...", "response": "..."}
+
+The key is the whitespace-normalized prompt plus the model (llm_coalesce.coalesce_key).
+When the same prompt was recorded several times, the responses are replayed in turn.
+If nothing was recorded for this model, a recording of the same prompt for any model
+is used. A prompt that was never recorded raises CassetteMiss.
+
+Selected through the environment:
+
+    LLM_PROVIDER=fake             replay from the cassette instead of calling the provider
+    LLM_PROVIDER=record           call the real provider and append every call to the cassette
+    LLM_CASSETTE=path.jsonl       cassette file (default llm_cassette.jsonl)
+    LLM_FAKE_LATENCY_MS=800       simulated time to first token (default 0)
+    LLM_FAKE_TOKENS_PER_SEC=50    simulated streaming rate; 0 sends everything at once (default)
+
+With the default timing a replay measures only the code around the model (prompt
+building, agent parsing, rendering). Set the timing to put realistic model latency back.
+
+Call sites get their model through:
+    chat_model(lambda: ChatGroq(...), "llama3-70b-8192", callbacks=[...])   # LangChain
+    generative_model(genai, "gemini-1.5-flash")                              # google.generativeai
+
+Usage:
+    python fake_llm.py list                     # what the cassette holds
+    python fake_llm.py replay "prompt text"     # replay one prompt with the configured timing
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Optional
+
+from llm_coalesce import coalesce_key
+
+try:
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage, AIMessageChunk
+    from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+except ImportError:  # only needed for the LangChain call sites
+    BaseChatModel = None
+
+# --- Configuration ---
+# Read when used rather than at import, so settings from a .env loaded later still apply
+DEFAULT_CASSETTE = "llm_cassette.jsonl"
+
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
+
+class CassetteMiss(LookupError):
+    """The cassette holds no recording for a prompt."""
+
+
+def provider():
+    return os.environ.get("LLM_PROVIDER", "").strip().lower()
+
+
+def cassette_path():
+    return os.environ.get("LLM_CASSETTE", DEFAULT_CASSETTE)
+
+
+def enabled():
+    """True when calls are replayed or recorded instead of going straight to the provider."""
+    return provider() in ("fake", "record")
+
+
+def replaying():
+    return provider() == "fake"
+
+
+# --- Cassette ---
+class Cassette:
+    """Recorded responses by (prompt, model) key; appends new recordings to the file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._by_key = {}
+        self._by_prompt = {}
+        self._positions = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._add(json.loads(line))
+
+    def _add(self, entry):
+        self._by_key.setdefault(entry["key"], []).append(entry["response"])
+        self._by_prompt.setdefault(coalesce_key(entry["prompt"]), []).append(entry["response"])
+
+    def __len__(self):
+        return sum(len(responses) for responses in self._by_key.values())
+
+    def lookup(self, prompt, model):
+        """The next recorded response for this prompt and model (or for this prompt on any model)."""
+        with self._lock:
+            for recorded, key in ((self._by_key, coalesce_key(prompt, model)), (self._by_prompt, coalesce_key(prompt))):
+                responses = recorded.get(key)
+                if responses:
+                    position = self._positions.get(key, 0)
+                    self._positions[key] = position + 1
+                    return responses[position % len(responses)]
+        raise CassetteMiss(f"No recording in '{self.path}' for this {model} prompt: {prompt[:120]!r}...")
+
+    def record(self, prompt, model, response):
+        entry = {"key": coalesce_key(prompt, model), "model": model, "prompt": prompt, "response": response}
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._add(entry)
+
+    def entries(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+_cassettes = {}
+
+
+def cassette(path=None):
+    """One shared Cassette per file, so every model in the process replays in the same order."""
+    path = path or cassette_path()
+    if path not in _cassettes:
+        _cassettes[path] = Cassette(path)
+    return _cassettes[path]
+
+
+# --- Timing ---
+def split_tokens(text):
+    return _TOKEN_RE.findall(text or "")
+
+
+def paced(text, latency_ms=None, tokens_per_sec=None):
+    """Yields the response in word-sized tokens with the configured latency and rate."""
+    if latency_ms is None:
+        latency_ms = float(os.environ.get("LLM_FAKE_LATENCY_MS", 0))
+    if tokens_per_sec is None:
+        tokens_per_sec = float(os.environ.get("LLM_FAKE_TOKENS_PER_SEC", 0))
+    if latency_ms > 0:
+        time.sleep(latency_ms / 1000.0)
+    interval = 1.0 / tokens_per_sec if tokens_per_sec > 0 else 0.0
+    for i, token in enumerate(split_tokens(text)):
+        if interval and i:
+            time.sleep(interval)
+        yield token
+
+
+def usage(prompt, response):
+    """Token counts in the shape the providers report, from the same word-sized tokens."""
+    return len(split_tokens(prompt)), len(split_tokens(response))
+
+
+# --- google.generativeai stand-in ---
+def _gemini_response(prompt, text):
+    prompt_tokens, completion_tokens = usage(prompt, text)
+    return SimpleNamespace(text=text, usage_metadata=SimpleNamespace(
+        prompt_token_count=prompt_tokens, candidates_token_count=completion_tokens))
+
+
+class FakeGenerativeModel:
+    """Replays (or records, around 'inner') genai.GenerativeModel.generate_content and chats."""
+
+    def __init__(self, model_name, inner=None, path=None):
+        self.model_name = model_name
+        self.inner = inner
+        self.path = path
+
+    def _complete(self, prompt, real_call):
+        if self.inner is not None:
+            text = real_call()
+            cassette(self.path).record(prompt, self.model_name, text)
+            return text
+        return cassette(self.path).lookup(prompt, self.model_name)
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        prompt = str(prompt)
+        text = self._complete(prompt, lambda: self.inner.generate_content(prompt, **kwargs).text)
+        if stream:
+            return (_gemini_response("", token) for token in paced(text))
+        return _gemini_response(prompt, "".join(paced(text)))
+
+    def start_chat(self, history=None, **kwargs):
+        return FakeChatSession(self, history or [], self.inner.start_chat(history=history, **kwargs)
+                               if self.inner is not None else None)
+
+
+class FakeChatSession:
+    """A chat whose key is the whole conversation so far, so replays follow the recorded turns."""
+
+    def __init__(self, model, history, inner=None):
+        self.model = model
+        self.inner = inner
+        self.history = [" ".join(str(part) for part in turn.get("parts", [])) for turn in history]
+
+    def send_message(self, message, **kwargs):
+        prompt = "\n".join(self.history + [str(message)])
+        text = self.model._complete(prompt, lambda: self.inner.send_message(message, **kwargs).text)
+        self.history += [str(message), text]
+        return _gemini_response(prompt, "".join(paced(text)))
+
+
+def generative_model(genai, model_name, path=None):
+    """genai.GenerativeModel(model_name), or its replaying/recording stand-in per LLM_PROVIDER."""
+    if replaying():
+        return FakeGenerativeModel(model_name, path=path)
+    model = genai.GenerativeModel(model_name)
+    if provider() == "record":
+        return FakeGenerativeModel(model_name, inner=model, path=path)
+    return model
+
+
+# --- LangChain stand-in ---
+def messages_text(messages):
+    return "\n".join(f"{getattr(m, 'type', 'human')}: {getattr(m, 'content', m)}" for m in messages)
+
+
+if BaseChatModel is not None:
+    class FakeChatModel(BaseChatModel):
+        """LangChain chat model that replays the cassette, or records around a real model ('inner')."""
+
+        model_name: str = "fake"
+        cassette_file: Optional[str] = None
+        inner: Optional[Any] = None
+
+        @property
+        def _llm_type(self):
+            return "fake-replay" if self.inner is None else "fake-record"
+
+        @property
+        def _identifying_params(self):
+            return {"model_name": self.model_name, "cassette": self.cassette_file or cassette_path()}
+
+        def _response(self, messages, stop, **kwargs):
+            prompt = messages_text(messages)
+            if self.inner is not None:
+                text = self.inner.invoke(messages, stop=stop, **kwargs).content
+                cassette(self.cassette_file).record(prompt, self.model_name, text)
+                return prompt, text
+            return prompt, cassette(self.cassette_file).lookup(prompt, self.model_name)
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            prompt, text = self._response(messages, stop, **kwargs)
+            text = "".join(paced(text))
+            prompt_tokens, completion_tokens = usage(prompt, text)
+            message = AIMessage(content=text, usage_metadata={
+                "input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens})
+            return ChatResult(generations=[ChatGeneration(message=message)], llm_output={
+                "model_name": self.model_name,
+                "token_usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}})
+
+        def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+            _, text = self._response(messages, stop, **kwargs)
+            for token in paced(text):
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+                if run_manager is not None:
+                    run_manager.on_llm_new_token(token, chunk=chunk)
+                yield chunk
+else:
+    FakeChatModel = None
+
+
+def chat_model(factory, model_name, callbacks=None, path=None):
+    """
+    The LangChain model factory() builds, or its replaying/recording stand-in per
+    LLM_PROVIDER. 'callbacks' are attached to the stand-in as they are to the real model.
+    """
+    if not enabled():
+        return factory()
+    if FakeChatModel is None:
+        raise ImportError("LLM_PROVIDER=fake/record with a LangChain model needs langchain-core installed")
+    inner = None
+    if provider() == "record":
+        inner = factory()
+        inner.callbacks = None  # the stand-in reports the call; don't count it twice
+    return FakeChatModel(model_name=model_name, cassette_file=path, inner=inner, callbacks=callbacks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and replay an LLM cassette.")
+    parser.add_argument("command", choices=("list", "replay"))
+    parser.add_argument("prompt", nargs="?", help="Prompt to replay.")
+    parser.add_argument("--cassette", default=cassette_path())
+    parser.add_argument("--model", default="", help="Model the prompt was recorded for.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.cassette):
+        print(f"Error: The file '{args.cassette}' was not found.")
+        return
+    if args.command == "list":
+        entries = Cassette(args.cassette).entries()
+        for entry in entries:
+            prompt = " ".join(entry["prompt"].split())
+            print(f"{entry['model']:24s} {len(entry['response']):6d} chars  {prompt[:80]}")
+        print(f"{len(entries)} recorded call(s).")
+        return
+
+    start = time.perf_counter()
+    first = None
+    try:
+        for token in paced(cassette(args.cassette).lookup(args.prompt or "", args.model)):
+            first = first or time.perf_counter()
+            print(token, end="", flush=True)
+    except CassetteMiss as e:
+        print(f"Error: {e}")
+        return
+    end = time.perf_counter()
+    print(f"\n\nFirst token after {((first or end) - start) * 1000:.0f}ms, done after {(end - start) * 1000:.0f}ms.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+# gunicorn.conf.py
+# Production settings for app.py. Used by serve.py, or directly:
+#     gunicorn -c gunicorn.conf.py app:app
+import gc
+import multiprocessing
+import os
+
+# --- Configuration ---
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'sync'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+
+# Load app.py (master.csv, the hierarchy index and the precomputed lookups) once in the
+# master process; workers are forked from it and share those pages copy-on-write. This
+# also gives every worker the same generated FLASK_SECRET_KEY, so sessions work across them.
+preload_app = True
+
+# Recycle workers now and then so any per-worker growth is returned to the OS
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+
+
+def when_ready(server):
+    # Runs in the master after the preloaded app is imported and before any worker is forked.
+    # Moving every live object into the permanent generation keeps the workers' garbage
+    # collector from writing to (and so copying) the shared pages.
+    gc.collect()
+    gc.freeze()
+    server.log.info("Preloaded app; %d objects frozen for copy-on-write sharing.", gc.get_freeze_count())
@@ -0,0 +1,162 @@
+"""
+Single-flight coalescing for LLM calls.
+
+When several users send the same prompt to the same model at the same time, only the
+first request (the leader) calls the provider. The others wait for that in-flight
+call and get its result, or its exception. Nothing is cached: once a call finishes,
+the next identical prompt calls the provider again.
+
+Keys are the prompt with whitespace collapsed, plus the model name and any extra
+parameters that change the answer (temperature, dataset, ...).
+
+Streaming calls are shared as well. The leader's stream is pumped by a background
+thread into a shared buffer, and every caller, the leader included, reads from that
+buffer. A caller that joins late first replays the chunks already received and then
+follows the live stream. A caller that stops reading early does not stall the others.
+
+Usage:
+    from llm_coalesce import coalesced_call, coalesced_stream
+
+    text = coalesced_call(prompt, "groq/llama3-70b-8192", lambda: agent.run(prompt))
+    for chunk in coalesced_stream(prompt, "gemini-1.5-flash",
+                                  lambda: (c.text for c in model.generate_content(prompt, stream=True))):
+        print(chunk, end="")
+"""
+
+import hashlib
+import json
+import threading
+from collections import Counter
+
+
+def coalesce_key(prompt, model="", **params):
+    """Key for a call: the whitespace-normalized prompt, the model and the extra parameters."""
+    normalized = " ".join(str(prompt).split())
+    payload = json.dumps([model, normalized, params], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Stream:
+    """The chunks of one streaming call, shared by every reader."""
+
+    def __init__(self):
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.condition = threading.Condition()
+
+    def pump(self, fn, on_done):
+        try:
+            for chunk in fn():
+                with self.condition:
+                    self.chunks.append(chunk)
+                    self.condition.notify_all()
+        except BaseException as e:
+            self.error = e
+        finally:
+            on_done()
+            with self.condition:
+                self.finished = True
+                self.condition.notify_all()
+
+    def read(self):
+        position = 0
+        while True:
+            with self.condition:
+                while position >= len(self.chunks) and not self.finished:
+                    self.condition.wait()
+                if position < len(self.chunks):
+                    chunk = self.chunks[position]
+                    position += 1
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            yield chunk
+
+
+class SingleFlight:
+    """At most one in-flight call per key; concurrent duplicates share its outcome."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+        self.stats = Counter()
+
+    def call(self, key, fn):
+        """Returns fn()'s result, running fn only if no call for 'key' is already in flight."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self.stats["calls" if leader else "shared"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def stream(self, key, fn):
+        """
+        Yields the chunks of the iterable fn() returns. fn is only called if no stream for
+        'key' is in flight; otherwise this replays and then follows that stream.
+        """
+        with self._lock:
+            stream = self._streams.get(key)
+            leader = stream is None
+            if leader:
+                stream = self._streams[key] = _Stream()
+            self.stats["streams" if leader else "shared_streams"] += 1
+
+        if leader:
+            def finished():
+                with self._lock:
+                    self._streams.pop(key, None)
+
+            threading.Thread(target=stream.pump, args=(fn, finished), daemon=True).start()
+        return stream.read()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls) + len(self._streams)
+
+
+# --- Process-wide instance ---
+# One per process: every thread of a web or streamlit server shares it.
+_flight = SingleFlight()
+
+
+def coalesced_call(prompt, model, fn, **params):
+    """fn() for this prompt and model, shared with any identical call already in flight."""
+    return _flight.call(coalesce_key(prompt, model, **params), fn)
+
+
+def coalesced_stream(prompt, model, fn, **params):
+    """The chunks of fn() for this prompt and model, shared with any identical stream already in flight."""
+    return _flight.stream(coalesce_key(prompt, model, **params), fn)
+
+
+def coalesce_stats():
+    """Provider calls made vs. requests that shared one, since the process started."""
+    return dict(_flight.stats)
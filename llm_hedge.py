@@ -0,0 +1,428 @@
+"""
+Hedged Rego generation across Groq, Gemini and Ollama.
+
+The request goes to the first provider in LLM_HEDGE_PROVIDERS. If that provider has
+not sent its first token by its hedge deadline, the request also goes to the next
+provider, and so on down the list. The first answer that contains a Rego code block
+(rego_stream.extract_rego_code) wins. The other requests are cancelled: each stops
+reading its stream at the next chunk. An answer without Rego, or a provider error,
+does not win. If every started request has failed, the next provider starts at once.
+
+A provider's hedge deadline is the LLM_HEDGE_PERCENTILE of its recent time to first
+token. Until LLM_HEDGE_MIN_SAMPLES first tokens have been measured (in this process, or
+found in the llm_metrics log at start-up), LLM_HEDGE_DEFAULT_MS is used instead.
+
+Every attempt appends a "hedge" record to the llm_metrics log with its outcome:
+
+    won        the winning answer
+    lost       finished with valid Rego, but after another provider had won
+    cancelled  stopped when another provider won
+    invalid    finished without a Rego code block
+    error      the provider raised
+
+Configuration:
+
+    LLM_HEDGE_PROVIDERS=groq,gemini,ollama   order of preference (default groq,gemini)
+    LLM_HEDGE_PERCENTILE=95                  percentile of time to first token used as the deadline
+    LLM_HEDGE_DEFAULT_MS=2500                deadline while there are too few samples
+    LLM_HEDGE_MIN_SAMPLES=20                 samples needed before the percentile is trusted
+    LLM_HEDGE_TIMEOUT_S=120                  give up on the whole request after this long
+
+Models come from GROQ_MODEL_NAME, GEMINI_MODEL_NAME and OLLAMA_MODEL_NAME; Groq and
+Gemini need GROQ_API_KEY and GOOGLE_API_KEY. Calls go through fake_llm, so
+LLM_PROVIDER=fake replays them from a cassette.
+
+Usage:
+    python llm_hedge.py generate "deny slices whose latency exceeds 10ms"
+    python llm_hedge.py stats
+"""
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+import fake_llm
+import llm_metrics
+from rego_stream import extract_rego_code
+
+# --- Configuration ---
+DEFAULT_PROVIDERS = "groq,gemini"
+PERCENTILE = float(os.environ.get("LLM_HEDGE_PERCENTILE", 95))
+DEFAULT_DEADLINE_MS = float(os.environ.get("LLM_HEDGE_DEFAULT_MS", 2500))
+MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", 20))
+TIMEOUT_S = float(os.environ.get("LLM_HEDGE_TIMEOUT_S", 120))
+WINDOW = 200  # first-token samples kept per provider
+
+
+class HedgeFailed(Exception):
+    """No provider produced an answer with a Rego code block."""
+
+
+# --- Providers ---
+class Provider:
+    """A named model whose stream(prompt) yields the answer text in chunks."""
+
+    def __init__(self, name, model, stream):
+        self.name = name
+        self.model = model
+        self.stream = stream
+
+
+def _langchain_stream(llm):
+    def stream(prompt):
+        for chunk in llm.stream(prompt):
+            yield chunk.content
+
+    return stream
+
+
+def groq_provider(entry_point):
+    from langchain_groq import ChatGroq
+
+    model = os.getenv("GROQ_MODEL_NAME", "llama3-70b-8192")
+    callbacks = [llm_metrics.MetricsCallbackHandler(entry_point)]
+    llm = fake_llm.chat_model(lambda: ChatGroq(temperature=0, model_name=model, groq_api_key=os.getenv("GROQ_API_KEY"),
+                                               callbacks=callbacks), model, callbacks)
+    return Provider("groq", model, _langchain_stream(llm))
+
+
+def ollama_provider(entry_point):
+    from langchain_community.chat_models import ChatOllama
+
+    model = os.getenv("OLLAMA_MODEL_NAME", "llama3")
+    base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    callbacks = [llm_metrics.MetricsCallbackHandler(entry_point)]
+    llm = fake_llm.chat_model(lambda: ChatOllama(base_url=base_url, model=model, callbacks=callbacks), model, callbacks)
+    return Provider("ollama", model, _langchain_stream(llm))
+
+
+def gemini_provider(entry_point):
+    import google.generativeai as genai
+
+    model_name = os.getenv("GEMINI_MODEL_NAME", "gemini-1.5-flash")
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+    model = fake_llm.generative_model(genai, model_name)
+
+    def stream(prompt):
+        with llm_metrics.track(entry_point, "gemini", model_name, prompt=prompt) as call:
+            chunks = (chunk.text for chunk in model.generate_content(prompt, stream=True))
+            yield from llm_metrics.tracked_stream(chunks, call)
+
+    return Provider("gemini", model_name, stream)
+
+
+PROVIDERS = {
+    "groq": (groq_provider, "GROQ_API_KEY"),
+    "gemini": (gemini_provider, "GOOGLE_API_KEY"),
+    "ollama": (ollama_provider, None),
+}
+
+
+def configured_providers(entry_point="llm_hedge", names=None):
+    """The providers named in LLM_HEDGE_PROVIDERS (or 'names') that have credentials, in order."""
+    if names is None:
+        names = os.environ.get("LLM_HEDGE_PROVIDERS", DEFAULT_PROVIDERS)
+    if isinstance(names, str):
+        names = [n.strip().lower() for n in names.split(",") if n.strip()]
+    providers = []
+    for name in names:
+        if name not in PROVIDERS:
+            print(f"Warning: unknown hedge provider '{name}' ignored.")
+            continue
+        factory, key = PROVIDERS[name]
+        if key and not os.getenv(key) and not fake_llm.replaying():
+            print(f"Warning: {key} is not set; '{name}' is left out of the hedge.")
+            continue
+        try:
+            providers.append(factory(entry_point))
+        except ImportError as e:
+            print(f"Warning: '{name}' is left out of the hedge: {e}")
+    return providers
+
+
+# --- Hedging ---
+class _Attempt:
+    """One provider's request within a hedged call."""
+
+    def __init__(self, provider, hedged, deadline_ms):
+        self.provider = provider
+        self.hedged = hedged
+        self.deadline_ms = deadline_ms
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.cancelled = threading.Event()
+        self.finished = False
+        self.reported = False  # its outcome has been recorded
+        self.text = None
+        self.code = None
+        self.problems = []
+        self.error = None
+
+
+class HedgePolicy:
+    """
+    Runs a prompt against a list of providers with percentile-deadline hedging, and keeps
+    per-provider first-token samples and outcome counts.
+    """
+
+    def __init__(self, providers, entry_point="llm_hedge", percentile=PERCENTILE,
+                 default_deadline_ms=DEFAULT_DEADLINE_MS, min_samples=MIN_SAMPLES, timeout=TIMEOUT_S):
+        if not providers:
+            raise ValueError("A hedge needs at least one provider.")
+        self.providers = list(providers)
+        self.entry_point = entry_point
+        self.percentile = percentile
+        self.default_deadline_ms = default_deadline_ms
+        self.min_samples = min_samples
+        self.timeout = timeout
+        self.stats = {p.name: Counter() for p in self.providers}
+        self._ttft = {p.name: deque(maxlen=WINDOW) for p in self.providers}
+        self._lock = threading.Lock()
+        self._seed_from_log()
+
+    def _seed_from_log(self):
+        """First-token times of earlier streamed calls to the same models, from the current metrics log."""
+        models = {(p.name, p.model): p.name for p in self.providers}
+        if not os.path.exists(llm_metrics.METRICS_LOG):
+            return
+        with open(llm_metrics.METRICS_LOG, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                name = models.get((entry.get("provider"), entry.get("model")))
+                if name and entry.get("ttft_ms") is not None and (entry.get("kind") == "hedge" or entry.get("streamed")):
+                    self._ttft[name].append(entry["ttft_ms"])
+
+    def deadline_ms(self, provider):
+        samples = list(self._ttft[provider.name])
+        if len(samples) < self.min_samples:
+            return self.default_deadline_ms
+        return float(np.percentile(samples, self.percentile))
+
+    def describe(self):
+        return {p.name: {"model": p.model, "deadline_ms": round(self.deadline_ms(p), 1),
+                         "samples": len(self._ttft[p.name]), **self.stats[p.name]} for p in self.providers}
+
+    # --- One attempt ---
+    def _pump(self, attempt, prompt, events):
+        parts = []
+        stream = None
+        try:
+            stream = attempt.provider.stream(prompt)
+            for chunk in stream:
+                if attempt.cancelled.is_set():
+                    break
+                if attempt.first_token_at is None:
+                    attempt.first_token_at = time.perf_counter()
+                    events.put(("first", attempt))
+                parts.append(chunk or "")
+            attempt.text = "".join(parts)
+            if not attempt.cancelled.is_set():
+                attempt.code, attempt.problems = extract_rego_code(attempt.text)
+        except Exception as e:
+            attempt.error = e
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()  # stops the provider's HTTP stream when a generator is abandoned mid-way
+        with self._lock:
+            attempt.finished = True
+            if attempt.cancelled.is_set():
+                self._finish(attempt, "lost" if attempt.code else "cancelled")
+            else:
+                events.put(("done", attempt))
+
+    def _finish(self, attempt, outcome):
+        """Records an attempt's outcome once; called with self._lock held."""
+        if attempt.reported:
+            return
+        attempt.reported = True
+        now = time.perf_counter()
+        ttft_ms = None
+        if attempt.first_token_at is not None:
+            ttft_ms = round((attempt.first_token_at - attempt.started) * 1000.0, 1)
+            self._ttft[attempt.provider.name].append(ttft_ms)
+        stats = self.stats[attempt.provider.name]
+        stats[outcome] += 1
+        if attempt.hedged:
+            stats["hedged"] += 1
+        llm_metrics.record(
+            kind="hedge",
+            entry_point=self.entry_point,
+            provider=attempt.provider.name,
+            model=attempt.provider.model,
+            outcome=outcome,
+            hedged=attempt.hedged,
+            deadline_ms=round(attempt.deadline_ms, 1),
+            ttft_ms=ttft_ms,
+            latency_ms=round((now - attempt.started) * 1000.0, 1),
+            error=None if attempt.error is None else f"{type(attempt.error).__name__}: {attempt.error}",
+        )
+
+    def _start(self, provider, prompt, events, hedged):
+        attempt = _Attempt(provider, hedged, self.deadline_ms(provider))
+        self.stats[provider.name]["started"] += 1
+        threading.Thread(target=self._pump, args=(attempt, prompt, events), daemon=True).start()
+        return attempt
+
+    # --- A hedged call ---
+    def generate(self, prompt):
+        """
+        (text, code, provider name) of the first answer with a Rego code block. Raises
+        HedgeFailed when no provider produced one, or when the timeout passes first.
+        """
+        events = queue.Queue()
+        waiting = list(self.providers)
+        attempts = [self._start(waiting.pop(0), prompt, events, hedged=False)]
+        running = 1
+        give_up_at = time.perf_counter() + self.timeout
+
+        while True:
+            latest = attempts[-1]
+            timeout = give_up_at - time.perf_counter()
+            if waiting and not any(a.first_token_at for a in attempts if not a.finished):
+                # Hedge when the latest request misses its first-token deadline (or has already failed)
+                hedge_in = 0 if latest.finished else latest.started + latest.deadline_ms / 1000.0 - time.perf_counter()
+                timeout = min(timeout, hedge_in)
+            try:
+                kind, attempt = events.get(timeout=max(timeout, 0))
+            except queue.Empty:
+                if time.perf_counter() >= give_up_at or not waiting:
+                    self._cancel(attempts)
+                    raise HedgeFailed(f"No provider answered within {self.timeout:g}s.")
+                attempts.append(self._start(waiting.pop(0), prompt, events, hedged=True))
+                running += 1
+                continue
+
+            if kind == "first":
+                continue
+            running -= 1
+            with self._lock:
+                if attempt.code:
+                    self._finish(attempt, "won")
+                    for other in attempts:
+                        if other is not attempt and not other.cancelled.is_set():
+                            other.cancelled.set()
+                            if other.finished and not other.reported:  # its "done" is queued and will not be read
+                                self._finish(other, "lost" if other.code else
+                                             "error" if other.error is not None else "invalid")
+                    return attempt.text, attempt.code, attempt.provider.name
+                self._finish(attempt, "error" if attempt.error is not None else "invalid")
+            if running == 0:
+                if not waiting:
+                    raise HedgeFailed("; ".join(self._failure(a) for a in attempts))
+                # Every started request failed: fail over without waiting for a deadline
+                attempts.append(self._start(waiting.pop(0), prompt, events, hedged=True))
+                running += 1
+
+    def _cancel(self, attempts):
+        with self._lock:
+            for attempt in attempts:
+                if not attempt.cancelled.is_set():
+                    attempt.cancelled.set()
+                    if attempt.finished and not attempt.reported:
+                        self._finish(attempt, "cancelled")
+
+    @staticmethod
+    def _failure(attempt):
+        if attempt.error is not None:
+            return f"{attempt.provider.name}: {attempt.error}"
+        return f"{attempt.provider.name}: " + (" ".join(attempt.problems) or "no Rego code block")
+
+
+_policies = {}
+_policies_lock = threading.Lock()
+
+
+def hedge_policy(entry_point="llm_hedge"):
+    """One shared HedgePolicy per entry point, so deadlines learn from every request."""
+    with _policies_lock:
+        if entry_point not in _policies:
+            _policies[entry_point] = HedgePolicy(configured_providers(entry_point), entry_point)
+        return _policies[entry_point]
+
+
+def enabled():
+    """True when LLM_HEDGE_PROVIDERS asks for hedging."""
+    return bool(os.environ.get("LLM_HEDGE_PROVIDERS", "").strip())
+
+
+# --- Stats from the metrics log ---
+def summarize(records):
+    """Per-provider attempts, outcomes, win rate and first-token/latency percentiles of "hedge" records."""
+    groups = {}
+    for entry in records:
+        if entry.get("kind") == "hedge":
+            groups.setdefault(f"{entry.get('provider')}/{entry.get('model')}", []).append(entry)
+    summary = {}
+    for key, entries in sorted(groups.items()):
+        outcomes = Counter(e.get("outcome") for e in entries)
+        wins = [e for e in entries if e.get("outcome") == "won"]
+        ttft = [e["ttft_ms"] for e in entries if e.get("ttft_ms") is not None]
+        summary[key] = {
+            "attempts": len(entries),
+            "hedged": sum(1 for e in entries if e.get("hedged")),
+            **{outcome: outcomes.get(outcome, 0) for outcome in ("won", "lost", "cancelled", "invalid", "error")},
+            "win_rate": round(len(wins) / len(entries), 3),
+            "ttft_p50_ms": round(float(np.percentile(ttft, 50)), 1) if ttft else None,
+            "ttft_p95_ms": round(float(np.percentile(ttft, 95)), 1) if ttft else None,
+            "win_latency_p50_ms": round(float(np.percentile([e["latency_ms"] for e in wins], 50)), 1) if wins else None,
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hedged Rego generation across LLM providers.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    generate = sub.add_parser("generate", help="Generate a Rego policy with hedging.")
+    generate.add_argument("prompt", nargs="+")
+    generate.add_argument("--providers", help="Comma-separated providers (default LLM_HEDGE_PROVIDERS).")
+    stats = sub.add_parser("stats", help="Per-provider win and latency stats from the metrics log.")
+    stats.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        summary = summarize(llm_metrics.read_records())
+        if args.json:
+            print(json.dumps(summary, indent=2))
+            return
+        if not summary:
+            print("No hedged calls recorded yet.")
+            return
+        print(f"{'provider/model':32s} {'tries':>6s} {'hedged':>6s} {'won':>5s} {'lost':>5s} {'cancel':>6s} "
+              f"{'inval':>5s} {'error':>5s} {'win%':>6s} {'ttft50':>8s} {'ttft95':>8s}")
+        for key, s in summary.items():
+            ttft50 = "-" if s["ttft_p50_ms"] is None else f"{s['ttft_p50_ms']:.0f}"
+            ttft95 = "-" if s["ttft_p95_ms"] is None else f"{s['ttft_p95_ms']:.0f}"
+            print(f"{key:32s} {s['attempts']:6d} {s['hedged']:6d} {s['won']:5d} {s['lost']:5d} {s['cancelled']:6d} "
+                  f"{s['invalid']:5d} {s['error']:5d} {s['win_rate'] * 100:5.1f}% {ttft50:>8s} {ttft95:>8s}")
+        return
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    providers = configured_providers("llm_hedge", args.providers)
+    if not providers:
+        print("Error: No hedge provider is available. Set LLM_HEDGE_PROVIDERS and the API keys.")
+        return
+    policy = HedgePolicy(providers)
+    start = time.perf_counter()
+    try:
+        _, code, winner = policy.generate(" ".join(args.prompt))
+    except HedgeFailed as e:
+        print(f"Error: {e}")
+        return
+    print(f"--- Generated Rego Policy ({winner}, {(time.perf_counter() - start) * 1000:.0f}ms) ---")
+    print(code)
+
+
+if __name__ == "__main__":
+    main()
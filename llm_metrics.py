@@ -0,0 +1,356 @@
+"""
+Token, latency and cache accounting for every LLM call site.
+
+Each model invocation appends one JSON line to LLM_METRICS_LOG (llm_metrics.jsonl by
+default). The file rotates at LLM_METRICS_MAX_BYTES and keeps LLM_METRICS_BACKUPS old
+files (llm_metrics.jsonl.1, .2, ...). A record looks like:
+
+    {"ts": "...", "kind": "llm", "entry_point": "rego_chatbot_grok_ui", "provider": "groq",
+     "model": "llama3-70b-8192", "prompt_tokens": 5120, "completion_tokens": 212,
+     "tokens_estimated": false, "ttft_ms": 1840.2, "latency_ms": 2410.7, "streamed": false,
+     "cache_hit": false, "error": null}
+
+There are two ways to hook a call site:
+
+    # LangChain models and agents: attach the callback to the model
+    llm = ChatGroq(..., callbacks=[MetricsCallbackHandler("rego_chatbot_cli")])
+
+    # SDK calls (google.generativeai): wrap the call
+    with track("llm_rego_converser", "gemini", "gemini-1.5-flash") as call:
+        response = chat.send_message(user_input)
+        call.set_usage(*gemini_usage(response))
+
+"llm" records describe one model invocation. "request" records describe one user
+request as its caller saw it, for example a coalesced request: cache_hit is true when
+the answer came from a call that was already in flight. Without streaming, the first
+token arrives with the whole answer, so ttft_ms equals latency_ms. The Groq, Ollama and
+Gemini clients retry failed HTTP calls internally, so one record covers all attempts
+and its latency includes them; retries are not counted separately.
+
+Usage:
+    python llm_metrics.py summary
+    python llm_metrics.py summary --by model --kind llm
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+import numpy as np
+
+try:
+    from langchain_core.callbacks import BaseCallbackHandler
+except ImportError:  # the SDK-only call sites do not need LangChain
+    BaseCallbackHandler = object
+
+# --- Configuration ---
+METRICS_LOG = os.environ.get("LLM_METRICS_LOG", "llm_metrics.jsonl")
+MAX_BYTES = int(os.environ.get("LLM_METRICS_MAX_BYTES", 10 * 1024 * 1024))
+BACKUPS = int(os.environ.get("LLM_METRICS_BACKUPS", 5))
+ENABLED = os.environ.get("LLM_METRICS", "1").lower() not in ("0", "false", "off")
+
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def _metrics_logger():
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            logger = logging.getLogger("llm_metrics")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = RotatingFileHandler(METRICS_LOG, maxBytes=MAX_BYTES, backupCount=BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            _logger = logger
+    return _logger
+
+
+def record(**fields):
+    """Appends one metrics record to the log."""
+    if not ENABLED:
+        return
+    entry = {"ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"), **fields}
+    try:
+        _metrics_logger().info(json.dumps(entry, ensure_ascii=False, default=str))
+    except Exception as e:
+        # Metrics must never break a chat turn
+        print(f"Warning: could not write LLM metrics: {e}")
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token) for providers that report no usage."""
+    return max(1, len(str(text)) // 4) if text else 0
+
+
+# --- Usage extraction ---
+def gemini_usage(response):
+    """(prompt_tokens, completion_tokens) from a google.generativeai response, or (None, None)."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None, None
+    return getattr(usage, "prompt_token_count", None), getattr(usage, "candidates_token_count", None)
+
+
+def langchain_usage(message):
+    """(prompt_tokens, completion_tokens) from a LangChain AIMessage, or (None, None)."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage:
+        return usage.get("input_tokens"), usage.get("output_tokens")
+    metadata = getattr(message, "response_metadata", None) or {}
+    token_usage = metadata.get("token_usage") or {}
+    if token_usage:
+        return token_usage.get("prompt_tokens"), token_usage.get("completion_tokens")
+    # Ollama reports evaluation counts instead
+    if "prompt_eval_count" in metadata or "eval_count" in metadata:
+        return metadata.get("prompt_eval_count"), metadata.get("eval_count")
+    return None, None
+
+
+# --- Wrapping calls ---
+class LLMCall:
+    """Measurements of one call, filled in by the call site inside track()."""
+
+    def __init__(self, entry_point, provider, model, kind="llm", prompt=None):
+        self.entry_point = entry_point
+        self.provider = provider
+        self.model = model
+        self.kind = kind
+        self.prompt = prompt
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.completion_text = None
+        self.cache_hit = False
+        self._wrapped = False
+        self._ran = False
+
+    def first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def set_usage(self, prompt_tokens, completion_tokens):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+    def set_completion(self, text):
+        """The answer text, used to estimate tokens when the provider reports none."""
+        self.completion_text = text
+
+    def wrap(self, fn):
+        """
+        Wraps the function that calls the provider. If the wrapped function never runs
+        (e.g. a coalesced request shared another call), the request counts as a cache hit.
+        """
+        self._wrapped = True
+
+        def run(*args, **kwargs):
+            self._ran = True
+            return fn(*args, **kwargs)
+
+        return run
+
+    def finish(self, error=None):
+        now = time.perf_counter()
+        estimated = False
+        prompt_tokens, completion_tokens = self.prompt_tokens, self.completion_tokens
+        if prompt_tokens is None and self.prompt is not None:
+            prompt_tokens, estimated = estimate_tokens(self.prompt), True
+        if completion_tokens is None and self.completion_text is not None:
+            completion_tokens, estimated = estimate_tokens(self.completion_text), True
+        latency = (now - self.started) * 1000.0
+        record(
+            kind=self.kind,
+            entry_point=self.entry_point,
+            provider=self.provider,
+            model=self.model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            tokens_estimated=estimated,
+            ttft_ms=round((self.first_token_at - self.started) * 1000.0, 1) if self.first_token_at else
+            (round(latency, 1) if error is None else None),
+            latency_ms=round(latency, 1),
+            streamed=self.first_token_at is not None,
+            cache_hit=self.cache_hit or (self._wrapped and not self._ran),
+            error=None if error is None else f"{type(error).__name__}: {error}",
+        )
+
+
+@contextmanager
+def track(entry_point, provider, model, kind="llm", prompt=None):
+    """Times the enclosed call and logs it, including failures (which are re-raised)."""
+    call = LLMCall(entry_point, provider, model, kind, prompt)
+    try:
+        yield call
+    except BaseException as e:
+        call.finish(error=e)
+        raise
+    call.finish()
+
+
+def tracked_stream(chunks, call, text=lambda chunk: chunk):
+    """Passes a stream through, marking the first chunk and collecting the text for token estimates."""
+    parts = []
+    for chunk in chunks:
+        call.first_token()
+        parts.append(text(chunk) or "")
+        yield chunk
+    call.set_completion("".join(parts))
+
+
+# --- LangChain ---
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback that logs one "llm" record per model call, including the calls an
+    agent makes while reasoning. Attach it to the model (callbacks=[...]) so every chain
+    and agent built on that model is covered.
+    """
+
+    def __init__(self, entry_point):
+        super().__init__()
+        self.entry_point = entry_point
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, serialized, kwargs, prompt_text):
+        params = kwargs.get("invocation_params") or {}
+        provider = params.get("_type") or ((serialized or {}).get("id") or ["unknown"])[-1]
+        model = params.get("model_name") or params.get("model") or \
+            ((serialized or {}).get("kwargs") or {}).get("model_name") or "unknown"
+        with self._lock:
+            self._calls[run_id] = LLMCall(self.entry_point, provider, model, prompt=prompt_text)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, serialized, kwargs, "\n".join(prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        text = "\n".join(str(getattr(m, "content", m)) for batch in messages for m in batch)
+        self._start(run_id, serialized, kwargs, text)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        call = self._calls.get(run_id)
+        if call is not None:
+            call.first_token()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        if call is None:
+            return
+        token_usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+        prompt_tokens, completion_tokens = token_usage.get("prompt_tokens"), token_usage.get("completion_tokens")
+        generations = [g for batch in (getattr(response, "generations", None) or []) for g in batch]
+        if prompt_tokens is None and generations:
+            message = getattr(generations[0], "message", None)
+            if message is not None:
+                prompt_tokens, completion_tokens = langchain_usage(message)
+        call.set_usage(prompt_tokens, completion_tokens)
+        call.set_completion("".join(getattr(g, "text", "") for g in generations))
+        call.finish()
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        if call is not None:
+            call.finish(error=error)
+
+
+# --- Summary ---
+def log_files(path=METRICS_LOG):
+    """The log and its rotated backups, oldest first."""
+    backups = [f"{path}.{i}" for i in range(BACKUPS, 0, -1)]
+    return [p for p in backups + [path] if os.path.exists(p)]
+
+
+def read_records(path=METRICS_LOG):
+    for file_path in log_files(path):
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+
+def _percentiles(values, points=(50, 90, 99)):
+    values = [v for v in values if v is not None]
+    if not values:
+        return {f"p{p}": None for p in points}
+    return {f"p{p}": round(float(np.percentile(values, p)), 1) for p in points}
+
+
+def summarize(records, by="entry_point"):
+    """
+    Per-group counts, error and cache-hit rates, token totals and latency/TTFT percentiles.
+    Groups are split by record kind ("rego_bot (llm)", "rego_bot (request)"), so model calls,
+    user requests and hedge attempts are never counted or timed together.
+    """
+    groups = {}
+    for entry in records:
+        key = f"{entry.get(by) or 'unknown'} ({entry.get('kind') or 'llm'})"
+        groups.setdefault(key, []).append(entry)
+    summary = {}
+    for key, entries in sorted(groups.items()):
+        summary[key] = {
+            "calls": len(entries),
+            "errors": sum(1 for e in entries if e.get("error")),
+            "cache_hits": sum(1 for e in entries if e.get("cache_hit")),
+            "prompt_tokens": sum(e.get("prompt_tokens") or 0 for e in entries),
+            "completion_tokens": sum(e.get("completion_tokens") or 0 for e in entries),
+            "latency_ms": _percentiles([e.get("latency_ms") for e in entries]),
+            "ttft_ms": _percentiles([e.get("ttft_ms") for e in entries]),
+        }
+    return summary
+
+
+def print_summary(summary, by):
+    header = (f"{by + ' (kind)':36s} {'calls':>6s} {'err':>4s} {'hits':>5s} {'prompt tok':>11s} "
+              f"{'compl tok':>10s}  {'latency p50/p90/p99 ms':>24s}  {'ttft p50/p99 ms':>16s}")
+    print(header)
+    print("-" * len(header))
+
+    def fmt(value):
+        return "-" if value is None else f"{value:.0f}"
+
+    for key, s in summary.items():
+        latency, ttft = s["latency_ms"], s["ttft_ms"]
+        print(f"{str(key)[:36]:36s} {s['calls']:6d} {s['errors']:4d} {s['cache_hits']:5d} "
+              f"{s['prompt_tokens']:11d} {s['completion_tokens']:10d}  "
+              f"{fmt(latency['p50']) + '/' + fmt(latency['p90']) + '/' + fmt(latency['p99']):>24s}  "
+              f"{fmt(ttft['p50']) + '/' + fmt(ttft['p99']):>16s}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the LLM metrics log.")
+    parser.add_argument("command", choices=("summary",))
+    parser.add_argument("--log", default=METRICS_LOG, help="Metrics log (rotated backups are read too).")
+    parser.add_argument("--by", default="entry_point", choices=("entry_point", "provider", "model"),
+                        help="Group records by this field.")
+    parser.add_argument("--kind", choices=("llm", "request", "hedge"),
+                        help="Only records of this kind (by default each kind is its own group).")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+    args = parser.parse_args()
+
+    if not log_files(args.log):
+        print(f"Error: The file '{args.log}' was not found.")
+        return
+    records = [r for r in read_records(args.log) if not args.kind or r.get("kind") == args.kind]
+    summary = summarize(records, args.by)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary, args.by)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,15 @@
 import google.generativeai as genai
 import os
 from dotenv import load_dotenv
+from llm_metrics import gemini_usage, track
+import fake_llm
 
 # --- Configuration ---
 load_dotenv() # Load environment variables from .env file
 
 API_KEY = os.getenv("GEMINI_API_KEY")
 
-if not API_KEY:
+if not API_KEY and not fake_llm.replaying():
     print("Error: GEMINI_API_KEY not found. Please set it as an environment variable.")
     print("You can get an API key from Google AI Studio: https://aistudio.google.com/app/apikey")
     exit()
@@ -37,7 +39,8 @@ if __name__ == "__main__":
     format_txt_content = read_file_content(FORMAT_TXT_PATH)
 
     # Initialize the Generative Model
-    model = genai.GenerativeModel('gemini-1.5-flash') # You can choose other models like 'gemini-1.5-pro-latest'
+    # LLM_PROVIDER=fake replays recorded answers instead (see fake_llm.py)
+    model = fake_llm.generative_model(genai, 'gemini-1.5-flash') # You can choose other models like 'gemini-1.5-pro-latest'
 
     # Start a new chat session
     # The initial message provides the LLM with the context of the files
@@ -74,7 +77,9 @@ if __name__ == "__main__":
 
         try:
             # Send user input to the LLM and get its response
-            response = chat.send_message(user_input)
+            with track("llm_rego_converser", "gemini", "gemini-1.5-flash") as call:
+                response = chat.send_message(user_input)
+                call.set_usage(*gemini_usage(response))
             print(f"Bot: {response.text}")
 
         except Exception as e:
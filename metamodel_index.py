@@ -0,0 +1,311 @@
+"""
+Persistent ancestor/descendant index for metamodel types.
+
+The metamodel CSV (columns 'metamodel_type_name' and 'metamodel_type_parent_types')
+describes a containment hierarchy where a type can have several parents. Instead of
+rebuilding the networkx graph from generate_hierarchy_graph.py for every question, this
+module precomputes a compressed transitive closure (interval labelling over a spanning
+forest, Agrawal/Borgida/Jagadish style) and stores it as JSON:
+
+* every type gets a post-order number on a spanning forest of the hierarchy,
+* every type keeps a short, sorted list of [low, high] post-order intervals covering
+  all of its descendants (a single interval when the hierarchy is a tree).
+
+"Is X under Y?" is a binary search in Y's interval list (O(1) for tree-shaped parts),
+and "which types sit under Y?" is a slice of the post-order list per interval, so the
+cost is linear in the size of the answer.
+
+Usage:
+    python metamodel_index.py build metamodel_Huawei.csv -o metamodel_index.json
+    python metamodel_index.py descendants ENODEBFUNCTION -i metamodel_index.json
+    python metamodel_index.py is-under CELL ENODEBFUNCTION -i metamodel_index.json
+"""
+
+import argparse
+import bisect
+import csv
+import hashlib
+import json
+import os
+
+INDEX_VERSION = 1
+DEFAULT_INDEX_PATH = "metamodel_index.json"
+
+NAME_COLUMN = "metamodel_type_name"
+PARENTS_COLUMN = "metamodel_type_parent_types"
+
+
+def _parse_parents(raw):
+    """Splits the comma separated parent list, ignoring the 'false'/'nan' placeholders."""
+    raw = (raw or "").strip()
+    if not raw or raw.lower() in ("false", "nan", "none"):
+        return []
+    return [p.strip() for p in raw.split(",") if p.strip()]
+
+
+def read_metamodel_csv(csv_path):
+    """Returns a {type_name: [parent_names]} mapping read from the metamodel CSV."""
+    parents = {}
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            name = (row.get(NAME_COLUMN) or "").strip()
+            if not name:
+                continue
+            entry = parents.setdefault(name, [])
+            for parent in _parse_parents(row.get(PARENTS_COLUMN)):
+                parents.setdefault(parent, [])
+                if parent not in entry and parent != name:
+                    entry.append(parent)
+    return parents
+
+
+def _merge_intervals(intervals):
+    """Sorts intervals and merges overlapping or adjacent ones."""
+    merged = []
+    for low, high in sorted(intervals):
+        if merged and low <= merged[-1][1] + 1:
+            if high > merged[-1][1]:
+                merged[-1][1] = high
+        else:
+            merged.append([low, high])
+    return merged
+
+
+class HierarchyIndex:
+    """Read-only view over a precomputed metamodel closure."""
+
+    def __init__(self, order, intervals, parents, source=None, source_sha256=None):
+        self.order = order
+        self.intervals = intervals
+        self.parents = parents
+        self.source = source
+        self.source_sha256 = source_sha256
+        self.position = {name: pos for pos, name in enumerate(order)}
+        self._starts = {name: [low for low, _ in spans] for name, spans in intervals.items()}
+        self._by_key = {name.casefold(): name for name in order}
+
+    def __contains__(self, name):
+        return self.resolve(name) is not None
+
+    def __len__(self):
+        return len(self.order)
+
+    def resolve(self, name):
+        """Maps a (case-insensitive) type name to the canonical name stored in the index."""
+        if name is None:
+            return None
+        name = str(name).strip()
+        if name in self.position:
+            return name
+        return self._by_key.get(name.casefold())
+
+    def is_descendant(self, name, ancestor, include_self=False):
+        """True when 'name' sits (transitively) under 'ancestor'."""
+        name, ancestor = self.resolve(name), self.resolve(ancestor)
+        if name is None or ancestor is None:
+            return False
+        if name == ancestor:
+            return include_self
+        pos = self.position[name]
+        spans = self.intervals[ancestor]
+        i = bisect.bisect_right(self._starts[ancestor], pos) - 1
+        return i >= 0 and spans[i][0] <= pos <= spans[i][1]
+
+    def is_ancestor(self, name, descendant, include_self=False):
+        """True when 'name' is (transitively) above 'descendant'."""
+        return self.is_descendant(descendant, name, include_self=include_self)
+
+    def descendants(self, name, include_self=False):
+        """Lists every type under 'name' in post-order; empty for unknown types."""
+        name = self.resolve(name)
+        if name is None:
+            return []
+        own = self.position[name]
+        result = []
+        for low, high in self.intervals[name]:
+            for pos in range(low, high + 1):
+                if pos != own or include_self:
+                    result.append(self.order[pos])
+        return result
+
+    def children(self, name):
+        """Direct children of 'name'."""
+        name = self.resolve(name)
+        if name is None:
+            return []
+        return [child for child in self.descendants(name) if name in self.parents.get(child, ())]
+
+    def ancestors(self, name, include_self=False):
+        """Lists every type above 'name' by walking the (short) parent chains."""
+        name = self.resolve(name)
+        if name is None:
+            return []
+        seen = {name}
+        result = [name] if include_self else []
+        stack = list(self.parents.get(name, ()))
+        while stack:
+            parent = stack.pop()
+            if parent in seen:
+                continue
+            seen.add(parent)
+            result.append(parent)
+            stack.extend(self.parents.get(parent, ()))
+        return result
+
+    def expand(self, name):
+        """The type itself followed by all of its descendants (used to fan a parent MO out into per-child rules)."""
+        return self.descendants(name, include_self=True)
+
+    def to_dict(self):
+        return {
+            "version": INDEX_VERSION,
+            "source": self.source,
+            "source_sha256": self.source_sha256,
+            "order": self.order,
+            "intervals": self.intervals,
+            "parents": self.parents,
+        }
+
+
+def build_index(parents, source=None, source_sha256=None):
+    """Builds a HierarchyIndex from a {type: [parents]} mapping."""
+    children = {name: [] for name in parents}
+    for name, name_parents in parents.items():
+        for parent in name_parents:
+            children.setdefault(parent, []).append(name)
+    for name in children:
+        parents.setdefault(name, [])
+
+    # Post-order numbering over a spanning forest (first parent that reaches a node owns it).
+    order = []
+    tree_low = {}
+    visited = set()
+    roots = [name for name in parents if not parents[name]]
+    # Types only reachable through a cycle still need a number, so they are used as extra roots.
+    for root in roots + list(parents):
+        if root in visited:
+            continue
+        visited.add(root)
+        stack = [(root, iter(children[root]), len(order))]
+        while stack:
+            node, it, low = stack[-1]
+            child = next((c for c in it if c not in visited), None)
+            if child is not None:
+                visited.add(child)
+                stack.append((child, iter(children[child]), len(order)))
+                continue
+            stack.pop()
+            tree_low[node] = low
+            order.append(node)
+    position = {name: pos for pos, name in enumerate(order)}
+
+    # Reverse topological sweep: a node's closure is its tree interval plus its children's closures.
+    # Non-tree edges are what add extra intervals. Cycles are resolved by the spanning forest only.
+    indegree = {name: 0 for name in parents}
+    for name in parents:
+        for child in children[name]:
+            indegree[child] += 1
+    topo = [name for name, degree in indegree.items() if degree == 0]
+    for node in topo:
+        for child in children[node]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                topo.append(child)
+    in_topo = set(topo)
+    topo.extend(name for name in order if name not in in_topo)
+
+    intervals = {}
+    for node in reversed(topo):
+        spans = [[tree_low[node], position[node]]]
+        for child in children[node]:
+            spans.extend(intervals.get(child, [[tree_low[child], position[child]]]))
+        intervals[node] = _merge_intervals(spans)
+
+    return HierarchyIndex(order, intervals, parents, source=source, source_sha256=source_sha256)
+
+
+def _sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_index_from_csv(csv_path):
+    """Reads the metamodel CSV and returns its HierarchyIndex."""
+    return build_index(read_metamodel_csv(csv_path), source=os.path.abspath(csv_path), source_sha256=_sha256_of(csv_path))
+
+
+def save_index(index, path=DEFAULT_INDEX_PATH):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(index.to_dict(), f, ensure_ascii=False)
+
+
+def load_index(path=DEFAULT_INDEX_PATH):
+    """Loads an index written by save_index()."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != INDEX_VERSION:
+        raise ValueError(f"Unsupported metamodel index version in '{path}': {data.get('version')}")
+    return HierarchyIndex(
+        data["order"],
+        {name: [list(span) for span in spans] for name, spans in data["intervals"].items()},
+        data["parents"],
+        source=data.get("source"),
+        source_sha256=data.get("source_sha256"),
+    )
+
+
+def load_index_if_available(path=None):
+    """
+    Loads the hierarchy index named by 'path' or the METAMODEL_INDEX environment variable,
+    falling back to metamodel_index.json. Returns None when no index is available.
+    """
+    path = path or os.environ.get("METAMODEL_INDEX", DEFAULT_INDEX_PATH)
+    if not os.path.exists(path):
+        return None
+    try:
+        return load_index(path)
+    except Exception as e:
+        print(f"Error loading metamodel index '{path}': {e}. Continuing without hierarchy expansion.")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the metamodel hierarchy index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Build the index from a metamodel CSV.")
+    build_parser.add_argument("csv_path", help="Path to the metamodel CSV file.")
+    build_parser.add_argument("-o", "--output", default=DEFAULT_INDEX_PATH, help="Where to write the index.")
+
+    desc_parser = subparsers.add_parser("descendants", help="List every type under a parent type.")
+    desc_parser.add_argument("parent")
+    desc_parser.add_argument("-i", "--index", default=DEFAULT_INDEX_PATH)
+
+    under_parser = subparsers.add_parser("is-under", help="Check whether a type sits under a parent type.")
+    under_parser.add_argument("name")
+    under_parser.add_argument("parent")
+    under_parser.add_argument("-i", "--index", default=DEFAULT_INDEX_PATH)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        index = build_index_from_csv(args.csv_path)
+        save_index(index, args.output)
+        print(f"Indexed {len(index)} metamodel types into {args.output}.")
+    elif args.command == "descendants":
+        index = load_index(args.index)
+        if args.parent not in index:
+            print(f"Unknown metamodel type: {args.parent}")
+            return
+        for name in index.descendants(args.parent):
+            print(name)
+    elif args.command == "is-under":
+        index = load_index(args.index)
+        print("yes" if index.is_descendant(args.name, args.parent) else "no")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Zip and tar.gz archives of generated policy files, produced as a stream of byte chunks.
+
+Each file is compressed and handed out as soon as it is added, so a web response can send
+the archive while the remaining files are still being generated; only the file being
+added is held in memory, never the whole archive. zip output uses data descriptors,
+which is how zipfile writes to a stream that cannot seek.
+
+    for chunk in stream_archive([("a.rego", text), ...], "zip"):
+        response.write(chunk)
+"""
+
+import io
+import tarfile
+import time
+import zipfile
+
+FORMATS = {
+    "zip": ("application/zip", ".zip"),
+    "tar.gz": ("application/gzip", ".tar.gz"),
+}
+
+
+class _ChunkWriter(io.RawIOBase):
+    """A write-only, non-seekable file that collects what is written until drained."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _encoded(content):
+    return content.encode("utf-8") if isinstance(content, str) else content
+
+
+def stream_zip(files):
+    """Yields a zip archive of (name, content) pairs in chunks."""
+    out = _ChunkWriter()
+    date_time = time.localtime()[:6]
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files:
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            archive.writestr(info, _encoded(content))
+            chunk = out.drain()
+            if chunk:
+                yield chunk
+    yield out.drain()  # the central directory
+
+
+def stream_tar_gz(files):
+    """Yields a gzip-compressed tar archive of (name, content) pairs in chunks."""
+    out = _ChunkWriter()
+    mtime = time.time()
+    with tarfile.open(fileobj=out, mode="w|gz") as archive:
+        for name, content in files:
+            content = _encoded(content)
+            info = tarfile.TarInfo(name=name)
+            info.size = len(content)
+            info.mode = 0o644
+            info.mtime = mtime
+            archive.addfile(info, io.BytesIO(content))
+            chunk = out.drain()
+            if chunk:
+                yield chunk
+    yield out.drain()
+
+
+def stream_archive(files, archive_format="zip"):
+    if archive_format == "zip":
+        return stream_zip(files)
+    if archive_format == "tar.gz":
+        return stream_tar_gz(files)
+    raise ValueError(f"Unsupported archive format '{archive_format}' (expected {' or '.join(FORMATS)})")
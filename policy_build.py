@@ -0,0 +1,334 @@
+"""
+Incremental build of the generated policies from master.csv and Slice-policyupdated.xlsx.
+
+Every source row is hashed by content, and every output file is built from a known list of
+rows:
+
+    consistency/<Vendor>/<MO Type>/data.json   master.csv rules for one vendor and MO Type
+                                               (data.consistency[vendor][mo_type], the same
+                                               layout consistency_bundle.py writes as one file)
+    policy/consistency/policy.rego             the generic evaluator for those rules
+    slice/<use case>.rego                      one package per Use Case of the slice sheet (policy_ir)
+    .manifest                                  OPA bundle revision and roots
+
+The build manifest (policy_build.json) records each row hash with the outputs it feeds,
+and each output with its ordered row hashes and content hash. A rebuild re-renders only
+the outputs whose rows were added, changed, removed or reordered, plus any output file
+that is missing or was edited by hand. Files whose content did not change are not
+rewritten, so an OPA bundle reload only picks up the packages that really changed.
+Outputs that lost all of their rows are deleted. What changed is printed and written to
+policy_build_changes.json.
+
+Usage:
+    python policy_build.py                       # build or update ./policy_bundle/
+    python policy_build.py --full                # re-render everything
+    python policy_build.py --out other_dir --csv master.csv --xlsx rag_slicepolicy/Slice-policyupdated.xlsx
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from consistency_bundle import DATA_ROOT, POLICY_PACKAGE, POLICY_REGO, compile_consistency
+
+# The slice-policy IR and readers live with the RAG pipeline
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "rag_slicepolicy"))
+from ingest import iter_source_chunks  # noqa: E402
+from policy_ir import compile_policy  # noqa: E402
+
+# --- Configuration ---
+CSV_PATH = "master.csv"
+XLSX_PATH = os.path.join("rag_slicepolicy", "Slice-policyupdated.xlsx")
+OUT_DIR = "policy_bundle"
+MANIFEST_PATH = "policy_build.json"
+SUMMARY_PATH = "policy_build_changes.json"
+SLICE_ROOT = "slice"
+# Bump when the rendering changes, so the next build re-renders every output
+RENDER_VERSION = 1
+
+POLICY_PATH = "/".join(POLICY_PACKAGE.split(".") + ["policy.rego"])
+
+_UNSAFE_SEGMENT_RE = re.compile(r"[\\/\x00]")
+
+
+# --- Source rows ---
+def read_rows(path):
+    """The rows of a .csv or .xlsx source as {column: string} dicts, with stray header spaces removed."""
+    rows = []
+    for chunk in iter_source_chunks(path):
+        chunk.columns = [str(column).strip() for column in chunk.columns]
+        rows += chunk.to_dict(orient="records")
+    return rows
+
+
+def row_hashes(source, rows):
+    """
+    Content hash per row. Identical rows get an occurrence suffix, so each keeps its own
+    stable hash (as in rag_slicepolicy/create_vector_store.py).
+    """
+    seen = {}
+    hashes = []
+    for row in rows:
+        content = json.dumps(row, sort_keys=True, ensure_ascii=False)
+        occurrence = seen.get(content, 0)
+        seen[content] = occurrence + 1
+        hashes.append(hashlib.sha256(f"{source}\x00{content}\x00{occurrence}".encode("utf-8")).hexdigest()[:32])
+    return hashes
+
+
+def package_name(text):
+    """A Rego package segment for a Use Case: lower case, non-identifier characters as '_'."""
+    name = re.sub(r"[^a-z0-9_]+", "_", str(text).strip().lower()).strip("_") or "unnamed"
+    return name if not name[0].isdigit() else "_" + name
+
+
+def consistency_output(row):
+    """Output path of a master.csv row, or None when the row cannot be compiled."""
+    vendor = str(row.get("Vendor", "")).strip()
+    mo_type = str(row.get("MO Type", "")).strip()
+    if not vendor or not mo_type or not str(row.get("Checking Attribute", "")).strip():
+        return None
+    if _UNSAFE_SEGMENT_RE.search(vendor + mo_type) or vendor in (".", "..") or mo_type in (".", ".."):
+        return None
+    return f"{DATA_ROOT}/{vendor}/{mo_type}/data.json"
+
+
+def slice_output(row):
+    """Output path of a slice sheet row: its Use Case's package."""
+    return f"{SLICE_ROOT}/{package_name(row.get('Use Case') or 'unnamed')}.rego"
+
+
+def render_consistency(rows):
+    # All rows share one vendor and MO Type; rows with unsupported operations leave it empty
+    rules, _ = compile_consistency(pd.DataFrame(rows))
+    attributes = next(iter(next(iter(rules.values()), {}).values()), {})
+    return json.dumps(attributes, indent=2, ensure_ascii=False, sort_keys=True) + "\n"
+
+
+def render_slice(rows):
+    use_case = str(rows[0].get("Use Case", "")).strip()
+    return compile_policy(rows, package=f"{SLICE_ROOT}.{package_name(use_case or 'unnamed')}")
+
+
+# source name -> (output path of a row, renderer of one output from its rows, columns naming a row in summaries)
+SOURCES = {
+    "master.csv": (consistency_output, render_consistency, ("Vendor", "MO Type", "Checking Attribute")),
+    "slice sheet": (slice_output, render_slice, ("Use Case", "Full Path", "MO Type", "Attribute")),
+}
+
+
+def plan_outputs(sources):
+    """
+    {output path: (renderer, rows, row hashes)} and {row hash: info} for the given
+    {source name: rows}. Rows that cannot be compiled are kept in the row table with no output.
+    """
+    outputs = {}
+    row_table = {}
+    for source, rows in sources.items():
+        assign, renderer, key_columns = SOURCES[source]
+        for row, row_hash in zip(rows, row_hashes(source, rows)):
+            path = assign(row)
+            row_table[row_hash] = {"source": source, "key": [str(row.get(c, "")).strip() for c in key_columns],
+                                   "outputs": [path] if path else []}
+            if path:
+                _, output_rows, hashes = outputs.setdefault(path, (renderer, [], []))
+                output_rows.append(row)
+                hashes.append(row_hash)
+    return outputs, row_table
+
+
+# --- Manifest ---
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("render_version") == RENDER_VERSION else None
+
+
+def save_json(data, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def content_hash(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def file_hash(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def remove_file(out_dir, relative_path):
+    """Deletes an output and the directories it leaves empty."""
+    path = os.path.join(out_dir, *relative_path.split("/"))
+    if os.path.exists(path):
+        os.remove(path)
+    directory = os.path.dirname(path)
+    while os.path.normpath(directory) != os.path.normpath(out_dir) and os.path.isdir(directory) \
+            and not os.listdir(directory):
+        os.rmdir(directory)
+        directory = os.path.dirname(directory)
+
+
+# --- Build ---
+def row_changes(old_rows, new_rows):
+    """Added, changed and removed rows per source. A changed row keeps its key columns but not its content."""
+    changes = {}
+    added = [h for h in new_rows if h not in old_rows]
+    removed = [h for h in old_rows if h not in new_rows]
+    for source in SOURCES:
+        removed_keys = {}
+        for h in removed:
+            if old_rows[h]["source"] == source:
+                removed_keys.setdefault(tuple(old_rows[h]["key"]), []).append(h)
+        entry = {"added": [], "changed": [], "removed": []}
+        for h in added:
+            if new_rows[h]["source"] != source:
+                continue
+            key = tuple(new_rows[h]["key"])
+            if removed_keys.get(key):
+                removed_keys[key].pop()
+                entry["changed"].append(" / ".join(key))
+            else:
+                entry["added"].append(" / ".join(key))
+        entry["removed"] = [" / ".join(key) for key, hashes in removed_keys.items() for _ in hashes]
+        changes[source] = entry
+    return changes
+
+
+def build(sources, out_dir=OUT_DIR, manifest_path=MANIFEST_PATH, full=False):
+    """
+    Brings out_dir up to date with the source rows. Returns the change summary; only
+    affected outputs are rendered and only outputs whose content changed are written.
+    """
+    manifest = load_manifest(manifest_path)
+    if manifest and manifest.get("out_dir") != out_dir:
+        manifest = None  # it describes another directory
+    old_outputs = manifest["outputs"] if manifest else {}
+    old_rows = manifest["rows"] if manifest else {}
+    reuse = manifest is not None and not full
+
+    outputs, row_table = plan_outputs(sources)
+    static = {POLICY_PATH: POLICY_REGO}
+
+    result = {"created": [], "updated": [], "deleted": [], "unchanged": 0, "rendered": 0}
+    new_outputs = {}
+    for path in list(outputs) + list(static):
+        previous = old_outputs.get(path)
+        file_path = os.path.join(out_dir, *path.split("/"))
+        if path in static:
+            hashes = []
+        else:
+            renderer, rows, hashes = outputs[path]
+        current_hash = file_hash(file_path)
+        if reuse and previous and previous["rows"] == hashes and previous["sha256"] == current_hash:
+            new_outputs[path] = previous
+            result["unchanged"] += 1
+            continue
+        content = static[path] if path in static else renderer(rows)
+        result["rendered"] += 1
+        digest = content_hash(content)
+        if digest != current_hash:
+            write_file(file_path, content)
+            result["updated" if current_hash else "created"].append(path)
+        else:
+            result["unchanged"] += 1
+        new_outputs[path] = {"rows": hashes, "sha256": digest}
+
+    for path in old_outputs:
+        if path not in new_outputs and path != ".manifest":
+            remove_file(out_dir, path)
+            result["deleted"].append(path)
+
+    # The OPA bundle manifest changes only when an output did
+    revision = hashlib.sha256("".join(f"{p}\x00{o['sha256']}\n" for p, o in sorted(new_outputs.items()))
+                              .encode("utf-8")).hexdigest()[:16]
+    bundle_manifest = json.dumps({"revision": revision,
+                                  "roots": [DATA_ROOT, POLICY_PACKAGE.replace(".", "/"), SLICE_ROOT]}, indent=2)
+    bundle_manifest_path = os.path.join(out_dir, ".manifest")
+    if file_hash(bundle_manifest_path) != content_hash(bundle_manifest):
+        write_file(bundle_manifest_path, bundle_manifest)
+
+    save_json({"render_version": RENDER_VERSION, "out_dir": out_dir, "revision": revision,
+               "rows": row_table, "outputs": new_outputs}, manifest_path)
+
+    summary = {
+        "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": revision,
+        "full": not reuse,
+        "rows": row_changes(old_rows, row_table),
+        "outputs": {key: result[key] for key in ("created", "updated", "deleted")},
+        "rendered": result["rendered"],
+        "unchanged": result["unchanged"],
+        "skipped_rows": sum(1 for info in row_table.values() if not info["outputs"]),
+    }
+    return summary
+
+
+def print_summary(summary):
+    print(f"Revision {summary['revision']}" + (" (full build)" if summary["full"] else ""))
+    for source, changes in summary["rows"].items():
+        counts = ", ".join(f"{len(changes[kind])} {kind}" for kind in ("added", "changed", "removed"))
+        print(f"  {source}: {counts} rows")
+        for kind in ("added", "changed", "removed"):
+            for key in changes[kind][:10]:
+                print(f"    {kind:8s} {key}")
+            if len(changes[kind]) > 10:
+                print(f"    ... {len(changes[kind]) - 10} more {kind}")
+    outputs = summary["outputs"]
+    print(f"  outputs: {len(outputs['created'])} created, {len(outputs['updated'])} updated, "
+          f"{len(outputs['deleted'])} deleted, {summary['unchanged']} unchanged ({summary['rendered']} rendered)")
+    for kind in ("created", "updated", "deleted"):
+        for path in outputs[kind]:
+            print(f"    {kind:8s} {path}")
+    if summary["skipped_rows"]:
+        print(f"  {summary['skipped_rows']} rows without Vendor, MO Type or Checking Attribute were skipped.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally rebuild the generated policies from the source sheets.")
+    parser.add_argument("--csv", default=CSV_PATH, help="Consistency rule sheet.")
+    parser.add_argument("--xlsx", default=XLSX_PATH, help="Slice policy sheet.")
+    parser.add_argument("--out", default=OUT_DIR, help="Bundle directory to update.")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="Build manifest (row hashes -> outputs).")
+    parser.add_argument("--summary", default=SUMMARY_PATH, help="Where to write the change summary.")
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and re-render every output.")
+    args = parser.parse_args()
+
+    sources = {}
+    for source, path in (("master.csv", args.csv), ("slice sheet", args.xlsx)):
+        if not os.path.exists(path):
+            print(f"Error: The file '{path}' was not found.")
+            return
+        sources[source] = read_rows(path)
+
+    summary = build(sources, args.out, args.manifest, full=args.full)
+    save_json(summary, args.summary)
+    print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Recall/latency/memory benchmark for the index types in index_factory.py.
+
+Every candidate index is compared with the exact flat baseline on the same vectors:
+recall@k is the fraction of the true k nearest neighbours it returns, latency is
+measured per single query (p50/p99), and memory is the serialized index size.
+
+Quantized types (sq_fp16, sq8, pq, ivf_pq) are measured twice: on their own and with
+the rerank step against the exact vectors memory-mapped from disk, which is what the
+retriever does. The closing memory-vs-recall table gives bytes per vector (RAM) and,
+with --project-rows, the RAM needed for a corpus of that size.
+
+Usage:
+    python benchmark_index.py --synthetic 200000
+    python benchmark_index.py --vectors rag_embedding_cache.npz --types flat,hnsw --ef-search 32
+    python benchmark_index.py --synthetic 100000 --types flat,sq_fp16,sq8,pq --project-rows 5000000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import faiss
+
+from exact_vectors import ExactVectors, write_exact_vectors
+from index_factory import INDEX_TYPES, build_index, index_spec, rerank_factor
+
+
+def synthetic_vectors(n, dimension=384, clusters=256, seed=0):
+    """Clustered, L2-normalized vectors (closer to sentence embeddings than uniform noise)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype("float32")
+    assignments = rng.integers(0, clusters, size=n)
+    vectors = centers[assignments] + 0.35 * rng.standard_normal((n, dimension)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def load_vectors(path):
+    """Loads vectors from a .npy matrix or the embedding cache written by create_vector_store.py."""
+    if path.endswith(".npz"):
+        with np.load(path, allow_pickle=False) as data:
+            return np.ascontiguousarray(data["embeddings"], dtype="float32")
+    return np.ascontiguousarray(np.load(path), dtype="float32")
+
+
+def make_queries(vectors, n_queries, noise=0.05, seed=1):
+    """Perturbed copies of corpus vectors, so queries are near but not identical to stored rows."""
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(vectors), size=n_queries)
+    queries = vectors[rows] + noise * rng.standard_normal((n_queries, vectors.shape[1])).astype("float32")
+    return np.ascontiguousarray(queries, dtype="float32")
+
+
+def recall_at_k(found, truth):
+    k = truth.shape[1]
+    hits = sum(len(set(f[f != -1]) & set(t)) for f, t in zip(found, truth))
+    return hits / float(len(truth) * k)
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000.0) if samples else 0.0
+
+
+def timed_search(search, queries, k):
+    """Runs search(queries, k) one query at a time and once as a batch. Returns (found, latencies, batch_seconds)."""
+    latencies = []
+    found = np.empty((len(queries), k), dtype="int64")
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        _, result = search(queries[i:i + 1], k)
+        latencies.append(time.perf_counter() - start)
+        found[i] = result[0]
+
+    start = time.perf_counter()
+    search(queries, k)
+    batch_seconds = time.perf_counter() - start
+    return found, latencies, batch_seconds
+
+
+def benchmark_index(spec, vectors, queries, truth, k, exact=None):
+    """Builds and measures one index. 'exact' (ExactVectors) enables the rerank pass for quantized specs."""
+    ids = np.arange(len(vectors), dtype="int64")
+    start = time.perf_counter()
+    index, fitted = build_index(spec, vectors, ids)
+    build_seconds = time.perf_counter() - start
+
+    found, _, _ = timed_search(index.search, queries, k)
+    recall = recall_at_k(found, truth)
+    rerank = rerank_factor(fitted)
+    if rerank and exact is not None:
+        def search(q, n):
+            _, candidates = index.search(q, n * rerank)
+            return exact.rerank(q, candidates, n)
+
+        found, latencies, batch_seconds = timed_search(search, queries, k)
+    else:
+        _, latencies, batch_seconds = timed_search(index.search, queries, k)
+        rerank = 0
+
+    memory_bytes = int(faiss.serialize_index(index).nbytes)
+    return {
+        "spec": fitted,
+        "recall_at_k": round(recall, 4),
+        "recall_reranked": round(recall_at_k(found, truth), 4) if rerank else None,
+        "p50_ms": round(percentile_ms(latencies, 50), 3),
+        "p99_ms": round(percentile_ms(latencies, 99), 3),
+        "batch_qps": round(len(queries) / batch_seconds, 1) if batch_seconds else None,
+        "build_seconds": round(build_seconds, 3),
+        "memory_bytes": memory_bytes,
+        "bytes_per_vector": round(memory_bytes / max(len(vectors), 1), 1),
+        # Exact vectors only live on disk (memory-mapped); reads touch k * rerank rows per query
+        "disk_bytes": int(vectors.nbytes) if rerank else 0,
+    }
+
+
+def print_memory_report(results, k, project_rows=None):
+    """Memory-vs-recall table, smallest index first."""
+    print(f"\nMemory vs recall@{k}" + (f" (projected to {project_rows:,} rows)" if project_rows else ""))
+    print(f"{'type':9s} {'bytes/vec':>10s} {'RAM':>10s} {'recall':>8s} {'reranked':>9s} {'disk':>10s}")
+    for result in sorted(results, key=lambda r: r["memory_bytes"]):
+        per_vector = result["bytes_per_vector"]
+        scale = project_rows / result["rows"] if project_rows else 1.0
+        ram = result["memory_bytes"] * scale
+        disk = result["disk_bytes"] * scale
+        reranked = "-" if result["recall_reranked"] is None else f"{result['recall_reranked']:.4f}"
+        print(f"{result['spec']['type']:9s} {per_vector:10.1f} {ram / 2**20:9.1f}M {result['recall_at_k']:8.4f} "
+              f"{reranked:>9s} {disk / 2**20:9.1f}M")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index types against the flat baseline.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--vectors", help="A .npy matrix or the rag_embedding_cache.npz embedding cache.")
+    source.add_argument("--synthetic", type=int, help="Generate this many clustered synthetic vectors.")
+    parser.add_argument("--dimension", type=int, default=384, help="Dimension of synthetic vectors.")
+    parser.add_argument("--queries", type=int, default=1000, help="Number of queries.")
+    parser.add_argument("-k", type=int, default=10, help="Neighbours per query.")
+    parser.add_argument("--types", default=",".join(INDEX_TYPES), help="Comma separated index types.")
+    parser.add_argument("--nlist", type=int)
+    parser.add_argument("--nprobe", type=int)
+    parser.add_argument("--pq-m", type=int)
+    parser.add_argument("--pq-nbits", type=int)
+    parser.add_argument("--hnsw-m", type=int)
+    parser.add_argument("--ef-construction", type=int)
+    parser.add_argument("--ef-search", type=int)
+    parser.add_argument("--train-size", type=int)
+    parser.add_argument("--rerank", type=int, help="Candidates per result re-scored exactly for quantized types.")
+    parser.add_argument("--project-rows", type=int, help="Project memory to a corpus of this many rows.")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.vectors) if args.vectors else synthetic_vectors(args.synthetic, args.dimension)
+    k = min(args.k, len(vectors))
+    queries = make_queries(vectors, args.queries)
+
+    # Exact neighbours from the flat baseline are the ground truth
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The rerank pass reads the exact vectors memory-mapped from disk, as the retriever does
+        exact_path = os.path.join(tmp_dir, "vectors.npy")
+        write_exact_vectors(vectors, np.arange(len(vectors)), exact_path)
+        exact = ExactVectors(exact_path)
+
+        for index_type in [t.strip() for t in args.types.split(",") if t.strip()]:
+            spec = index_spec(index_type, nlist=args.nlist, nprobe=args.nprobe, pq_m=args.pq_m, pq_nbits=args.pq_nbits,
+                              hnsw_m=args.hnsw_m, ef_construction=args.ef_construction, ef_search=args.ef_search,
+                              train_size=args.train_size, rerank=args.rerank)
+            result = benchmark_index(spec, vectors, queries, truth, k, exact)
+            result["rows"] = len(vectors)
+            results.append(result)
+            reranked = "" if result["recall_reranked"] is None else f" (reranked {result['recall_reranked']:.4f})"
+            print(f"{index_type:9s} recall@{k}={result['recall_at_k']:.4f}{reranked}  p50={result['p50_ms']:.3f}ms  "
+                  f"p99={result['p99_ms']:.3f}ms  build={result['build_seconds']:.2f}s  "
+                  f"memory={result['memory_bytes'] / 2**20:.1f}MiB  {result['spec']}")
+        del exact
+
+    print_memory_report(results, k, args.project_rows)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"corpus_size": len(vectors), "dimension": int(vectors.shape[1]), "queries": len(queries),
+                       "k": k, "project_rows": args.project_rows, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
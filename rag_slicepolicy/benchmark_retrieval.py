@@ -0,0 +1,256 @@
+"""
+Retrieval quality and latency benchmark for the slice-policy RAG.
+
+Runs a labelled query set (benchmark_queries.json: query -> expected sheet rows)
+through the real build and retrieval path and reports, per corpus size:
+
+    recall@k and MRR      dense-only and hybrid (BM25 + vector) retrieval
+    encode_ms             sentence-transformer latency per query (p50/p99)
+    search_ms             index search + fusion + document fetch per query (p50/p99)
+    build_seconds         create_vector_store.build_vector_store() from scratch
+
+Expected rows are 0-based data-row positions in the policy sheet; they are mapped to
+vector IDs through the row order in the build manifest. Larger corpora are the sheet
+rows followed by synthetic distractor rows, so the labels stay valid as the corpus grows.
+
+Usage:
+    python benchmark_retrieval.py --sizes 0,1000,10000 --json retrieval_report.json
+    python benchmark_retrieval.py --compare retrieval_report.json --json retrieval_report_new.json
+    python benchmark_retrieval.py seed      # regenerate the sheet-derived queries
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from create_vector_store import MODEL_NAME, SOURCE_PATH, build_vector_store, load_rows, vector_id
+from index_factory import INDEX_TYPES, index_spec
+
+QUERIES_PATH = "benchmark_queries.json"
+DEFAULT_KS = (1, 2, 5, 10)
+MODES = ("dense", "hybrid")
+
+
+# --- Query set ---
+def load_queries(path=QUERIES_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def seed_queries(source_path=SOURCE_PATH):
+    """Queries derived from the sheet: each use case, each description and each attribute condition."""
+    rows = load_rows(source_path)
+    groups = {}
+    for position, row in enumerate(rows):
+        for key in ("Use Case ", "Description"):
+            groups.setdefault(str(row.get(key, "")).strip(), []).append(position)
+        condition = " ".join(str(row.get(c, "")).strip() for c in ("Attribute ", "Operation", "Value"))
+        groups.setdefault(condition, []).append(position)
+    return [{"query": query, "rows": sorted(set(positions)), "source": os.path.basename(source_path)}
+            for query, positions in groups.items() if query]
+
+
+def save_seeded_queries(path=QUERIES_PATH, source_path=SOURCE_PATH):
+    """Rewrites the sheet-derived entries and keeps the hand-labelled ones. Returns the query count."""
+    existing = load_queries(path) if os.path.exists(path) else []
+    source = os.path.basename(source_path)
+    queries = [q for q in existing if q.get("source") != source] + seed_queries(source_path)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(queries, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    return len(queries)
+
+
+# --- Corpus ---
+def synthetic_rows(rows, n, seed=0):
+    """
+    Distractor rows in the sheet's shape: every column is sampled from the real values
+    and tagged with a row number, so no distractor duplicates a labelled row.
+    """
+    if not rows or n <= 0:
+        return []
+    rng = np.random.default_rng(seed)
+    columns = list(rows[0])
+    values = {c: [str(row[c]) for row in rows] for c in columns}
+    synthetic = []
+    for i in range(n):
+        row = {c: values[c][rng.integers(len(values[c]))] for c in columns}
+        for c in ("Use Case ", "Attribute "):
+            if c in row:
+                row[c] = f"{row[c].strip()}{i}"
+        synthetic.append(row)
+    return synthetic
+
+
+def write_corpus(rows, size, path, seed=0):
+    """Writes the sheet rows plus distractors up to 'size' rows as CSV. Returns the row count."""
+    corpus = rows + synthetic_rows(rows, size - len(rows), seed)
+    pd.DataFrame(corpus, columns=list(rows[0])).to_csv(path, index=False)
+    return len(corpus)
+
+
+# --- Metrics ---
+def recall_at_k(found, expected, k):
+    return len(set(found[:k]) & expected) / len(expected)
+
+
+def reciprocal_rank(found, expected):
+    for rank, doc_id in enumerate(found, start=1):
+        if doc_id in expected:
+            return 1.0 / rank
+    return 0.0
+
+
+def percentiles_ms(samples):
+    if not samples:
+        return {"p50": None, "p99": None, "mean": None}
+    samples = np.asarray(samples) * 1000.0
+    return {"p50": round(float(np.percentile(samples, 50)), 3), "p99": round(float(np.percentile(samples, 99)), 3),
+            "mean": round(float(samples.mean()), 3)}
+
+
+def evaluate(retriever, labelled, k_max, ks):
+    """Quality and latency of every mode over the labelled queries (each {"query", "ids", "filters"})."""
+    queries = [item["query"] for item in labelled]
+
+    # Encoder latency, one query at a time as in the chatbot
+    encode_latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        retriever.model.encode([query])
+        encode_latencies.append(time.perf_counter() - start)
+
+    # Warm the embedding cache so search timings exclude the encoder
+    retriever.embed(queries)
+    report = {"encode_ms": percentiles_ms(encode_latencies), "modes": {}}
+    for mode in MODES:
+        latencies, recalls, ranks = [], {k: [] for k in ks}, []
+        for item in labelled:
+            start = time.perf_counter()
+            results = retriever.search(item["query"], k_max, filters=item.get("filters"), hybrid=mode == "hybrid")
+            latencies.append(time.perf_counter() - start)
+            found = [doc["id"] for doc in results]
+            for k in ks:
+                recalls[k].append(recall_at_k(found, item["ids"], k))
+            ranks.append(reciprocal_rank(found, item["ids"]))
+        report["modes"][mode] = {
+            **{f"recall@{k}": round(float(np.mean(recalls[k])), 4) for k in ks},
+            "mrr": round(float(np.mean(ranks)), 4),
+            "search_ms": percentiles_ms(latencies),
+        }
+    return report
+
+
+def run_size(size, rows, queries, model_name, spec, ks, work_dir):
+    """Builds a corpus of 'size' rows from scratch and evaluates the query set against it."""
+    paths = {name: os.path.join(work_dir, f"{size}_{name}") for name in
+             ("corpus.csv", "index.faiss", "metadata.sqlite", "cache.npz", "manifest.json", "vectors.npy")}
+    corpus_rows = write_corpus(rows, size, paths["corpus.csv"])
+
+    start = time.perf_counter()
+    build_vector_store(source_path=paths["corpus.csv"], index_path=paths["index.faiss"],
+                       data_path=paths["metadata.sqlite"], cache_path=paths["cache.npz"],
+                       manifest_path=paths["manifest.json"], model_name=model_name, force=True, spec=spec,
+                       vectors_path=paths["vectors.npy"])
+    build_seconds = time.perf_counter() - start
+
+    # Sheet row position -> vector ID, through the row order recorded in the manifest
+    with open(paths["manifest.json"], "r", encoding="utf-8") as f:
+        row_ids = [vector_id(h) for h in json.load(f)["rows"]]
+    labelled = [{"query": q["query"], "filters": q.get("filters"), "ids": {row_ids[p] for p in q["rows"]}}
+                for q in queries if q["rows"]]
+
+    from retriever import Retriever
+
+    retriever = Retriever(index_path=paths["index.faiss"], data_path=paths["metadata.sqlite"],
+                          manifest_path=paths["manifest.json"], model_name=model_name)
+    result = {"corpus_rows": corpus_rows, "build_seconds": round(build_seconds, 3),
+              **evaluate(retriever, labelled, max(ks), ks)}
+    retriever.documents.close()
+    return result
+
+
+def print_run(run, ks):
+    print(f"\n{run['corpus_rows']} rows: build {run['build_seconds']:.2f}s, "
+          f"encode p50 {run['encode_ms']['p50']:.2f}ms p99 {run['encode_ms']['p99']:.2f}ms")
+    for mode, metrics in run["modes"].items():
+        recalls = "  ".join(f"R@{k}={metrics[f'recall@{k}']:.3f}" for k in ks)
+        print(f"  {mode:7s} {recalls}  MRR={metrics['mrr']:.3f}  "
+              f"search p50 {metrics['search_ms']['p50']:.2f}ms p99 {metrics['search_ms']['p99']:.2f}ms")
+
+
+def print_comparison(report, baseline):
+    """Deltas against a previous report, matched by corpus size and mode."""
+    previous = {run["corpus_rows"]: run for run in baseline.get("runs", [])}
+    print(f"\nCompared with {baseline.get('created', 'baseline')}:")
+    for run in report["runs"]:
+        old = previous.get(run["corpus_rows"])
+        if old is None:
+            continue
+        print(f"  {run['corpus_rows']} rows: build {run['build_seconds'] - old['build_seconds']:+.2f}s")
+        for mode, metrics in run["modes"].items():
+            old_metrics = old["modes"].get(mode)
+            if not old_metrics:
+                continue
+            deltas = "  ".join(f"{name}={metrics[name] - old_metrics[name]:+.4f}" for name in metrics
+                               if name != "search_ms" and name in old_metrics)
+            p50 = metrics["search_ms"]["p50"] - old_metrics["search_ms"]["p50"]
+            print(f"    {mode:7s} {deltas}  search p50 {p50:+.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and latency on a labelled query set.")
+    parser.add_argument("command", nargs="?", choices=("run", "seed"), default="run",
+                        help="'seed' regenerates the sheet-derived queries in the query file.")
+    parser.add_argument("--queries", default=QUERIES_PATH, help="Labelled query set.")
+    parser.add_argument("--source", default=SOURCE_PATH, help="Policy spreadsheet the labels refer to.")
+    parser.add_argument("--sizes", default="0", help="Comma separated corpus sizes (0 = the sheet only).")
+    parser.add_argument("-k", default=",".join(str(k) for k in DEFAULT_KS), help="Comma separated cut-offs.")
+    parser.add_argument("--model", default=MODEL_NAME, help="Sentence transformer model name.")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat", help="FAISS index type.")
+    parser.add_argument("--json", dest="json_path", help="Write the report to this JSON file.")
+    parser.add_argument("--compare", help="A previous report to print deltas against.")
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        count = save_seeded_queries(args.queries, args.source)
+        print(f"Wrote {count} queries to {args.queries}.")
+        return
+
+    ks = sorted({int(k) for k in args.k.split(",") if k.strip()})
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    queries = load_queries(args.queries)
+    rows = load_rows(args.source)
+    spec = index_spec(args.index_type)
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "model": args.model,
+        "index": spec,
+        "query_set": os.path.basename(args.queries),
+        "queries": sum(1 for q in queries if q["rows"]),
+        "k": ks,
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in sizes:
+            run = run_size(max(size, len(rows)), rows, queries, args.model, spec, ks, work_dir)
+            report["runs"].append(run)
+            print_run(run, ks)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print_comparison(report, json.load(f))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
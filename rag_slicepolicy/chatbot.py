@@ -1,42 +1,83 @@
-import json
-import faiss
-import numpy as np
-from sentence_transformers import SentenceTransformer
+import argparse
 
-# Load the FAISS index and RAG data
-index = faiss.read_index("rag_policies.faiss")
-with open("rag_data.json", "r", encoding="utf-8") as f:
-    rag_data = json.load(f)
+from policy_ir import compile_policy
+from retrieval_client import DEFAULT_URL, RetrievalServerError, search as search_server
 
-# Load the sentence transformer model
-model = SentenceTransformer("all-MiniLM-L6-v2")
+DEFAULT_K = 2  # Number of documents to retrieve
 
-def generate_rego_policy(query):
-    # Embed the query
-    query_embedding = model.encode([query])
+# The retriever (FAISS index, RAG data and sentence transformer) is only loaded when a
+# query is answered in-process; with --server the resident retrieval daemon is used instead.
+_retriever = None
 
-    # Search for the most relevant documents
-    k = 2  # Number of documents to retrieve
-    distances, indices = index.search(query_embedding.astype('float32'), k)
+def get_retriever():
+    global _retriever
+    if _retriever is None:
+        from retriever import Retriever
 
-    # Generate the Rego policy from the retrieved documents
-    retrieved_docs = [rag_data[i] for i in indices[0]]
+        _retriever = Retriever()
+    return _retriever
 
-    # This is a simple example of how to generate a Rego policy.
-    # You will likely need to customize this part based on your specific needs.
-    policy = "package main\n\n# Generated Rego Policy\n\n"
-    for doc in retrieved_docs:
-        metadata = doc["metadata"]
-        policy += f"# MO Type: {metadata['MO Type']}, Full Path: {metadata['Full Path']}, Attribute: {metadata['Attribute ']}, Operation: {metadata['Operation']}, Value: {metadata['Value']}\n"
-        policy += f"allow {{\n    input.mo_type == \"{metadata['MO Type']}\"\n    input.full_path == \"{metadata['Full Path']}\"\n    input.attribute == \"{metadata['Attribute ']}\"\n    input.operation == \"{metadata['Operation']}\"\n    input.value == \"{metadata['Value']}\"\n}}\n\n"
+def render_policy(retrieved_docs):
+    """
+    Generates the Rego policy text from the retrieved documents. Operations become real
+    comparisons on input.<Full Path>.<MO Type>.<Attribute>, and documents of the same use
+    case, path, MO Type and response are merged into one rule (see policy_ir.py).
+    """
+    return compile_policy([doc["metadata"] for doc in retrieved_docs])
 
-    return policy
+def retrieve_documents(queries, k=DEFAULT_K, max_distance=None, filters=None, hybrid=True, server_url=None):
+    """
+    Retrieves the documents for many queries at once (one encoder pass, one index search).
+    'filters' narrows the candidates by MO Type / Operation / Use Case before scoring, and
+    'hybrid' fuses keyword (BM25) and vector rankings.
+    """
+    if server_url:
+        return search_server(queries, k=k, max_distance=max_distance, filters=filters, hybrid=hybrid, url=server_url)
+    return get_retriever().search_batch(queries, k, max_distance, filters, hybrid)
+
+def generate_rego_policies(queries, k=DEFAULT_K, max_distance=None, filters=None, hybrid=True, server_url=None):
+    """Generates one Rego policy per query."""
+    return [render_policy(docs) for docs in retrieve_documents(queries, k, max_distance, filters, hybrid, server_url)]
+
+def generate_rego_policy(query, k=DEFAULT_K, max_distance=None, filters=None, hybrid=True, server_url=None):
+    # Search for the most relevant documents, in-process or through the retrieval daemon,
+    # and generate the Rego policy from them
+    return generate_rego_policies([query], k, max_distance, filters, hybrid, server_url)[0]
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a Rego policy from the slice-policy RAG.")
+    parser.add_argument("query", nargs="?", help="The query (prompted for when omitted).")
+    parser.add_argument("--batch-file", help="Generate one policy per non-empty line of this file (e.g. a list of use cases).")
+    parser.add_argument("-k", type=int, default=DEFAULT_K, help="Number of documents to retrieve per query.")
+    parser.add_argument("--max-distance", type=float, default=None, help="Ignore documents further than this (squared L2) distance.")
+    parser.add_argument("--mo-type", help="Only consider documents with this MO Type.")
+    parser.add_argument("--operation", help="Only consider documents with this Operation.")
+    parser.add_argument("--use-case", help="Only consider documents with this Use Case.")
+    parser.add_argument("--dense-only", action="store_true", help="Disable keyword (BM25) fusion.")
+    parser.add_argument("--server", nargs="?", const=DEFAULT_URL, default=None,
+                        help=f"Use a running retrieval_server.py (default {DEFAULT_URL}) instead of loading the model.")
+    args = parser.parse_args()
+
     # Get user input
-    user_query = input("Enter your query to generate a Rego policy: ")
+    if args.batch_file:
+        with open(args.batch_file, "r", encoding="utf-8") as f:
+            user_queries = [line.strip() for line in f if line.strip()]
+    else:
+        user_queries = [args.query or input("Enter your query to generate a Rego policy: ")]
+
+    filters = {name: value for name, value in (("mo_type", args.mo_type), ("operation", args.operation),
+                                                ("use_case", args.use_case)) if value}
 
-    # Generate and print the policy
-    rego_policy = generate_rego_policy(user_query)
-    print("\nGenerated Rego Policy:\n")
-    print(rego_policy)
+    # Generate and print the policies
+    try:
+        rego_policies = generate_rego_policies(user_queries, args.k, args.max_distance, filters,
+                                               not args.dense_only, server_url=args.server)
+    except RetrievalServerError as e:
+        print(f"Error: {e}")
+        print("Start the daemon with 'python retrieval_server.py' or run without --server.")
+    else:
+        for user_query, rego_policy in zip(user_queries, rego_policies):
+            if len(user_queries) > 1:
+                print(f"\n# Query: {user_query}")
+            print("\nGenerated Rego Policy:\n")
+            print(rego_policy)
@@ -1,49 +1,378 @@
+import argparse
+import hashlib
 import json
+import os
+
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
 import pandas as pd
 
-import pandas as pd
+from index_factory import INDEX_TYPES, build_index, create_index, fit_spec, index_spec, needs_training, read_index, \
+    rerank_factor, supports_removal, train_index
+from ingest import DEFAULT_BATCH_SIZE, DEFAULT_CHUNK_ROWS, BatchEncoder, chunk_texts, iter_source_chunks
+# VECTORS_PATH: exact vectors for re-ranking the candidates of quantized indexes
+from exact_vectors import VECTORS_PATH, ExactVectorWriter, write_exact_vectors
+from metadata_store import STORE_PATH, MetadataStore, document_text
+
+# --- Configuration ---
+SOURCE_PATH = "Slice-policyupdated.xlsx"
+INDEX_PATH = "rag_policies.faiss"
+# Document metadata keyed by vector ID (see metadata_store.py)
+DATA_PATH = STORE_PATH
+# Row-content-hash -> embedding cache, so unchanged rows are never re-embedded
+CACHE_PATH = "rag_embedding_cache.npz"
+# Records what the current index was built from; an unchanged source makes a rebuild a no-op
+MANIFEST_PATH = "rag_manifest.json"
+MODEL_NAME = "all-MiniLM-L6-v2"
+MANIFEST_VERSION = 2
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_rows(source_path, sheet_name=None):
+    """Reads the policy sheet (.xlsx, .csv or .parquet) as a list of {column: value} dicts, all values as strings."""
+    chunks = list(iter_source_chunks(source_path, sheet_name=sheet_name))
+    if not chunks:
+        return []
+    return pd.concat(chunks, ignore_index=True).to_dict(orient="records")
+
+
+def row_text(row_data):
+    """The text that gets embedded for a row."""
+    return document_text(row_data)
+
+
+def row_hashes(rows):
+    """
+    Content hash per row. Identical rows get an occurrence suffix so that
+    every row keeps its own, stable hash.
+    """
+    seen = {}
+    hashes = []
+    for row_data in rows:
+        content = json.dumps(row_data, sort_keys=True, ensure_ascii=False)
+        occurrence = seen.get(content, 0)
+        seen[content] = occurrence + 1
+        hashes.append(hashlib.sha256(f"{content}\x00{occurrence}".encode("utf-8")).hexdigest())
+    return hashes
+
+
+def vector_id(row_hash):
+    """Stable, non-negative int64 FAISS ID derived from a row hash."""
+    return int(row_hash[:15], 16)
+
+
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_embedding_cache(path=CACHE_PATH, model_name=MODEL_NAME):
+    """Returns {row_hash: embedding} for rows embedded by a previous run with the same model."""
+    if not os.path.exists(path):
+        return {}
+    with np.load(path, allow_pickle=False) as cache:
+        if str(cache["model"]) != model_name:
+            return {}
+        return dict(zip(cache["hashes"].tolist(), cache["embeddings"]))
+
+
+def save_embedding_cache(cache, path=CACHE_PATH, model_name=MODEL_NAME):
+    hashes = list(cache)
+    embeddings = np.stack([cache[h] for h in hashes]).astype("float32") if hashes else np.zeros((0, 0), dtype="float32")
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, model=np.array(model_name), hashes=np.array(hashes), embeddings=embeddings)
+    os.replace(tmp_path, path)
+
+
+def encode_texts(texts, model_name=MODEL_NAME, batch_size=DEFAULT_BATCH_SIZE, workers=1):
+    """Embeds texts with the sentence transformer (only loaded when something needs embedding)."""
+    return BatchEncoder(model_name, batch_size=batch_size, workers=workers).encode(texts)
+
+
+def _new_store(path):
+    """Opens an empty store at a temporary path; publish it with _publish_store()."""
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    return MetadataStore(tmp_path, readonly=False)
+
+
+def _publish_store(store, path):
+    store.commit()
+    store.close()
+    os.replace(store.path, path)
+
+
+def write_rag_data(rows, ids, path=DATA_PATH):
+    """Rewrites the metadata store with every row."""
+    store = _new_store(path)
+    store.add_documents(zip(ids, rows))
+    _publish_store(store, path)
+
+
+def update_rag_data(rows, ids, added, removed, path=DATA_PATH):
+    """Applies row additions (positions into rows/ids) and removals (vector IDs) to the existing store in place."""
+    store = MetadataStore(path, readonly=False)
+    try:
+        store.remove_documents(removed)
+        store.add_documents((ids[i], rows[i]) for i in added)
+        store.commit()
+    finally:
+        store.close()
+
+
+def write_index(index, path=INDEX_PATH):
+    tmp_path = path + ".tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def build_vector_store(source_path=SOURCE_PATH, index_path=INDEX_PATH, data_path=DATA_PATH,
+                       cache_path=CACHE_PATH, manifest_path=MANIFEST_PATH, model_name=MODEL_NAME, force=False,
+                       sheet_name=None, batch_size=DEFAULT_BATCH_SIZE, workers=1, spec=None, vectors_path=VECTORS_PATH):
+    """
+    Builds or incrementally updates the FAISS index and RAG data for the policy sheet.
+    'spec' is an index_factory.index_spec() dict (flat by default). Quantized specs with
+    a rerank factor also get the exact vectors written to vectors_path.
+
+    Only rows whose content hash is not in the embedding cache are embedded. When the
+    existing index matches the manifest, deleted rows are removed by ID and new rows are
+    added with their IDs; otherwise the index is rebuilt from (mostly cached) embeddings.
+    Returns a summary dict.
+    """
+    spec = spec or index_spec("flat")
+    source_sha256 = file_sha256(source_path)
+    manifest = None if force else load_manifest(manifest_path)
+    outputs_exist = (os.path.exists(index_path) and os.path.exists(data_path)
+                     and (not rerank_factor(spec) or os.path.exists(vectors_path)))
+    same_index = bool(manifest) and manifest.get("index_request", index_spec("flat")) == spec
+
+    if (manifest and outputs_exist and same_index and manifest.get("source_sha256") == source_sha256
+            and manifest.get("model") == model_name):
+        return {"status": "unchanged", "rows": manifest.get("row_count", len(manifest.get("rows", []))), "added": 0, "removed": 0, "embedded": 0}
+
+    rows = load_rows(source_path, sheet_name)
+    hashes = row_hashes(rows)
+    ids = [vector_id(h) for h in hashes]
+
+    cache = {} if force else load_embedding_cache(cache_path, model_name)
+    missing = [i for i, h in enumerate(hashes) if h not in cache]
+    if missing:
+        # Create the embeddings for new or changed rows only
+        new_embeddings = encode_texts([row_text(rows[i]) for i in missing], model_name, batch_size, workers)
+        for i, embedding in zip(missing, new_embeddings):
+            cache[hashes[i]] = embedding
+    # Drop embeddings of rows that no longer exist
+    cache = {h: cache[h] for h in hashes}
+
+    old_hashes = set(manifest.get("rows", [])) if manifest and manifest.get("model") == model_name else set()
+    new_hashes = set(hashes)
+    added = [i for i, h in enumerate(hashes) if h not in old_hashes]
+    removed = [vector_id(h) for h in old_hashes - new_hashes]
+
+    index = None
+    fitted_spec = manifest.get("index") if manifest else None
+    if old_hashes and outputs_exist and same_index:
+        try:
+            index = read_index(index_path, fitted_spec)
+        except RuntimeError:
+            index = None
+        addressable = isinstance(index, (faiss.IndexIDMap, faiss.IndexIVF))
+        if index is not None and (not addressable or index.ntotal != len(old_hashes)
+                                  or (removed and not supports_removal(index))):
+            index = None
+
+    if index is not None:
+        # Incremental update: remove deleted rows by ID, then append new ones
+        if removed:
+            index.remove_ids(np.array(removed, dtype="int64"))
+        if added:
+            index.add_with_ids(np.stack([cache[hashes[i]] for i in added]), np.array([ids[i] for i in added], dtype="int64"))
+        update_rag_data(rows, ids, added, removed, data_path)
+        mode = "incremental"
+    else:
+        # Create a FAISS index addressed by stable row IDs
+        dimension = len(next(iter(cache.values()))) if cache else 384
+        vectors = np.stack([cache[h] for h in hashes]) if hashes else np.zeros((0, dimension), dtype="float32")
+        index, fitted_spec = build_index(spec, vectors, ids)
+        write_rag_data(rows, ids, data_path)
+        added = list(range(len(hashes)))
+        mode = "full"
+
+    # Save the index, the exact vectors (quantized indexes only), the cache and finally the manifest
+    write_index(index, index_path)
+    exact_vectors = None
+    if rerank_factor(fitted_spec):
+        write_exact_vectors(np.stack([cache[h] for h in hashes]) if hashes else np.zeros((0, index.d), dtype="float32"),
+                            ids, vectors_path)
+        exact_vectors = vectors_path
+    save_embedding_cache(cache, cache_path, model_name)
+    save_manifest({
+        "version": MANIFEST_VERSION,
+        "source": os.path.basename(source_path),
+        "source_sha256": source_sha256,
+        "model": model_name,
+        "dimension": index.d,
+        "index_request": spec,
+        "index": fitted_spec,
+        "exact_vectors": exact_vectors,
+        "rows": hashes,
+    }, manifest_path)
+
+    return {"status": mode, "rows": len(hashes), "added": len(added), "removed": len(removed), "embedded": len(missing)}
+
 
-# Read the file, force all as string, handle missing
-df = pd.read_excel("Slice-policyupdated.xlsx", dtype=str)
-df.fillna("", inplace=True)
+def build_vector_store_streaming(source_path=SOURCE_PATH, index_path=INDEX_PATH, data_path=DATA_PATH,
+                                 manifest_path=MANIFEST_PATH, model_name=MODEL_NAME, sheet_name=None,
+                                 chunk_rows=DEFAULT_CHUNK_ROWS, batch_size=DEFAULT_BATCH_SIZE, workers=1, spec=None,
+                                 vectors_path=VECTORS_PATH):
+    """
+    Full rebuild for very large sources with bounded memory.
 
-# Get the column names
-column_names = df.columns.tolist()
+    Rows are read chunk by chunk, encoded in batches (optionally in a process pool) and
+    appended to the index and to the metadata store as each batch completes. Vector IDs are
+    row positions. The embedding cache is not used, and the next incremental run
+    rebuilds from scratch. IVF indexes are trained on the first train_size rows,
+    which are held back until the quantizer is trained. Exact vectors for re-ranking
+    are appended to vectors_path batch by batch.
+    """
+    spec = spec or index_spec("flat")
+    source_sha256 = file_sha256(source_path)
+    encoder = BatchEncoder(model_name, batch_size=batch_size, workers=workers)
 
-rag_data = []
+    def rows_with_text():
+        position = 0
+        for chunk in iter_source_chunks(source_path, chunk_rows, sheet_name):
+            texts = chunk_texts(chunk)
+            for row_data, text in zip(chunk.to_dict(orient="records"), texts):
+                yield (position, row_data, text), text
+                position += 1
 
-for _, row in df.iterrows():
-    row_data = {}
-    for col in column_names:
-        row_data[col] = row[col]
+    index = None
+    fitted_spec = None
+    pending_ids, pending_vectors = [], []
 
-    # Create the text for embedding
-    text = " ".join(str(value) for value in row_data.values())
+    def start_index(vectors, ids):
+        nonlocal index, fitted_spec
+        vectors = np.concatenate(vectors)
+        fitted_spec = fit_spec(spec, vectors.shape[1], len(vectors))
+        index = create_index(fitted_spec, vectors.shape[1])
+        train_index(index, fitted_spec, vectors)
+        index.add_with_ids(vectors, np.concatenate(ids))
 
-    rag_data.append({
-        "text": text,
-        "metadata": row_data
-    })
+    total = 0
+    store = _new_store(data_path)
+    writer = ExactVectorWriter(vectors_path) if rerank_factor(spec) else None
+    try:
+        for payloads, embeddings in encoder.encode_stream(rows_with_text()):
+            batch_ids = np.array([position for position, _, _ in payloads], dtype="int64")
+            if index is not None:
+                index.add_with_ids(embeddings, batch_ids)
+            else:
+                pending_ids.append(batch_ids)
+                pending_vectors.append(embeddings)
+                if not needs_training(spec) or sum(len(v) for v in pending_vectors) >= spec["train_size"]:
+                    start_index(pending_vectors, pending_ids)
+                    pending_ids, pending_vectors = [], []
+            if writer is not None:
+                writer.add(embeddings, batch_ids)
+            store.add_documents((position, row_data) for position, row_data, _ in payloads)
+            store.conn.commit()
+            total += len(payloads)
+            print(f"Indexed {total} rows...", end="\r", flush=True)
+    except BaseException:
+        store.close()
+        if writer is not None:
+            writer.abort()
+        raise
+    _publish_store(store, data_path)
+    if writer is not None:
+        writer.close()
 
-# Extract the text for embedding
-texts = [item["text"] for item in rag_data]
+    if index is None and pending_vectors:
+        start_index(pending_vectors, pending_ids)
+    if index is None:
+        index, fitted_spec = build_index(spec, np.zeros((0, 384), dtype="float32"), [])
+    write_index(index, index_path)
+    save_manifest({
+        "version": MANIFEST_VERSION,
+        "source": os.path.basename(source_path),
+        "source_sha256": source_sha256,
+        "model": model_name,
+        "dimension": index.d,
+        "mode": "stream",
+        "index_request": spec,
+        "index": fitted_spec,
+        "exact_vectors": vectors_path if writer is not None else None,
+        "row_count": total,
+    }, manifest_path)
+    return {"status": "stream", "rows": total, "added": total, "removed": 0, "embedded": total}
 
-# Load the sentence transformer model
-model = SentenceTransformer("all-MiniLM-L6-v2")
 
-# Create the embeddings
-embeddings = model.encode(texts, show_progress_bar=True)
+def main():
+    parser = argparse.ArgumentParser(description="Create or update the slice-policy vector store.")
+    parser.add_argument("--source", default=SOURCE_PATH, help="Policy spreadsheet to index.")
+    parser.add_argument("--index", default=INDEX_PATH, help="Output FAISS index file.")
+    parser.add_argument("--data", default=DATA_PATH, help="Output metadata store (SQLite).")
+    parser.add_argument("--vectors", default=VECTORS_PATH, help="Exact vectors for re-ranking quantized indexes.")
+    parser.add_argument("--cache", default=CACHE_PATH, help="Embedding cache file.")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="Build manifest file.")
+    parser.add_argument("--model", default=MODEL_NAME, help="Sentence transformer model name.")
+    parser.add_argument("--force", action="store_true", help="Ignore the cache and manifest and re-embed everything.")
+    parser.add_argument("--sheet", default=None, help="Worksheet to read (defaults to the active sheet).")
+    parser.add_argument("--stream", action="store_true", help="Bounded-memory full rebuild for very large sources.")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows read per chunk in --stream mode.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Texts per encoder batch.")
+    parser.add_argument("--workers", type=int, default=1, help="Encoder processes (each loads its own model).")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat", help="FAISS index type.")
+    parser.add_argument("--rerank", type=int, help="Quantized types: candidates per result re-scored exactly (0 = off).")
+    parser.add_argument("--nlist", type=int, help="IVF: number of k-means cells.")
+    parser.add_argument("--nprobe", type=int, help="IVF: cells visited per query.")
+    parser.add_argument("--pq-m", type=int, help="PQ / IVF-PQ: sub-quantizers per vector.")
+    parser.add_argument("--pq-nbits", type=int, help="PQ / IVF-PQ: bits per sub-quantizer code.")
+    parser.add_argument("--hnsw-m", type=int, help="HNSW: graph neighbours per node.")
+    parser.add_argument("--ef-construction", type=int, help="HNSW: candidate list size while building.")
+    parser.add_argument("--ef-search", type=int, help="HNSW: candidate list size per query.")
+    parser.add_argument("--train-size", type=int, help="IVF / PQ / SQ8: number of rows sampled for training.")
+    args = parser.parse_args()
 
-# Create a FAISS index
-index = faiss.IndexFlatL2(embeddings.shape[1])
-index.add(embeddings.astype('float32'))
+    spec = index_spec(args.index_type, nlist=args.nlist, nprobe=args.nprobe, pq_m=args.pq_m, pq_nbits=args.pq_nbits,
+                      hnsw_m=args.hnsw_m, ef_construction=args.ef_construction, ef_search=args.ef_search,
+                      train_size=args.train_size, rerank=args.rerank)
+    common = dict(source_path=args.source, index_path=args.index, data_path=args.data, manifest_path=args.manifest,
+                  model_name=args.model, sheet_name=args.sheet, batch_size=args.batch_size, workers=args.workers,
+                  spec=spec, vectors_path=args.vectors)
+    if args.stream:
+        summary = build_vector_store_streaming(chunk_rows=args.chunk_rows, **common)
+        print()
+    else:
+        summary = build_vector_store(cache_path=args.cache, force=args.force, **common)
+    if summary["status"] == "unchanged":
+        print(f"Vector store is up to date ({summary['rows']} rows).")
+    else:
+        print(f"Vector store created successfully ({summary['status']} build: {summary['rows']} rows, "
+              f"{summary['added']} added, {summary['removed']} removed, {summary['embedded']} embedded).")
 
-# Save the index and the data
-faiss.write_index(index, "rag_policies.faiss")
-with open("rag_data.json", "w", encoding="utf-8") as f:
-    json.dump(rag_data, f, indent=2, ensure_ascii=False)
 
-print("Vector store created successfully.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Exact float32 vectors kept on disk next to a quantized index, used to re-rank its candidates.
+
+    rag_vectors.npy      float32 (n, d) matrix, rows in ascending vector-ID order
+    rag_vectors_ids.npy  int64 (n,) sorted vector IDs
+
+The quantized index (sq8, sq_fp16, pq, ivf_pq) stays in memory and proposes
+k * rerank candidates; only those rows are read back from the memory-mapped matrix
+and scored with the exact L2 distance.
+"""
+
+import os
+
+import numpy as np
+
+VECTORS_PATH = "rag_vectors.npy"
+
+
+def ids_path(vectors_path):
+    """The sorted ID array stored next to a vectors file."""
+    base = vectors_path[:-4] if vectors_path.endswith(".npy") else vectors_path
+    return base + "_ids.npy"
+
+
+def _save_npy(array, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def write_exact_vectors(vectors, ids, path=VECTORS_PATH):
+    """Writes the vectors sorted by ID, plus the sorted IDs."""
+    ids = np.asarray(ids, dtype="int64")
+    order = np.argsort(ids, kind="stable")
+    _save_npy(np.ascontiguousarray(np.asarray(vectors, dtype="float32")[order]), path)
+    _save_npy(ids[order], ids_path(path))
+
+
+class ExactVectorWriter:
+    """
+    Appends batches with ascending IDs (the streaming build's row positions) to a raw
+    file, then converts it to the .npy pair in close(), so memory stays bounded.
+    """
+
+    def __init__(self, path=VECTORS_PATH):
+        self.path = path
+        self.raw_path = path + ".raw"
+        self.dimension = None
+        self.ids = []
+        self._file = open(self.raw_path, "wb")
+
+    def add(self, vectors, ids):
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if len(vectors):
+            self.dimension = vectors.shape[1]
+            self._file.write(vectors.tobytes())
+            self.ids.append(np.asarray(ids, dtype="int64"))
+
+    def close(self):
+        self._file.close()
+        ids = np.concatenate(self.ids) if self.ids else np.zeros(0, dtype="int64")
+        if len(ids) > 1 and np.any(np.diff(ids) <= 0):
+            raise ValueError("ExactVectorWriter expects strictly ascending IDs")
+        dimension = self.dimension or 0
+        tmp_path = self.path + ".tmp"
+        out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype="float32", shape=(len(ids), dimension))
+        if len(ids):
+            raw = np.memmap(self.raw_path, dtype="float32", mode="r", shape=(len(ids), dimension))
+            step = 65536
+            for start in range(0, len(ids), step):
+                out[start:start + step] = raw[start:start + step]
+            del raw
+        out.flush()
+        del out
+        os.replace(tmp_path, self.path)
+        os.remove(self.raw_path)
+        _save_npy(ids, ids_path(self.path))
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self.raw_path):
+            os.remove(self.raw_path)
+
+
+class ExactVectors:
+    """Memory-mapped exact vectors; rerank() re-scores ANN candidates with the true L2 distance."""
+
+    def __init__(self, path=VECTORS_PATH):
+        self.vectors = np.load(path, mmap_mode="r")
+        self.ids = np.load(ids_path(path), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def lookup(self, ids):
+        """Row positions of the given IDs, and a mask of which IDs exist."""
+        ids = np.asarray(ids, dtype="int64")
+        positions = np.searchsorted(self.ids, ids)
+        positions = np.minimum(positions, max(len(self.ids) - 1, 0))
+        found = (ids >= 0) & (len(self.ids) > 0)
+        if len(self.ids):
+            found &= self.ids[positions] == ids
+        return positions, found
+
+    def rerank(self, queries, candidate_ids, k):
+        """
+        Exact (squared L2) distances for each query's candidates; returns the best k as
+        (distances, ids), padded with inf / -1 like index.search().
+        """
+        distances = np.full((len(queries), k), np.inf, dtype="float32")
+        labels = np.full((len(queries), k), -1, dtype="int64")
+        for row, (query, candidates) in enumerate(zip(queries, candidate_ids)):
+            positions, found = self.lookup(candidates)
+            candidates, positions = candidates[found], positions[found]
+            if not len(candidates):
+                continue
+            # Sorted positions keep the memory-mapped reads sequential
+            order = np.argsort(positions)
+            candidates, positions = candidates[order], positions[order]
+            exact = np.asarray(self.vectors[positions], dtype="float32")
+            scores = ((exact - query) ** 2).sum(axis=1)
+            best = np.argsort(scores, kind="stable")[:k]
+            distances[row, :len(best)] = scores[best]
+            labels[row, :len(best)] = candidates[best]
+        return distances, labels
@@ -0,0 +1,175 @@
+"""
+Configurable FAISS index construction for the slice-policy RAG.
+
+Supported types:
+    flat      exact brute-force L2 (the original IndexFlatL2)
+    ivf_flat  inverted file over k-means cells, exact vectors inside a cell
+    ivf_pq    inverted file with product-quantized vectors
+    hnsw      hierarchical navigable small world graph
+    sq_fp16   brute force over float16 vectors (half the memory of flat)
+    sq8       brute force over 8-bit scalar-quantized vectors (a quarter of flat)
+    pq        brute force over product-quantized codes (pq_m bytes per vector at 8 bits)
+
+The lossy types (sq_fp16, sq8, pq, ivf_pq) take a "rerank" factor: the index proposes
+k * rerank candidates, which are re-scored against the exact vectors kept on disk
+(see exact_vectors.py). rerank=0 returns the quantized ranking as is.
+
+The normalized spec (type plus the parameters that apply to it) is stored in
+rag_manifest.json under "index", so readers can apply the same search parameters.
+"""
+
+import numpy as np
+import faiss
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "sq_fp16", "sq8", "pq")
+
+DEFAULT_PARAMS = {
+    "nlist": 1024,
+    "nprobe": 16,
+    "pq_m": 48,
+    "pq_nbits": 8,
+    "hnsw_m": 32,
+    "ef_construction": 200,
+    "ef_search": 64,
+    "train_size": 100000,
+    "rerank": 4,
+}
+
+# Parameters that matter per index type (everything else is dropped from the spec)
+TYPE_PARAMS = {
+    "flat": (),
+    "ivf_flat": ("nlist", "nprobe", "train_size"),
+    "ivf_pq": ("nlist", "nprobe", "pq_m", "pq_nbits", "train_size", "rerank"),
+    "hnsw": ("hnsw_m", "ef_construction", "ef_search"),
+    "sq_fp16": ("rerank",),
+    "sq8": ("train_size", "rerank"),
+    "pq": ("pq_m", "pq_nbits", "train_size", "rerank"),
+}
+
+# Fewer training points per centroid than this makes k-means unreliable
+MIN_POINTS_PER_CENTROID = 39
+
+
+def index_spec(index_type="flat", **params):
+    """Returns the normalized spec dict for an index type; None values fall back to the defaults."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}' (expected one of {', '.join(INDEX_TYPES)})")
+    spec = {"type": index_type}
+    for name in TYPE_PARAMS[index_type]:
+        value = params.get(name)
+        spec[name] = DEFAULT_PARAMS[name] if value is None else int(value)
+    return spec
+
+
+def needs_training(spec):
+    return spec["type"] in ("ivf_flat", "ivf_pq", "sq8", "pq")
+
+
+def rerank_factor(spec):
+    """Candidates per result to re-score with exact vectors (0 when the index is exact or reranking is off)."""
+    return int((spec or {}).get("rerank") or 0)
+
+
+def fit_spec(spec, dimension, n_train):
+    """
+    Clamps the spec to what the data supports: nlist to the number of training points,
+    pq_m to a divisor of the dimension and pq_nbits to the number of training points.
+    """
+    spec = dict(spec)
+    if "nlist" in spec:
+        spec["nlist"] = max(1, min(spec["nlist"], n_train // MIN_POINTS_PER_CENTROID or 1))
+        spec["nprobe"] = max(1, min(spec["nprobe"], spec["nlist"]))
+    if "pq_m" in spec:
+        pq_m = max(1, min(spec["pq_m"], dimension))
+        while dimension % pq_m:
+            pq_m -= 1
+        spec["pq_m"] = pq_m
+        pq_nbits = spec["pq_nbits"]
+        while pq_nbits > 1 and (1 << pq_nbits) * MIN_POINTS_PER_CENTROID > n_train:
+            pq_nbits -= 1
+        spec["pq_nbits"] = pq_nbits
+    return spec
+
+
+def factory_string(spec):
+    """The faiss.index_factory description of a spec."""
+    index_type = spec["type"]
+    if index_type == "flat":
+        return "IDMap,Flat"
+    if index_type == "ivf_flat":
+        return f"IVF{spec['nlist']},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{spec['nlist']},PQ{spec['pq_m']}x{spec['pq_nbits']}"
+    if index_type == "hnsw":
+        return f"IDMap,HNSW{spec['hnsw_m']},Flat"
+    if index_type == "sq_fp16":
+        return "IDMap,SQfp16"
+    if index_type == "sq8":
+        return "IDMap,SQ8"
+    if index_type == "pq":
+        return f"IDMap,PQ{spec['pq_m']}x{spec['pq_nbits']}"
+    raise ValueError(f"Unknown index type '{index_type}'")
+
+
+def create_index(spec, dimension):
+    """Creates an empty index for the spec that accepts add_with_ids()."""
+    index = faiss.index_factory(dimension, factory_string(spec), faiss.METRIC_L2)
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efConstruction = spec["ef_construction"]
+    return index
+
+
+def training_sample(vectors, train_size, seed=0):
+    """Random subset of at most train_size rows used to train IVF/PQ/SQ8 indexes."""
+    if len(vectors) <= train_size:
+        return np.ascontiguousarray(vectors, dtype="float32")
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(vectors), size=train_size, replace=False)
+    return np.ascontiguousarray(vectors[np.sort(rows)], dtype="float32")
+
+
+def train_index(index, spec, vectors, seed=0):
+    if not index.is_trained:
+        index.train(training_sample(vectors, spec.get("train_size", DEFAULT_PARAMS["train_size"]), seed))
+
+
+def build_index(spec, vectors, ids, seed=0):
+    """Creates, trains and fills an index in one go. Returns (index, fitted_spec)."""
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    spec = fit_spec(spec, vectors.shape[1], min(len(vectors), spec.get("train_size", len(vectors))))
+    index = create_index(spec, vectors.shape[1])
+    if len(vectors):
+        train_index(index, spec, vectors, seed)
+        index.add_with_ids(vectors, np.asarray(ids, dtype="int64"))
+    apply_search_params(index, spec)
+    return index, spec
+
+
+def _base_index(index):
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def apply_search_params(index, spec):
+    """Sets query-time parameters (nprobe / efSearch) recorded in the spec."""
+    if not spec:
+        return index
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexIVF) and "nprobe" in spec:
+        base.nprobe = spec["nprobe"]
+    if isinstance(base, faiss.IndexHNSW) and "ef_search" in spec:
+        base.hnsw.efSearch = spec["ef_search"]
+    return index
+
+
+def supports_removal(index):
+    """HNSW graphs cannot drop vectors; everything else here supports remove_ids()."""
+    return not isinstance(_base_index(index), faiss.IndexHNSW)
+
+
+def read_index(path, spec=None, io_flags=0):
+    """Reads an index and re-applies the search parameters from its spec."""
+    index = faiss.read_index(path, io_flags)
+    return apply_search_params(index, spec)
@@ -0,0 +1,161 @@
+"""
+Streaming readers and batched encoding for large policy sources.
+
+Sources are read in fixed-size row chunks (Excel in openpyxl read-only mode, CSV with
+pandas chunks, Parquet with pyarrow record batches), so only one chunk of rows is
+in memory at a time. Texts are encoded in configurable batches, optionally across a
+process pool where every worker loads its own copy of the model.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+DEFAULT_CHUNK_ROWS = 10000
+DEFAULT_BATCH_SIZE = 256
+
+
+def _excel_value(value):
+    # Match pd.read_excel(dtype=str): integral floats lose their '.0', empty cells become ''
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _iter_excel_chunks(source_path, chunk_rows, sheet_name=None):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(source_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name) if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+        buffer = []
+        for values in rows:
+            if values is None or all(v is None for v in values):
+                continue
+            buffer.append([_excel_value(v) for v in values[:len(columns)]])
+            if len(buffer) >= chunk_rows:
+                yield pd.DataFrame(buffer, columns=columns)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns)
+    finally:
+        workbook.close()
+
+
+def _iter_csv_chunks(source_path, chunk_rows):
+    for chunk in pd.read_csv(source_path, dtype=str, keep_default_na=False, chunksize=chunk_rows):
+        yield chunk
+
+
+def _iter_parquet_chunks(source_path, chunk_rows):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(source_path)
+    for batch in parquet_file.iter_batches(batch_size=chunk_rows):
+        yield batch.to_pandas().astype(object).fillna("").astype(str)
+
+
+def iter_source_chunks(source_path, chunk_rows=DEFAULT_CHUNK_ROWS, sheet_name=None):
+    """
+    Yields the rows of an .xlsx, .csv or .parquet source as DataFrames of at most
+    'chunk_rows' rows, with every value as a string and missing values as ''.
+    """
+    extension = os.path.splitext(source_path)[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        return _iter_excel_chunks(source_path, chunk_rows, sheet_name)
+    if extension == ".csv":
+        return _iter_csv_chunks(source_path, chunk_rows)
+    if extension == ".parquet":
+        return _iter_parquet_chunks(source_path, chunk_rows)
+    raise ValueError(f"Unsupported source type '{extension}' (expected .xlsx, .csv or .parquet)")
+
+
+def chunk_texts(chunk):
+    """Column-wise concatenation of every value in the row, space separated (same text as row_text())."""
+    columns = list(chunk.columns)
+    if not columns:
+        return pd.Series([""] * len(chunk), index=chunk.index)
+    texts = chunk[columns[0]].astype(str)
+    if len(columns) > 1:
+        texts = texts.str.cat([chunk[c].astype(str) for c in columns[1:]], sep=" ")
+    return texts
+
+
+# --- Encoding ---
+# One model per process: set up by _init_worker() in pool workers (or in-process for workers=1).
+_worker_model = None
+_worker_model_name = None
+
+
+def _init_worker(model_name):
+    global _worker_model, _worker_model_name
+    from sentence_transformers import SentenceTransformer
+
+    _worker_model = SentenceTransformer(model_name)
+    _worker_model_name = model_name
+
+
+def _encode_batch(texts):
+    return _worker_model.encode(texts, batch_size=len(texts), show_progress_bar=False).astype("float32")
+
+
+class BatchEncoder:
+    """
+    Encodes text batches in order. With workers > 1 batches are spread over a process
+    pool; at most 2 * workers batches are in flight, which bounds memory use.
+    """
+
+    def __init__(self, model_name, batch_size=DEFAULT_BATCH_SIZE, workers=1):
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+
+    def batches(self, items):
+        """Groups (payload, text) pairs into lists of at most batch_size."""
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def encode_stream(self, items):
+        """
+        Takes an iterable of (payload, text) pairs and yields (payloads, embeddings)
+        per batch, in input order, as batches complete.
+        """
+        if self.workers == 1:
+            if _worker_model_name != self.model_name:
+                _init_worker(self.model_name)
+            for batch in self.batches(items):
+                yield [payload for payload, _ in batch], _encode_batch([text for _, text in batch])
+            return
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self.model_name,)) as executor:
+            pending = deque()
+            for batch in self.batches(items):
+                pending.append(([payload for payload, _ in batch], executor.submit(_encode_batch, [text for _, text in batch])))
+                if len(pending) >= 2 * self.workers:
+                    payloads, future = pending.popleft()
+                    yield payloads, future.result()
+            while pending:
+                payloads, future = pending.popleft()
+                yield payloads, future.result()
+
+    def encode(self, texts):
+        """Encodes a list of texts and returns one float32 matrix."""
+        import numpy as np
+
+        parts = [embeddings for _, embeddings in self.encode_stream((None, text) for text in texts)]
+        return np.concatenate(parts) if parts else np.zeros((0, 0), dtype="float32")
@@ -0,0 +1,159 @@
+"""
+BM25 inverted index and structured filters over the RAG document metadata.
+
+Dense retrieval ranks exact identifiers such as 'cellTotalResourceUsageUl' or
+'sliceData.node' no better than fuzzy neighbours. The keyword index scores them
+exactly and is fused with the FAISS ranking by reciprocal rank fusion. Filters on
+'MO Type', 'Operation' and 'Use Case' narrow the candidate set before any scoring.
+"""
+
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+
+# Friendly filter names -> metadata columns (the sheet headers carry trailing spaces)
+FILTER_FIELDS = {
+    "mo_type": "MO Type",
+    "operation": "Operation",
+    "use_case": "Use Case ",
+}
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9_][A-Za-z0-9_.%-]*")
+_CAMEL_RE = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+
+RRF_K = 60
+
+
+def tokenize(text):
+    """
+    Lower-cased terms. Identifiers are kept whole ('celltotalresourceusageul',
+    'slicedata.node') and also split into their dotted and camelCase parts, so
+    exact and partial mentions both match.
+    """
+    terms = []
+    for token in _TOKEN_RE.findall(str(text)):
+        token = token.strip(".-%")
+        if not token:
+            continue
+        terms.append(token.lower())
+        parts = [p for p in re.split(r"[._%-]", token) if p]
+        if len(parts) > 1:
+            terms.extend(p.lower() for p in parts)
+        for part in parts:
+            words = _CAMEL_RE.findall(part)
+            if len(words) > 1:
+                terms.extend(w.lower() for w in words)
+    return terms
+
+
+def document_terms(metadata):
+    """All terms of a document's metadata values."""
+    terms = []
+    for value in metadata.values():
+        terms.extend(tokenize(value))
+    return terms
+
+
+def normalize_value(value):
+    return " ".join(str(value).split()).casefold()
+
+
+def resolve_filter_field(name):
+    """Accepts 'mo_type' style names or the metadata column itself."""
+    if name in FILTER_FIELDS:
+        return FILTER_FIELDS[name]
+    for column in FILTER_FIELDS.values():
+        if name.strip().casefold() == column.strip().casefold():
+            return column
+    raise ValueError(f"Unsupported filter '{name}' (expected one of {', '.join(FILTER_FIELDS)})")
+
+
+class KeywordIndex:
+    """BM25 (Okapi, k1/b) over the metadata values of every document, plus value -> IDs maps for filtering."""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)
+        self.doc_lengths = {}
+        self.total_length = 0
+        self.average_length = 0.0
+        self.field_values = {column: defaultdict(set) for column in FILTER_FIELDS.values()}
+
+    @classmethod
+    def from_documents(cls, documents, **kwargs):
+        """Builds the index from {doc_id: {"metadata": {...}, ...}}."""
+        index = cls(**kwargs)
+        for doc_id, doc in documents.items():
+            index.add(doc_id, doc["metadata"])
+        return index
+
+    def add(self, doc_id, metadata):
+        terms = document_terms(metadata)
+        for term, count in Counter(terms).items():
+            self.postings[term].append((doc_id, count, len(terms)))
+        self.doc_lengths[doc_id] = len(terms)
+        self.total_length += len(terms)
+        self.average_length = self.total_length / len(self.doc_lengths)
+        for column, values in self.field_values.items():
+            if column in metadata:
+                values[normalize_value(metadata[column])].add(doc_id)
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    # Storage accessors; metadata_store.SqliteKeywordIndex answers these from SQLite instead of memory.
+    def _postings(self, term):
+        """(doc_id, term frequency, document length) for every document containing the term."""
+        return self.postings.get(term)
+
+    def _average_length(self):
+        return self.average_length
+
+    def _ids_with_value(self, column, value):
+        return self.field_values[column].get(value, set())
+
+    def filter_ids(self, filters):
+        """IDs of documents matching every {field: value or [values]} filter (None means no filtering)."""
+        if not filters:
+            return None
+        selected = None
+        for name, wanted in filters.items():
+            column = resolve_filter_field(name)
+            wanted = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+            ids = set()
+            for value in wanted:
+                ids |= self._ids_with_value(column, normalize_value(value))
+            selected = ids if selected is None else selected & ids
+            if not selected:
+                break
+        return selected
+
+    def search(self, query, k=10, candidates=None):
+        """Top k (doc_id, score) pairs for the query, restricted to 'candidates' when given."""
+        n_docs = len(self)
+        if not n_docs:
+            return []
+        average_length = self._average_length() or 1.0
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self._postings(term)
+            if not postings:
+                continue
+            idf = math.log(1.0 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf, length in postings:
+                if candidates is not None and doc_id not in candidates:
+                    continue
+                length_norm = 1.0 - self.b + self.b * length / average_length
+                scores[doc_id] += idf * tf * (self.k1 + 1.0) / (tf + self.k1 * length_norm)
+        return heapq.nsmallest(k, scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fuses ranked ID lists: score(d) = sum over rankings of 1 / (k + rank). Returns (id, score) best first."""
+    fused = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] += 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: (-item[1], item[0]))
@@ -0,0 +1,230 @@
+"""
+Compact, random-access metadata store for the slice-policy RAG (replaces rag_data.json).
+
+One SQLite file keyed by FAISS vector ID:
+    documents(id, metadata, length, mo_type, operation, use_case)
+    postings(term, doc_id, tf)        BM25 inverted index (see keyword_index.py)
+    info(key, value)                  document count and average length
+
+Readers open it read-only and decode only the rows that retrieval returns, so startup
+no longer parses every document. The filter columns and postings are indexed, so
+filters and keyword search run as index lookups instead of scans. A document's text is
+the concatenation of its metadata values, so it is derived on read rather than stored twice.
+
+One-shot migration from an existing rag_data.json:
+    python metadata_store.py migrate rag_data.json rag_metadata.sqlite
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+from collections import Counter
+
+from keyword_index import FILTER_FIELDS, KeywordIndex, document_terms, normalize_value
+
+STORE_PATH = "rag_metadata.sqlite"
+
+# Filter name -> column in the documents table
+FILTER_COLUMNS = {column: name for name, column in FILTER_FIELDS.items()}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    metadata TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    mo_type TEXT,
+    operation TEXT,
+    use_case TEXT
+);
+CREATE INDEX IF NOT EXISTS documents_mo_type ON documents (mo_type);
+CREATE INDEX IF NOT EXISTS documents_operation ON documents (operation);
+CREATE INDEX IF NOT EXISTS documents_use_case ON documents (use_case);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    doc_id INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def document_text(metadata):
+    """The text that gets embedded for a row: its values, space separated."""
+    return " ".join(str(value) for value in metadata.values())
+
+
+def _document(doc_id, metadata_json):
+    metadata = json.loads(metadata_json)
+    return {"id": doc_id, "text": document_text(metadata), "metadata": metadata}
+
+
+class MetadataStore:
+    """Mapping-like access to documents by vector ID: store[id] -> {"id": ..., "text": ..., "metadata": {...}}."""
+
+    def __init__(self, path=STORE_PATH, readonly=True):
+        self.path = path
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def __contains__(self, doc_id):
+        return self.conn.execute("SELECT 1 FROM documents WHERE id = ?", (int(doc_id),)).fetchone() is not None
+
+    def __getitem__(self, doc_id):
+        row = self.conn.execute("SELECT metadata FROM documents WHERE id = ?", (int(doc_id),)).fetchone()
+        if row is None:
+            raise KeyError(doc_id)
+        return _document(int(doc_id), row[0])
+
+    def get_many(self, doc_ids):
+        """Decodes only the requested documents; returns {id: document}."""
+        doc_ids = [int(i) for i in doc_ids]
+        if not doc_ids:
+            return {}
+        placeholders = ",".join("?" * len(doc_ids))
+        rows = self.conn.execute(f"SELECT id, metadata FROM documents WHERE id IN ({placeholders})", doc_ids)
+        return {row[0]: _document(*row) for row in rows}
+
+    def iter_documents(self, batch_size=10000):
+        """Streams every document in ID order."""
+        last_id = None
+        while True:
+            if last_id is None:
+                rows = self.conn.execute("SELECT id, metadata FROM documents ORDER BY id LIMIT ?", (batch_size,)).fetchall()
+            else:
+                rows = self.conn.execute("SELECT id, metadata FROM documents WHERE id > ? ORDER BY id LIMIT ?",
+                                         (last_id, batch_size)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield _document(*row)
+            last_id = rows[-1][0]
+
+    # --- Writing ---
+    def add_documents(self, documents):
+        """Inserts or replaces (id, metadata) documents, including their postings. Call commit() afterwards."""
+        doc_rows, posting_rows, ids = [], [], []
+        for doc_id, metadata in documents:
+            doc_id = int(doc_id)
+            terms = document_terms(metadata)
+            filters = [normalize_value(metadata[column]) if column in metadata else None for column in FILTER_COLUMNS]
+            doc_rows.append((doc_id, json.dumps(metadata, ensure_ascii=False, separators=(",", ":")), len(terms), *filters))
+            posting_rows.extend((term, doc_id, tf) for term, tf in Counter(terms).items())
+            ids.append((doc_id,))
+        self.conn.executemany("DELETE FROM postings WHERE doc_id = ?", ids)
+        self.conn.executemany("INSERT OR REPLACE INTO documents (id, metadata, length, mo_type, operation, use_case) "
+                              "VALUES (?, ?, ?, ?, ?, ?)", doc_rows)
+        self.conn.executemany("INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)", posting_rows)
+
+    def remove_documents(self, doc_ids):
+        ids = [(int(i),) for i in doc_ids]
+        self.conn.executemany("DELETE FROM postings WHERE doc_id = ?", ids)
+        self.conn.executemany("DELETE FROM documents WHERE id = ?", ids)
+
+    def clear(self):
+        self.conn.execute("DELETE FROM postings")
+        self.conn.execute("DELETE FROM documents")
+
+    def commit(self):
+        """Refreshes the corpus statistics used by BM25 and commits."""
+        count, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM documents").fetchone()
+        self.conn.executemany("INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)",
+                              [("document_count", str(count)), ("average_length", str(total / count if count else 0.0))])
+        self.conn.commit()
+
+    def keyword_index(self):
+        return SqliteKeywordIndex(self)
+
+
+class SqliteKeywordIndex(KeywordIndex):
+    """
+    Read-only KeywordIndex whose postings, lengths and filter values are read from the
+    store on demand. Searching and filtering work as on KeywordIndex; documents are
+    written through MetadataStore.add_documents(), not through the index.
+    """
+
+    def __init__(self, store, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+        info = dict(store.conn.execute("SELECT key, value FROM info").fetchall())
+        self._count = int(info.get("document_count", 0))
+        self._average = float(info.get("average_length", 0.0))
+
+    def __len__(self):
+        return self._count
+
+    @classmethod
+    def from_documents(cls, documents, **kwargs):
+        """Not supported: build a KeywordIndex, or open MetadataStore(...).keyword_index()."""
+        raise TypeError("SqliteKeywordIndex is read-only; use KeywordIndex.from_documents() "
+                        "or MetadataStore.add_documents()")
+
+    def add(self, doc_id, metadata):
+        """Not supported: the index is a read-only view of the store."""
+        raise TypeError("SqliteKeywordIndex is read-only; write through MetadataStore.add_documents()")
+
+    def _postings(self, term):
+        # Lengths come with the postings, so nothing per document is kept between queries
+        return self.store.conn.execute(
+            "SELECT p.doc_id, p.tf, d.length FROM postings p JOIN documents d ON d.id = p.doc_id WHERE p.term = ?",
+            (term,)).fetchall()
+
+    def _average_length(self):
+        return self._average
+
+    def _ids_with_value(self, column, value):
+        rows = self.store.conn.execute(f"SELECT id FROM documents WHERE {FILTER_COLUMNS[column]} = ?", (value,))
+        return {row[0] for row in rows}
+
+
+def migrate_json(json_path, store_path=STORE_PATH):
+    """One-shot conversion of a rag_data.json list into the SQLite store. Returns the document count."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        rag_data = json.load(f)
+    tmp_path = store_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    store = MetadataStore(tmp_path, readonly=False)
+    # Documents without an ID (stores built before IDs existed) are addressed by list position
+    store.add_documents((item.get("id", pos), item["metadata"]) for pos, item in enumerate(rag_data))
+    store.commit()
+    store.close()
+    os.replace(tmp_path, store_path)
+    return len(rag_data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the RAG metadata store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="Convert rag_data.json into the SQLite store.")
+    migrate_parser.add_argument("json_path", nargs="?", default="rag_data.json")
+    migrate_parser.add_argument("store_path", nargs="?", default=STORE_PATH)
+    show_parser = subparsers.add_parser("show", help="Print one document by vector ID.")
+    show_parser.add_argument("doc_id", type=int)
+    show_parser.add_argument("--store", default=STORE_PATH)
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        count = migrate_json(args.json_path, args.store_path)
+        print(f"Migrated {count} documents from {args.json_path} to {args.store_path}.")
+    elif args.command == "show":
+        store = MetadataStore(args.store)
+        try:
+            print(json.dumps(store[args.doc_id], indent=2, ensure_ascii=False))
+        except KeyError:
+            print(f"No document with ID {args.doc_id}.")
+
+
+if __name__ == "__main__":
+    main()
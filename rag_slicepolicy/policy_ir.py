@@ -0,0 +1,204 @@
+"""
+Small intermediate representation for turning retrieved policy rows into Rego.
+
+Each sheet row becomes one condition  input.<Full Path>.<MO Type>.<Attribute> <op> <value>,
+with the Operation compiled to a real Rego comparison and the Value typed (numbers,
+booleans and null are not quoted). Rows that share (Use Case, Full Path, MO Type,
+Response) are merged into one rule body, identical conditions are emitted once and
+several equality rows on the same attribute become one set-membership test, so OPA
+evaluates a few short rules instead of one rule per row.
+"""
+
+import json
+import re
+from collections import OrderedDict, namedtuple
+
+# Normalized Operation text -> Rego comparison operator
+OPERATORS = {
+    "EQUALS": "==",
+    "EQUAL": "==",
+    "EQ": "==",
+    "IS": "==",
+    "==": "==",
+    "=": "==",
+    "NOT EQUALS": "!=",
+    "NOT EQUAL": "!=",
+    "NE": "!=",
+    "!=": "!=",
+    "GREATER THAN": ">",
+    "GT": ">",
+    ">": ">",
+    "GREATER THAN OR EQUAL": ">=",
+    "GREATER THAN OR EQUALS": ">=",
+    "GE": ">=",
+    ">=": ">=",
+    "LESS THAN": "<",
+    "LT": "<",
+    "<": "<",
+    "LESS THAN OR EQUAL": "<=",
+    "LESS THAN OR EQUALS": "<=",
+    "LE": "<=",
+    "<=": "<=",
+}
+
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_NUMBER_RE = re.compile(r"^[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?$")
+
+Condition = namedtuple("Condition", "ref op value")
+
+
+class Rule:
+    """One Rego rule: a conjunction of conditions producing a response (or plain allow when there is none)."""
+
+    def __init__(self, use_case, full_path, mo_type, response):
+        self.use_case = use_case
+        self.full_path = full_path
+        self.mo_type = mo_type
+        self.response = response
+        self.conditions = OrderedDict()
+
+    def add(self, condition):
+        self.conditions.setdefault(condition, None)
+
+    def body(self):
+        """Conditions in first-seen order; equality rows on the same ref are folded into one membership test."""
+        equalities = OrderedDict()
+        for condition in self.conditions:
+            if condition.op == "==":
+                equalities.setdefault(condition.ref, []).append(condition.value)
+        lines, emitted = [], set()
+        for condition in self.conditions:
+            values = equalities.get(condition.ref) if condition.op == "==" else None
+            if values and len(values) > 1:
+                if condition.ref not in emitted:
+                    emitted.add(condition.ref)
+                    members = ", ".join(rego_literal(v) for v in values)
+                    lines.append(f"{condition.ref} in {{{members}}}")
+                continue
+            lines.append(f"{condition.ref} {condition.op} {rego_literal(condition.value)}")
+        return lines
+
+
+def normalize_operation(operation):
+    """Maps an Operation cell ('GREATER THAN', 'not_equals', '>=') to a Rego operator."""
+    key = " ".join(re.sub(r"[_-]", " ", str(operation)).split()).upper()
+    if key not in OPERATORS:
+        raise ValueError(f"Unsupported operation '{operation}'")
+    return OPERATORS[key]
+
+
+def parse_value(raw):
+    """
+    Types a sheet value: numbers, true/false and null become Rego numbers, booleans and
+    null; quoted cells ('"activate-slice"', JSON-escaped responses) are unquoted.
+    """
+    if raw is None:
+        return None
+    if isinstance(raw, (bool, int, float)):
+        return None if raw != raw else raw  # NaN -> null
+    text = str(raw).strip()
+    if len(text) >= 2 and text[0] == text[-1] == '"':
+        try:
+            value = json.loads(text)
+        except ValueError:
+            value = text[1:-1]
+        return value if isinstance(value, str) else text[1:-1]
+    lowered = text.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    if lowered in ("null", "none", "nan", ""):
+        return None
+    if _NUMBER_RE.match(text):
+        number = float(text)
+        return int(number) if number.is_integer() and "." not in text and "e" not in lowered else number
+    return text
+
+
+def rego_literal(value):
+    """Rego source for a typed value."""
+    if value is None:
+        return "null"
+    return json.dumps(value, ensure_ascii=False)
+
+
+def input_ref(*parts):
+    """input.a.b.c, with bracket notation for segments that are not identifiers."""
+    ref = "input"
+    for part in parts:
+        for segment in str(part).strip().split("."):
+            segment = segment.strip()
+            if not segment:
+                continue
+            ref += f".{segment}" if _IDENTIFIER_RE.match(segment) else f"[{json.dumps(segment)}]"
+    return ref
+
+
+def _field(metadata, name):
+    """Metadata value by column name, ignoring the stray spaces in the sheet headers."""
+    if name in metadata:
+        return metadata[name]
+    for key, value in metadata.items():
+        if str(key).strip().casefold() == name.casefold():
+            return value
+    return None
+
+
+def _text(value):
+    value = parse_value(value)
+    return "" if value is None else str(value).strip()
+
+
+def attribute_ref(metadata):
+    """input.<Full Path>.<MO Type>.<Attribute>; the MO Type is not repeated when the path already ends with it."""
+    full_path = _text(_field(metadata, "Full Path"))
+    mo_type = _text(_field(metadata, "MO Type"))
+    attribute = _text(_field(metadata, "Attribute"))
+    if mo_type and full_path.split(".")[-1] == mo_type:
+        mo_type = ""
+    return input_ref(full_path, mo_type, attribute)
+
+
+def compile_rules(rows):
+    """
+    Compiles metadata rows into merged rules. Returns (rules, skipped) where 'skipped'
+    lists (row, reason) for rows whose Operation cannot be compiled.
+    """
+    rules = OrderedDict()
+    skipped = []
+    for metadata in rows:
+        try:
+            op = normalize_operation(_field(metadata, "Operation") or "EQUALS")
+        except ValueError as e:
+            skipped.append((metadata, str(e)))
+            continue
+        key = (_text(_field(metadata, "Use Case")), _text(_field(metadata, "Full Path")),
+               _text(_field(metadata, "MO Type")), _text(_field(metadata, "Response")))
+        if key not in rules:
+            rules[key] = Rule(*key)
+        rules[key].add(Condition(attribute_ref(metadata), op, parse_value(_field(metadata, "Value"))))
+    return list(rules.values()), skipped
+
+
+def render_module(rules, package="main", skipped=()):
+    """Renders compiled rules as a Rego module (v1 syntax)."""
+    lines = [f"package {package}", "", "# Generated Rego Policy", "", "default allow := false", ""]
+    if any(rule.response for rule in rules):
+        lines += ["allow if count(responses) > 0", ""]
+    for metadata, reason in skipped:
+        lines.append(f"# Skipped {_text(_field(metadata, 'Attribute')) or 'row'}: {reason}")
+    if skipped:
+        lines.append("")
+    for rule in rules:
+        title = ", ".join(part for part in (rule.use_case, rule.full_path, rule.mo_type) if part)
+        lines.append(f"# {title}")
+        head = f"responses contains {rego_literal(rule.response)} if {{" if rule.response else "allow if {"
+        lines.append(head)
+        lines += [f"    {condition}" for condition in rule.body()]
+        lines += ["}", ""]
+    return "\n".join(lines)
+
+
+def compile_policy(rows, package="main"):
+    """Metadata rows -> Rego module text."""
+    rules, skipped = compile_rules(rows)
+    return render_module(rules, package, skipped)
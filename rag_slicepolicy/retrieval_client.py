@@ -0,0 +1,50 @@
+"""
+Thin client for retrieval_server.py. Only uses the standard library, so callers do not
+pay for importing faiss, torch or sentence-transformers.
+"""
+
+import json
+import os
+
+DEFAULT_URL = os.environ.get("RAG_SERVER_URL", "http://127.0.0.1:8765")
+
+
+class RetrievalServerError(Exception):
+    """Raised when the retrieval daemon is unreachable or rejects a request."""
+
+
+def _request(url, payload=None, timeout=30.0):
+    # urllib.request pulls in http.client, ssl and email; imported on first use so that
+    # 'chatbot.py --help' and the in-process path do not pay for it
+    import urllib.error
+    import urllib.request
+
+    data = None if payload is None else json.dumps(payload).encode("utf-8")
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        raise RetrievalServerError(f"Retrieval server returned {e.code}: {e.read().decode('utf-8', 'replace')}") from e
+    except (urllib.error.URLError, OSError) as e:
+        raise RetrievalServerError(f"Retrieval server not reachable at {url}: {e}") from e
+
+
+def search(queries, k=None, max_distance=None, filters=None, hybrid=True, url=DEFAULT_URL, timeout=30.0):
+    """Returns one list of retrieved documents per query."""
+    payload = {"queries": list(queries), "hybrid": hybrid}
+    if filters:
+        payload["filters"] = filters
+    if k is not None:
+        payload["k"] = k
+    if max_distance is not None:
+        payload["max_distance"] = max_distance
+    return _request(url.rstrip("/") + "/search", payload, timeout)["results"]
+
+
+def health(url=DEFAULT_URL, timeout=2.0):
+    """Returns the server's health document, or None when it is not running."""
+    try:
+        return _request(url.rstrip("/") + "/healthz", timeout=timeout)
+    except RetrievalServerError:
+        return None
@@ -0,0 +1,169 @@
+"""
+Long-running retrieval daemon for the slice-policy RAG.
+
+Keeps the sentence transformer, FAISS index and documents resident and answers queries
+over localhost HTTP, so chatbot.py (with --server) skips the cold start on every run.
+
+    POST /search   {"queries": ["..."], "k": 2, "max_distance": null, "filters": {"mo_type": "cells"}, "hybrid": true}  ->  {"results": [[{id, distance, text, metadata}, ...], ...]}
+    GET  /healthz  ->  {"status": "ok", "documents": N, "pid": ...}
+
+With --workers N the listening socket is bound once and N processes are forked to
+accept on it. Each worker loads its own model, while the index is memory-mapped
+read-only, so the workers share its pages through the page cache.
+
+Usage:
+    python retrieval_server.py --port 8765 --workers 2
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from retriever import DATA_PATH, DEFAULT_CACHE_SIZE, DEFAULT_K, INDEX_PATH, MANIFEST_PATH, Retriever
+
+MAX_QUERIES_PER_REQUEST = 1024
+MAX_K = 100
+
+
+class RetrievalHandler(BaseHTTPRequestHandler):
+    server_version = "RagRetrieval/1.0"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            retriever = self.server.retriever
+            self._send_json(200, {"status": "ok", "documents": len(retriever.documents), "pid": os.getpid(),
+                                  "cache": {"size": len(retriever.cache), "hits": retriever.cache.hits,
+                                            "misses": retriever.cache.misses}})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/search":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length).decode("utf-8") or "{}")
+            queries = request.get("queries")
+            if queries is None and "query" in request:
+                queries = [request["query"]]
+            if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+                raise ValueError("'queries' must be a list of strings")
+            if len(queries) > MAX_QUERIES_PER_REQUEST:
+                raise ValueError(f"At most {MAX_QUERIES_PER_REQUEST} queries per request")
+            k = int(request.get("k", DEFAULT_K))
+            if not 1 <= k <= MAX_K:
+                raise ValueError(f"'k' must be between 1 and {MAX_K}")
+            max_distance = request.get("max_distance")
+            max_distance = None if max_distance is None else float(max_distance)
+            filters = request.get("filters") or None
+            if filters is not None and not isinstance(filters, dict):
+                raise ValueError("'filters' must be an object")
+            hybrid = bool(request.get("hybrid", True))
+        except (ValueError, TypeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        with self.server.lock:
+            try:
+                results = self.server.retriever.search_batch(queries, k, max_distance, filters, hybrid)
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+                return
+        self._send_json(200, {"results": results})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class RetrievalServer(HTTPServer):
+    # Requests are handled one at a time per worker; concurrency comes from --workers.
+    allow_reuse_address = True
+
+    def __init__(self, address, retriever=None, verbose=False, bind_and_activate=True):
+        super().__init__(address, RetrievalHandler, bind_and_activate=bind_and_activate)
+        self.retriever = retriever
+        self.verbose = verbose
+        self.lock = threading.Lock()
+
+
+def _load_retriever(args):
+    return Retriever(index_path=args.index, data_path=args.data, manifest_path=args.manifest, model_name=args.model,
+                     cache_size=args.cache_size)
+
+
+def run_worker(server, args):
+    """Loads the resident state in this process and serves until terminated."""
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    server.retriever = _load_retriever(args)
+    print(f"[worker {os.getpid()}] ready with {len(server.retriever.documents)} documents.", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve slice-policy retrieval from a resident model and index.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (keep it local).")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="Number of forked worker processes.")
+    parser.add_argument("--index", default=INDEX_PATH)
+    parser.add_argument("--data", default=DATA_PATH, help="Metadata store (or a legacy rag_data.json).")
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    parser.add_argument("--model", default=None, help="Overrides the model recorded in the manifest.")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, help="Query embedding LRU cache entries.")
+    parser.add_argument("--verbose", action="store_true", help="Log every request.")
+    args = parser.parse_args()
+
+    server = RetrievalServer((args.host, args.port), verbose=args.verbose)
+    print(f"Retrieval server listening on http://{args.host}:{args.port} with {args.workers} worker(s).", flush=True)
+
+    if args.workers <= 1 or not hasattr(os, "fork"):
+        run_worker(server, args)
+        return
+
+    children = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(server, args)
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    def stop(*_):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, lambda *_: (stop(), sys.exit(0)))
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        stop()
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Resident retrieval state for the slice-policy RAG: FAISS index, documents and the
+sentence transformer, loaded once and reused for every query.
+"""
+
+import json
+import os
+from collections import OrderedDict
+
+import faiss
+import numpy as np
+
+from exact_vectors import ExactVectors
+from index_factory import read_index, rerank_factor
+from keyword_index import KeywordIndex, reciprocal_rank_fusion
+from metadata_store import STORE_PATH, MetadataStore
+
+INDEX_PATH = "rag_policies.faiss"
+DATA_PATH = STORE_PATH
+# Pre-SQLite document list; still read when no store has been built or migrated yet
+LEGACY_DATA_PATH = "rag_data.json"
+MANIFEST_PATH = "rag_manifest.json"
+MODEL_NAME = "all-MiniLM-L6-v2"
+DEFAULT_K = 2
+DEFAULT_CACHE_SIZE = 4096
+# In hybrid mode each ranker contributes this many candidates per requested document
+HYBRID_FETCH_FACTOR = 5
+
+
+def normalize_query(query):
+    """Cache key for a query. MiniLM is uncased, so case and spacing do not change the embedding."""
+    return " ".join(query.lower().split())
+
+
+class EmbeddingCache:
+    """Least-recently-used map of normalized query -> embedding."""
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        embedding = self._entries.get(key)
+        if embedding is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return embedding
+
+    def put(self, key, embedding):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def read_index_shared(index_path, spec=None):
+    """
+    Reads the index memory-mapped and read-only where the index type allows it, so
+    several worker processes share the same page-cache pages instead of private copies.
+    """
+    try:
+        return read_index(index_path, spec, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        return read_index(index_path, spec)
+
+
+class Retriever:
+    """Loads the index, documents and model on construction and answers queries against them."""
+
+    def __init__(self, index_path=INDEX_PATH, data_path=DATA_PATH, manifest_path=MANIFEST_PATH,
+                 model_name=None, mmap=True, cache_size=DEFAULT_CACHE_SIZE):
+        manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        self.model_name = model_name or manifest.get("model", MODEL_NAME)
+
+        # Load the FAISS index (with the search parameters recorded at build time) and RAG data
+        spec = manifest.get("index")
+        self.index = read_index_shared(index_path, spec) if mmap else read_index(index_path, spec)
+        # Quantized indexes propose rerank * k candidates that are re-scored against the exact vectors
+        self.rerank = rerank_factor(spec)
+        exact_path = manifest.get("exact_vectors")
+        if exact_path and not os.path.isabs(exact_path):
+            exact_path = os.path.join(os.path.dirname(os.path.abspath(manifest_path)), exact_path)
+        self.exact = ExactVectors(exact_path) if self.rerank and exact_path and os.path.exists(exact_path) else None
+        if not os.path.exists(data_path) and os.path.exists(LEGACY_DATA_PATH):
+            print(f"{data_path} not found, reading {LEGACY_DATA_PATH} (migrate with 'python metadata_store.py migrate').")
+            data_path = LEGACY_DATA_PATH
+        if data_path.endswith(".json"):
+            # Legacy rag_data.json: parsed whole. Documents are addressed by their FAISS ID
+            # (older stores without IDs use the list position)
+            with open(data_path, "r", encoding="utf-8") as f:
+                rag_data = json.load(f)
+            self.documents = {item.get("id", pos): item for pos, item in enumerate(rag_data)}
+            self.keywords = KeywordIndex.from_documents(self.documents)
+        else:
+            # SQLite store: documents, postings and filter values are read on demand
+            self.documents = MetadataStore(data_path)
+            self.keywords = self.documents.keyword_index()
+
+        # Load the sentence transformer model
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(self.model_name)
+        self.cache = EmbeddingCache(cache_size)
+
+    def embed(self, queries):
+        """
+        Embeds queries as one float32 matrix. Cached queries skip the encoder; the
+        remaining distinct queries are encoded together in a single forward pass.
+        """
+        keys = [normalize_query(q) for q in queries]
+        embeddings = [self.cache.get(key) for key in keys]
+        missing = list(OrderedDict.fromkeys(key for key, emb in zip(keys, embeddings) if emb is None))
+        if missing:
+            encoded = dict(zip(missing, self.model.encode(missing).astype("float32")))
+            for key, embedding in encoded.items():
+                self.cache.put(key, embedding)
+            embeddings = [encoded[key] if emb is None else emb for key, emb in zip(keys, embeddings)]
+        if not embeddings:
+            return np.zeros((0, self.index.d), dtype="float32")
+        return np.ascontiguousarray(np.stack(embeddings), dtype="float32")
+
+    def _dense_search(self, embeddings, k, candidates=None):
+        """
+        index.search(), restricted to the candidate IDs (when given) inside FAISS itself.
+        With exact vectors available, the quantized ranking is re-scored before the top k are kept.
+        """
+        if self.exact is None:
+            return self._index_search(embeddings, k, candidates)
+        _, labels = self._index_search(embeddings, k * self.rerank, candidates)
+        return self.exact.rerank(embeddings, labels, k)
+
+    def _index_search(self, embeddings, k, candidates=None):
+        if candidates is None:
+            return self.index.search(embeddings, k)
+        if not candidates:
+            return (np.full((len(embeddings), k), np.inf, dtype="float32"), np.full((len(embeddings), k), -1, dtype="int64"))
+        selector = faiss.IDSelectorBatch(np.array(sorted(candidates), dtype="int64"))
+        if isinstance(self.index, faiss.IndexIVF):
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=self.index.nprobe)
+        else:
+            params = faiss.SearchParameters(sel=selector)
+        return self.index.search(embeddings, k, params=params)
+
+    def _distances(self, embedding, doc_ids):
+        """
+        {id: squared L2 distance} from one query embedding to the given documents: exact when
+        the exact vectors are available, otherwise as the index measures them. Documents the
+        index cannot reach (e.g. in an IVF list that is not probed) are left out.
+        """
+        doc_ids = list(doc_ids)
+        queries = embedding[None, :]
+        if self.exact is not None:
+            distances, labels = self.exact.rerank(queries, np.array([doc_ids], dtype="int64"), len(doc_ids))
+        else:
+            distances, labels = self._index_search(queries, len(doc_ids), set(doc_ids))
+        return {int(i): float(d) for d, i in zip(distances[0], labels[0]) if i != -1}
+
+    def _fetch(self, doc_ids):
+        """{id: document} for just the documents being returned."""
+        if isinstance(self.documents, MetadataStore):
+            return self.documents.get_many(set(doc_ids))
+        return {doc_id: self.documents[doc_id] for doc_id in doc_ids}
+
+    @staticmethod
+    def _result(doc_id, doc, distance=None, score=None):
+        result = {"id": doc_id, "distance": distance, "text": doc["text"], "metadata": doc["metadata"]}
+        if score is not None:
+            result["score"] = score
+        return result
+
+    def search_batch(self, queries, k=DEFAULT_K, max_distance=None, filters=None, hybrid=True):
+        """
+        Returns, per query, up to k documents as dicts with 'id', 'distance', 'text' and
+        'metadata'. All queries are answered by one index.search() call. Documents further
+        than max_distance (squared L2) are dropped; in hybrid mode this also applies to
+        keyword hits, whose distance is measured when the dense search did not return them.
+
+        'filters' ({"mo_type": ..., "operation": ..., "use_case": ...}) restrict the
+        candidates before vector scoring. With 'hybrid', the dense ranking is fused with
+        BM25 keyword ranking by reciprocal rank fusion (the fused score is in 'score').
+        """
+        queries = list(queries)
+        if not queries:
+            return []
+        candidates = self.keywords.filter_ids(filters)
+        fetch = k * HYBRID_FETCH_FACTOR if hybrid else k
+        embeddings = self.embed(queries)
+        distances, indices = self._dense_search(embeddings, fetch, candidates)
+
+        # Rank first as (id, distance, score) triples, then decode only the winning documents
+        rankings = []
+        for query, embedding, row_distances, row_indices in zip(queries, embeddings, distances, indices):
+            dense = [(int(i), float(distance)) for distance, i in zip(row_distances, row_indices)
+                     if i != -1 and (max_distance is None or distance <= max_distance)]
+            if not hybrid:
+                rankings.append([(doc_id, distance, None) for doc_id, distance in dense[:k]])
+                continue
+            keyword = [doc_id for doc_id, _ in self.keywords.search(query, fetch, candidates)]
+            dense_distance = dict(dense)
+            if max_distance is not None:
+                # Keyword hits must pass the same cutoff; measure the ones the dense search did not return
+                unmeasured = [doc_id for doc_id in keyword if doc_id not in dense_distance]
+                measured = self._distances(embedding, unmeasured) if unmeasured else {}
+                dense_distance.update((doc_id, d) for doc_id, d in measured.items() if d <= max_distance)
+                keyword = [doc_id for doc_id in keyword if doc_id in dense_distance]
+            fused = reciprocal_rank_fusion([[doc_id for doc_id, _ in dense], keyword])[:k]
+            rankings.append([(doc_id, dense_distance.get(doc_id), score) for doc_id, score in fused])
+
+        documents = self._fetch(doc_id for ranking in rankings for doc_id, _, _ in ranking)
+        return [[self._result(doc_id, documents[doc_id], distance, score) for doc_id, distance, score in ranking]
+                for ranking in rankings]
+
+    def search(self, query, k=DEFAULT_K, max_distance=None, filters=None, hybrid=True):
+        """Single-query form of search_batch()."""
+        return self.search_batch([query], k, max_distance, filters, hybrid)[0]
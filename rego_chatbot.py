@@ -1,12 +1,49 @@
 
 
+"""
+Fills in the fixed slice policy templates (capacity_check, rantemplate, sfc).
+
+    python rego_chatbot.py rantemplate                  # asks for the parameters, prints one policy
+    python rego_chatbot.py --spec variants.yaml         # renders every variant into ./policies/
+    python rego_chatbot.py --spec variants.csv --tar policies.tar.gz
+    python rego_chatbot.py --spec variants.json --tar - | tar -t   # tar stream on stdout
+
+A spec is a list of policy entries. 'params' are fixed values, and every list in
+'matrix' is expanded as a cartesian product with the other matrix lists:
+
+    policies:
+      - type: rantemplate
+        matrix:
+          vendor: [Ericsson, Nokia]
+          swVersion: ["22.Q4", "23.Q1"]
+          operation: [create, modify, delete]
+      - type: capacity_check
+        matrix: {ul: [70, 80, 90], dl: [70, 80, 90]}
+      - type: sfc
+        params: {percentage: 60, reason: "Too few feasible cells"}
+        name: "sfc/min_{percentage}"        # optional output name, formatted with the parameters
+
+JSON specs have the same shape (YAML needs PyYAML). A CSV spec has a 'type' column and one
+column per parameter; each row is one entry, and a cell holding 'a|b|c' is a matrix list.
+Parameter names may be given as in the templates (sw_version) or as in the input documents
+(swVersion). Identical parameter sets are rendered once, and variants that render to the
+same text are written once; index.json lists every file with the parameter sets it covers.
+"""
+
 import argparse
+import csv
+import hashlib
+import io
+import itertools
+import json
+import os
+import re
+import string
+import sys
+import tarfile
 
-def generate_capacity_check_rego(ul, dl):
-    """
-    Generates a Rego policy for capacity check.
-    """
-    return f"""
+# --- Templates ---
+CAPACITY_CHECK_TEMPLATE = """
 package slice.capacitycheck
 
 default deny_message = ""
@@ -29,11 +66,7 @@ over_usage if {{
 }}
 """
 
-def generate_rantemplate_rego(vendor, sw_version, operation):
-    """
-    Generates a Rego policy for slice ran template.
-    """
-    return f"""
+RANTEMPLATE_TEMPLATE = """
 package slice.rantemplate
 
 default allow = false
@@ -49,15 +82,7 @@ response = "{vendor}_{sw_version}%2F{operation}%2FBaseTemplate.jinja?ref=main" i
 }}
 """
 
-def generate_sfc_rego(percentage, dl_vol_threshold=None, reason="No feasibility"):
-    """
-    Generates a Rego policy for checking if a slice is feasible.
-    """
-    dl_check = ""
-    if dl_vol_threshold is not None:
-        dl_check = f"    dlvolthreshold >= {dl_vol_threshold}"
-
-    return f"""
+SFC_TEMPLATE = """
 package slice.policy
 
 default allow = false
@@ -75,15 +100,280 @@ allow if {{
 reason = "Slice is feasible since minimum percentage of cells is available" if allow
 """
 
+
+def compile_template(template):
+    """
+    Parses a str.format template once. Returns a function that renders it from a dict by
+    joining the literal pieces with the values, without re-parsing the template.
+    """
+    literals, fields = [], []
+    for literal, field, _, _ in string.Formatter().parse(template):
+        literals.append(literal)
+        fields.append(field)
+
+    def render(params):
+        parts = []
+        for literal, field in zip(literals, fields):
+            parts.append(literal)
+            if field is not None:
+                parts.append(str(params[field]))
+        return "".join(parts)
+
+    return render
+
+
+render_capacity_check = compile_template(CAPACITY_CHECK_TEMPLATE)
+render_rantemplate = compile_template(RANTEMPLATE_TEMPLATE)
+render_sfc = compile_template(SFC_TEMPLATE)
+
+
+def generate_capacity_check_rego(ul, dl):
+    """
+    Generates a Rego policy for capacity check.
+    """
+    return render_capacity_check({"ul": ul, "dl": dl})
+
+def generate_rantemplate_rego(vendor, sw_version, operation):
+    """
+    Generates a Rego policy for slice ran template.
+    """
+    return render_rantemplate({"vendor": vendor, "sw_version": sw_version, "operation": operation})
+
+def generate_sfc_rego(percentage, dl_vol_threshold=None, reason="No feasibility"):
+    """
+    Generates a Rego policy for checking if a slice is feasible.
+    """
+    dl_check = ""
+    if dl_vol_threshold is not None:
+        dl_check = f"    dlvolthreshold >= {dl_vol_threshold}"
+
+    return render_sfc({"percentage": percentage, "dl_check": dl_check, "reason": reason})
+
+# --- Bulk spec mode ---
+# policy type -> (generator, required parameters, optional parameters, numeric parameters)
+POLICY_TYPES = {
+    "capacity_check": (generate_capacity_check_rego, ("ul", "dl"), (), ("ul", "dl")),
+    "rantemplate": (generate_rantemplate_rego, ("vendor", "sw_version", "operation"), (), ()),
+    "sfc": (generate_sfc_rego, ("percentage",), ("dl_vol_threshold", "reason"), ("percentage", "dl_vol_threshold")),
+}
+
+# Spellings from the input documents -> template parameter names
+PARAM_ALIASES = {
+    "vendorName": "vendor",
+    "swVersion": "sw_version",
+    "dlVolThreshold": "dl_vol_threshold",
+    "dl_volume_threshold": "dl_vol_threshold",
+}
+
+OUT_DIR = "policies"
+INDEX_FILE = "index.json"
+
+_NUMBER_RE = re.compile(r"^-?\d+(\.\d+)?$")
+_UNSAFE_NAME_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+class SpecError(ValueError):
+    """The spec file is malformed or names unknown policy types or parameters."""
+
+
+def load_spec(path):
+    """The list of policy entries in a YAML, JSON or CSV spec file."""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if extension == ".csv":
+            return [_csv_entry(row) for row in csv.DictReader(f)]
+        if extension in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise SpecError("YAML specs need PyYAML ('pip install pyyaml'); JSON and CSV specs do not.")
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+    if isinstance(spec, dict):
+        spec = spec.get("policies")
+    if not isinstance(spec, list):
+        raise SpecError("The spec must be a list of policy entries, or a mapping with a 'policies' list.")
+    return spec
+
+
+def _csv_entry(row):
+    entry = {"type": (row.pop("type", "") or "").strip(), "matrix": {}}
+    name = (row.pop("name", "") or "").strip()
+    if name:
+        entry["name"] = name
+    for key, cell in row.items():
+        cell = (cell or "").strip()
+        if key and cell:
+            entry["matrix"][key.strip()] = [value.strip() for value in cell.split("|")]
+    return entry
+
+
+def expand_entry(entry, position):
+    """Yields the parameter sets of one spec entry: its params combined with every matrix combination."""
+    if not isinstance(entry, dict) or entry.get("type") not in POLICY_TYPES:
+        raise SpecError(f"Entry {position}: 'type' must be one of {', '.join(POLICY_TYPES)}.")
+    matrix = {key: value if isinstance(value, list) else [value] for key, value in (entry.get("matrix") or {}).items()}
+    keys = list(matrix)
+    for values in itertools.product(*(matrix[key] for key in keys)):
+        params = dict(entry.get("params") or {})
+        params.update(zip(keys, values))
+        yield normalize_params(entry["type"], params, position)
+
+
+def normalize_params(policy_type, params, position):
+    """Maps aliases to template names and checks that the set fits the policy type."""
+    _, required, optional, numeric = POLICY_TYPES[policy_type]
+    normalized = {}
+    for key, value in params.items():
+        key = PARAM_ALIASES.get(key, key)
+        if key not in required and key not in optional:
+            raise SpecError(f"Entry {position}: '{policy_type}' has no parameter '{key}'.")
+        if value is None or value == "":
+            continue
+        value = str(value)
+        if key in numeric and not _NUMBER_RE.match(value):
+            raise SpecError(f"Entry {position}: {key} must be a number, got '{value}'.")
+        if any(c in value for c in '"\\\n'):
+            raise SpecError(f"Entry {position}: {key} must not contain quotes, backslashes or line breaks.")
+        normalized[key] = value
+    missing = [key for key in required if key not in normalized]
+    if missing:
+        raise SpecError(f"Entry {position}: '{policy_type}' needs {', '.join(missing)}.")
+    return normalized
+
+
+def output_name(policy_type, params, name_template=None):
+    """Relative .rego path of a variant: the entry's name template, or the type and parameter values."""
+    if name_template:
+        try:
+            name = name_template.format(**params)
+        except KeyError as e:
+            raise SpecError(f"Name template '{name_template}' uses {e}, which this variant does not set.")
+        parts = [_UNSAFE_NAME_RE.sub("-", part) for part in name.split("/") if part not in ("", ".", "..")]
+    else:
+        values = "_".join(params[key] for key in POLICY_TYPES[policy_type][1] + POLICY_TYPES[policy_type][2]
+                          if key in params)
+        parts = [policy_type, _UNSAFE_NAME_RE.sub("-", values)]
+    path = "/".join(parts)
+    return path if path.endswith(".rego") else path + ".rego"
+
+
+def render_spec(entries):
+    """
+    Yields (path, rego_code) once per distinct policy text, and finally returns the index
+    and counts. Rendering is lazy, so a writer can emit each file as soon as it is ready.
+    """
+    seen_params = set()
+    by_digest = {}
+    paths = {}
+    index = []
+    counts = {"parameter_sets": 0, "duplicate_sets": 0, "duplicate_outputs": 0}
+    for position, entry in enumerate(entries, start=1):
+        for params in expand_entry(entry, position):
+            generator = POLICY_TYPES[entry["type"]][0]
+            counts["parameter_sets"] += 1
+            key = (entry["type"], tuple(sorted(params.items())))
+            if key in seen_params:
+                counts["duplicate_sets"] += 1
+                continue
+            seen_params.add(key)
+            rego_code = generator(**params)
+            digest = hashlib.sha256(rego_code.encode("utf-8")).hexdigest()
+            if digest in by_digest:
+                counts["duplicate_outputs"] += 1
+                by_digest[digest]["params"].append(params)
+                continue
+            path = output_name(entry["type"], params, entry.get("name"))
+            if path in paths:
+                raise SpecError(f"Entry {position}: two different policies would be written to '{path}'. "
+                                "Give the entry a 'name' template that includes the varying parameters.")
+            paths[path] = digest
+            record = {"path": path, "type": entry["type"], "sha256": digest, "params": [params]}
+            by_digest[digest] = record
+            index.append(record)
+            yield path, rego_code
+    return index, counts
+
+
+class BundleWriter:
+    """Writes rendered files into a directory, or into a tar archive or stream, as they arrive."""
+
+    def __init__(self, out_dir=OUT_DIR, tar_path=None):
+        self.out_dir = out_dir
+        self.tar_path = tar_path
+        self._tar = None
+        if tar_path == "-":
+            self._tar = tarfile.open(fileobj=sys.stdout.buffer, mode="w|")
+        elif tar_path:
+            self._tar = tarfile.open(tar_path, "w|gz" if tar_path.endswith((".gz", ".tgz")) else "w|")
+
+    def add(self, path, text):
+        content = text.encode("utf-8")
+        if self._tar is not None:
+            info = tarfile.TarInfo(name=path)
+            info.size = len(content)
+            self._tar.addfile(info, io.BytesIO(content))
+            return
+        file_path = os.path.join(self.out_dir, *path.split("/"))
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "wb") as f:
+            f.write(content)
+
+    def close(self):
+        if self._tar is not None:
+            self._tar.close()
+
+
+def build_from_spec(spec_path, out_dir=OUT_DIR, tar_path=None):
+    """Renders every variant in the spec and writes it in one pass. Returns the index and counts."""
+    writer = BundleWriter(out_dir, tar_path)
+    try:
+        rendered = render_spec(load_spec(spec_path))
+        while True:
+            try:
+                path, rego_code = next(rendered)
+            except StopIteration as done:
+                index, counts = done.value
+                break
+            writer.add(path, rego_code)
+        writer.add(INDEX_FILE, json.dumps({"spec": os.path.basename(spec_path), "policies": index}, indent=2) + "\n")
+    finally:
+        writer.close()
+    return index, counts
+
+
 def main():
     """
     Main function to handle user input and generate Rego code.
     """
     parser = argparse.ArgumentParser(description="Generate Rego policies based on user input.")
-    parser.add_argument("policy_type", choices=["capacity_check", "rantemplate", "sfc"], help="The type of Rego policy to generate.")
-    
+    parser.add_argument("policy_type", nargs="?", choices=["capacity_check", "rantemplate", "sfc"], help="The type of Rego policy to generate.")
+    parser.add_argument("--spec", help="YAML, JSON or CSV file of parameter sets to render in bulk.")
+    parser.add_argument("--out", default=OUT_DIR, help=f"Directory for the rendered policies (default {OUT_DIR}).")
+    parser.add_argument("--tar", help="Write a tar archive instead of a directory (.tar.gz compresses; '-' streams to stdout).")
+
     args = parser.parse_args()
 
+    if args.spec:
+        # With the tar on stdout, the summary goes to stderr
+        report = sys.stderr if args.tar == "-" else sys.stdout
+        if not os.path.exists(args.spec):
+            print(f"Error: The file '{args.spec}' was not found.", file=report)
+            return
+        try:
+            index, counts = build_from_spec(args.spec, args.out, args.tar)
+        except (SpecError, ValueError) as e:
+            print(f"Error: {e}", file=report)
+            return
+        print(f"Rendered {len(index)} policies from {counts['parameter_sets']} parameter sets "
+              f"({counts['duplicate_sets']} duplicate sets, {counts['duplicate_outputs']} identical outputs skipped) "
+              f"into {'the tar stream' if args.tar == '-' else args.tar or args.out}.", file=report)
+        return
+
+    if args.policy_type is None:
+        parser.error("give a policy type, or --spec for bulk mode")
+
     if args.policy_type == "capacity_check":
         ul = input("Enter the UL threshold: ")
         dl = input("Enter the DL threshold: ")
@@ -101,7 +391,7 @@ def main():
         percentage = input("Enter the percentage threshold: ")
         dl_vol_threshold = input("Enter the DL volume threshold (optional): ")
         reason = input("Enter the reason for denial (optional, default is 'No feasibility'): ") or "No feasibility"
-        
+
         if dl_vol_threshold:
             rego_code = generate_sfc_rego(percentage, dl_vol_threshold, reason)
         else:
@@ -110,4 +400,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
@@ -5,17 +5,28 @@ from langchain.tools import Tool
 from langchain_experimental.agents.agent_toolkits import create_pandas_dataframe_agent
 from langchain_groq import ChatGroq
 from dotenv import load_dotenv
+from metamodel_index import load_index_if_available
+from consistency_bundle import BUNDLE_DIR, compile_consistency, write_bundle
+from dataset_registry import dataset_entry
+from llm_metrics import MetricsCallbackHandler
+import fake_llm
 
 load_dotenv()
 
 groq_api_key = os.getenv("GROQ_API_KEY")
 
-if not groq_api_key:
+if not groq_api_key and not fake_llm.replaying():
     print("Error: GROQ_API_KEY not found in .env file. Please set it.")
     exit()
 
-# Load the CSV file directly
-file_path = "master.csv"
+# Load the CSV file directly: the rules file of the DATASET named in the environment
+# (see dataset_registry.py), master.csv when none is configured
+try:
+    dataset = dataset_entry(os.getenv("DATASET"))
+    file_path = dataset["path"]
+except KeyError as e:
+    print(f"Error: {e.args[0]}")
+    exit()
 
 if not os.path.exists(file_path):
     print(f"Error: The file '{file_path}' was not found. Please make sure it is in the same directory as this script.")
@@ -30,21 +41,22 @@ except Exception as e:
     exit()
 
 # Initialize the Groq model
-llm = ChatGroq(temperature=0, model_name="llama3-70b-8192", groq_api_key=groq_api_key)
+# (LLM_PROVIDER=fake replays recorded answers instead, see fake_llm.py)
+callbacks = [MetricsCallbackHandler("rego_chatbot_advanced")]
+llm = fake_llm.chat_model(lambda: ChatGroq(temperature=0, model_name="llama3-70b-8192", groq_api_key=groq_api_key,
+                                           callbacks=callbacks), "llama3-70b-8192", callbacks)
+
+# --- Metamodel Hierarchy ---
+# Optional precomputed closure built with metamodel_index.py. When present, asking for a
+# parent MO Type (e.g. 'ENODEBFUNCTION') generates one rule per child MO Type found in master.csv.
+# The index is the dataset's own, as in dataset_registry.load_dataset.
+hierarchy = load_index_if_available(dataset["metamodel_index"]) if dataset.get("metamodel_index") else None
 
 # --- Custom Rego Generation Tool ---
-def generate_rego_policy_tool_func(query_mo_type: str) -> str:
+def render_rego_policy(row_data) -> str:
     """
-    Generates Rego policy code based on the MO Type found in the master.csv.
-    The query_mo_type should be a string representing the 'MO Type' column value.
+    Renders the Rego policy for a single master.csv row.
     """
-    matching_rows = df[df['MO Type'].str.lower() == query_mo_type.lower()]
-
-    if matching_rows.empty:
-        return f"No matching data found for MO Type: {query_mo_type} in master.csv to generate Rego code."
-
-    row_data = matching_rows.iloc[0]
-
     vendor = row_data.get("Vendor", "unknown")
     mo_type = row_data.get("MO Type", "unknown")
     checking_attribute = row_data.get("Checking Attribute", "unknown")
@@ -81,10 +93,60 @@ allow {{
 """
     return rego_code
 
+def generate_rego_policy_tool_func(query_mo_type: str) -> str:
+    """
+    Generates Rego policy code based on the MO Type found in the master.csv.
+    The query_mo_type should be a string representing the 'MO Type' column value.
+    If it names a parent type in the metamodel hierarchy, one policy is generated per child MO Type.
+    """
+    query_mo_type = query_mo_type.strip()
+    mo_type_column = df['MO Type'].astype(str).str.lower()
+    matching_rows = df[mo_type_column == query_mo_type.lower()]
+
+    if not matching_rows.empty:
+        return render_rego_policy(matching_rows.iloc[0])
+
+    if hierarchy is not None and query_mo_type in hierarchy:
+        policies = []
+        for child_type in hierarchy.descendants(query_mo_type):
+            child_rows = df[mo_type_column == child_type.lower()]
+            if not child_rows.empty:
+                policies.append(render_rego_policy(child_rows.iloc[0]))
+        if policies:
+            return "\n".join(policies)
+
+    return f"No matching data found for MO Type: {query_mo_type} in master.csv to generate Rego code."
+
 rego_generation_tool = Tool(
     name="RegoGenerator",
     func=generate_rego_policy_tool_func,
-    description="Useful for generating Rego policy code. Input should be the 'MO Type' (e.g., 'LNBTS') for which to generate the Rego code. This tool will look up the MO Type in the master.csv and construct the Rego policy based on the corresponding row data."
+    description="Useful for generating Rego policy code. Input should be the 'MO Type' (e.g., 'LNBTS') for which to generate the Rego code. This tool will look up the MO Type in the master.csv and construct the Rego policy based on the corresponding row data. A parent MO Type from the metamodel hierarchy (e.g., 'ENODEBFUNCTION') generates one policy per child MO Type."
+)
+
+# --- Consistency Bundle Tool ---
+def generate_consistency_bundle_tool_func(query_mo_type: str) -> str:
+    """
+    Compiles the master.csv rules (all of them, or those of one MO Type) into a bundle of
+    data.json plus a generic policy.rego, so OPA evaluates them as indexed lookups.
+    """
+    query_mo_type = query_mo_type.strip().strip("'\"")
+    rows = df
+    if query_mo_type and query_mo_type.lower() != "all":
+        rows = df[df['MO Type'].astype(str).str.lower() == query_mo_type.lower()]
+        if rows.empty:
+            return f"No matching data found for MO Type: {query_mo_type} in master.csv to build a bundle."
+    rules, skipped = compile_consistency(rows)
+    paths = write_bundle(rules, BUNDLE_DIR)
+    checks = sum(len(c) for mos in rules.values() for attrs in mos.values() for c in attrs.values())
+    summary = f"Wrote {', '.join(paths)} with {checks} checks."
+    if skipped:
+        summary += f" Skipped {len(skipped)} row(s) with unsupported operations."
+    return summary
+
+consistency_bundle_tool = Tool(
+    name="ConsistencyBundle",
+    func=generate_consistency_bundle_tool_func,
+    description="Useful for generating an OPA bundle (data.json + generic policy.rego) from master.csv, which scales to thousands of rules. Input should be an 'MO Type' (e.g., 'LNBTS') or 'all' for every rule."
 )
 
 # --- CSV Querying Tool ---
@@ -108,6 +170,7 @@ csv_query_tool = Tool(
 # --- Main Agent Initialization ---
 tools = [
     rego_generation_tool,
+    consistency_bundle_tool,
     csv_query_tool
 ]
 
@@ -120,6 +183,7 @@ agent = initialize_agent(
     agent_kwargs={
         "prefix": "You are an AI assistant that can answer questions about a CSV file and generate Rego policy code. "
                   "When asked to generate Rego code, use the RegoGenerator tool with the appropriate MO Type. "
+                  "When asked for a bundle or for policies covering many rules, use the ConsistencyBundle tool. "
                   "For other questions about the CSV data, use the CSVQueryTool."
     }
 )
@@ -3,17 +3,25 @@ from langchain.agents.agent_types import AgentType
 from langchain_experimental.agents.agent_toolkits import create_csv_agent
 from langchain_groq import ChatGroq
 from dotenv import load_dotenv
+from dataset_registry import dataset_path
+from llm_metrics import MetricsCallbackHandler
+import fake_llm
 
 load_dotenv()
 
 groq_api_key = os.getenv("GROQ_API_KEY")
 
-if not groq_api_key:
+if not groq_api_key and not fake_llm.replaying():
     print("Error: GROQ_API_KEY not found in .env file. Please set it.")
     exit()
 
-# Load the CSV file directly
-file_path = "master.csv"
+# Load the CSV file directly: the rules file of the DATASET named in the environment
+# (see dataset_registry.py), master.csv when none is configured
+try:
+    file_path = dataset_path(os.getenv("DATASET"))
+except KeyError as e:
+    print(f"Error: {e.args[0]}")
+    exit()
 
 if not os.path.exists(file_path):
     print(f"Error: The file '{file_path}' was not found. Please make sure it is in the same directory as this script.")
@@ -22,7 +30,10 @@ if not os.path.exists(file_path):
 print(f"Loading CSV file: {file_path}")
 
 # Initialize the Groq model
-llm = ChatGroq(temperature=0, model_name="llama3-70b-8192", groq_api_key=groq_api_key)
+# (LLM_PROVIDER=fake replays recorded answers instead, see fake_llm.py)
+callbacks = [MetricsCallbackHandler("rego_chatbot_cli")]
+llm = fake_llm.chat_model(lambda: ChatGroq(temperature=0, model_name="llama3-70b-8192", groq_api_key=groq_api_key,
+                                           callbacks=callbacks), "llama3-70b-8192", callbacks)
 
 # Create the CSV agent
 agent = create_csv_agent(
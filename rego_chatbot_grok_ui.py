@@ -4,13 +4,15 @@ import os
 from dotenv import load_dotenv
 from langchain_groq import ChatGroq
 from langchain_core.messages import HumanMessage, AIMessage
+from llm_metrics import MetricsCallbackHandler
+import fake_llm
 
 # --- Configuration ---
 load_dotenv() # Load environment variables from .env file
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-if not GROQ_API_KEY:
+if not GROQ_API_KEY and not fake_llm.replaying():
     messagebox.showerror("API Key Error", "GROQ_API_KEY not found. Please set it as an environment variable in a .env file.")
     exit()
 
@@ -59,7 +61,10 @@ def check_and_initialize_chat():
     global llm_chain, chat_history_messages
     if master_csv_content and format_txt_content and llm_chain is None:
         try:
-            llm = ChatGroq(temperature=0, model_name="llama3-70b-8192", groq_api_key=GROQ_API_KEY)
+            callbacks = [MetricsCallbackHandler("rego_chatbot_grok_ui")]
+            llm = fake_llm.chat_model(lambda: ChatGroq(temperature=0, model_name="llama3-70b-8192",
+                                                       groq_api_key=GROQ_API_KEY, callbacks=callbacks),
+                                      "llama3-70b-8192", callbacks)
 
             initial_prompt_text = (
                 "You are an expert in generating Rego code based on provided data and a format template.\n"
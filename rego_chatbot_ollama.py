@@ -3,6 +3,9 @@ import pandas as pd
 from langchain.agents.agent_types import AgentType
 from langchain_experimental.agents.agent_toolkits import create_csv_agent
 from langchain_ollama import ChatOllama
+from dataset_registry import dataset_path
+from llm_metrics import MetricsCallbackHandler
+import fake_llm
 
 # Instructions for Ollama:
 # 1. Download and install Ollama from https://ollama.com/download
@@ -11,8 +14,13 @@ from langchain_ollama import ChatOllama
 # 4. Ensure the model is running when you execute this script.
 # 5. Install the new Ollama integration: pip install -U langchain-ollama
 
-# Load the CSV file directly
-file_path = "master.csv"
+# Load the CSV file directly: the rules file of the DATASET named in the environment
+# (see dataset_registry.py), master.csv when none is configured
+try:
+    file_path = dataset_path(os.getenv("DATASET"))
+except KeyError as e:
+    print(f"Error: {e.args[0]}")
+    exit()
 
 if not os.path.exists(file_path):
     print(f"Error: The file '{file_path}' was not found. Please make sure it is in the same directory as this script.")
@@ -28,7 +36,9 @@ except Exception as e:
 
 # Initialize the Ollama model
 # Replace 'llama2' with the name of the model you pulled (e.g., 'mistral', 'gemma')
-llm = ChatOllama(model="llama2")
+# (LLM_PROVIDER=fake replays recorded answers instead, see fake_llm.py)
+callbacks = [MetricsCallbackHandler("rego_chatbot_ollama")]
+llm = fake_llm.chat_model(lambda: ChatOllama(model="llama2", callbacks=callbacks), "llama2", callbacks)
 
 # Create the CSV agent
 agent = create_csv_agent(
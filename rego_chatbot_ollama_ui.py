@@ -4,6 +4,8 @@ import os
 from dotenv import load_dotenv
 from langchain_community.chat_models import ChatOllama
 from langchain_core.messages import HumanMessage, AIMessage
+from llm_metrics import MetricsCallbackHandler
+import fake_llm
 
 
 load_dotenv() # Load environment variables from .env file
@@ -57,7 +59,10 @@ def check_and_initialize_chat():
     global llm_chain, chat_history_messages
     if master_csv_content and format_txt_content and llm_chain is None:
         try:
-            llm = ChatOllama(base_url=OLLAMA_BASE_URL, model=OLLAMA_MODEL_NAME, temperature=0)
+            callbacks = [MetricsCallbackHandler("rego_chatbot_ollama_ui")]
+            llm = fake_llm.chat_model(lambda: ChatOllama(base_url=OLLAMA_BASE_URL, model=OLLAMA_MODEL_NAME,
+                                                         temperature=0, callbacks=callbacks),
+                                      OLLAMA_MODEL_NAME, callbacks)
 
             initial_prompt_text = (
                 "You are an expert in generating Rego code based on provided data and a format template.\n"
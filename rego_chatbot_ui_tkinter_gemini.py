@@ -3,13 +3,15 @@ from tkinter import filedialog, scrolledtext, messagebox
 import google.generativeai as genai
 import os
 from dotenv import load_dotenv
+from llm_metrics import gemini_usage, track
+import fake_llm
 
 # --- Configuration ---
 load_dotenv() # Load environment variables from .env file
 
 API_KEY = os.getenv("GEMINI_API_KEY")
 
-if not API_KEY:
+if not API_KEY and not fake_llm.replaying():
     messagebox.showerror("API Key Error", "GEMINI_API_KEY not found. Please set it as an environment variable in a .env file.\nYou can get an API key from Google AI Studio: https://aistudio.google.com/app/apikey")
     exit()
 
@@ -59,7 +61,7 @@ def check_and_initialize_chat():
     global chat_session
     if master_csv_content and format_txt_content and chat_session is None:
         try:
-            model = genai.GenerativeModel('gemini-1.5-flash') # Or 'gemini-1.5-pro-latest'
+            model = fake_llm.generative_model(genai, 'gemini-1.5-flash') # Or 'gemini-1.5-pro-latest'
 
             initial_prompt = (
                 "You are an expert in generating Rego code based on provided data and a format template.\n"
@@ -103,7 +105,9 @@ def send_message():
 
     if chat_session:
         try:
-            response = chat_session.send_message(user_message)
+            with track("rego_chatbot_ui_tkinter_gemini", "gemini", "gemini-1.5-flash") as call:
+                response = chat_session.send_message(user_message)
+                call.set_usage(*gemini_usage(response))
             chat_history.config(state=tk.NORMAL)
             chat_history.insert(tk.END, f"Bot: {response.text}\n\n")
             chat_history.config(state=tk.DISABLED)
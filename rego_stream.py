@@ -0,0 +1,172 @@
+"""
+Incremental extraction of Rego code blocks from streamed LLM output.
+
+The model's answer arrives in chunks that can split lines and fences anywhere. The
+parser keeps only the unfinished last line and emits events as soon as lines are
+complete:
+
+    prose   a line outside any code block
+    open    a Rego code block starts
+    line    a line of Rego code
+    close   the Rego code block ended
+    other   a line of a non-Rego block (e.g. an example input in ```json)
+    error   the answer is malformed or contains no Rego block
+
+Fences can use ``` or ~~~ with any info string. A block counts as Rego if it is tagged
+rego/opa, or if it is untagged (or tagged with something else) and its first line that
+is neither empty nor a '#' comment starts with 'package'. Problems are reported as error events instead of being
+guessed around:
+    - a block still open when the stream ends (its lines were already emitted)
+    - an answer without any Rego block (for example a clarifying question)
+
+Usage:
+    for event in stream_rego(chunks):
+        if event.kind == "line":
+            print(event.text)
+
+    code, problems = extract_rego_code(full_text)
+"""
+
+import re
+from collections import namedtuple
+
+REGO_TAGS = {"rego", "opa"}
+
+# Up to three spaces of indentation, then a fence of 3+ backticks or tildes and an optional info string
+_FENCE_RE = re.compile(r"^ {0,3}(?P<fence>`{3,}|~{3,})[ \t]*(?P<info>.*?)[ \t]*$")
+
+
+class Event(namedtuple("Event", "kind text lang")):
+    """One parser event; text is a line without its newline (or an error message)."""
+
+    __slots__ = ()
+
+    def to_dict(self):
+        return {"kind": self.kind, "text": self.text, "lang": self.lang}
+
+
+class FenceParser:
+    """
+    Splits streamed text into lines and tracks fenced blocks. feed() returns the events
+    for the lines a chunk completed; close() flushes the last line and reports an
+    unterminated block.
+    """
+
+    def __init__(self):
+        self._partial = ""
+        self._fence = None
+        self._lang = None
+        self._opened_at = 0
+        self.line_number = 0
+
+    @property
+    def in_block(self):
+        return self._fence is not None
+
+    def feed(self, chunk):
+        self._partial += chunk
+        *lines, self._partial = self._partial.split("\n")
+        events = []
+        for line in lines:
+            events.append(self._line(line.rstrip("\r")))
+        return events
+
+    def close(self):
+        events = []
+        if self._partial:
+            events.append(self._line(self._partial.rstrip("\r")))
+            self._partial = ""
+        if self._fence is not None:
+            events.append(Event("error", f"The {self._lang or 'untagged'} code block opened on line "
+                                         f"{self._opened_at} is never closed.", self._lang))
+            self._fence = None
+        return events
+
+    def _line(self, line):
+        self.line_number += 1
+        match = _FENCE_RE.match(line)
+        if self._fence is None:
+            if match and not (match["fence"][0] == "`" and "`" in match["info"]):
+                self._fence = match["fence"]
+                self._lang = (match["info"].split() or [""])[0].lower()
+                self._opened_at = self.line_number
+                return Event("fence_open", line, self._lang)
+            return Event("prose", line, None)
+        fence = match["fence"] if match else ""
+        if match and not match["info"] and fence[0] == self._fence[0] and len(fence) >= len(self._fence):
+            lang, self._fence, self._lang = self._lang, None, None
+            return Event("fence_close", line, lang)
+        return Event("code", line, self._lang)
+
+
+def stream_rego(chunks):
+    """
+    Yields Events for a stream of text chunks: the Rego lines as soon as they are
+    complete, prose and non-Rego blocks as context, and error events for problems.
+    """
+    parser = FenceParser()
+    state = {"block": None, "pending": [], "found": False}
+
+    def handle(event):
+        if event.kind == "fence_open":
+            # Tagged blocks are decided at once; others wait for their first line of code
+            state["block"] = "rego" if event.lang in REGO_TAGS else "undecided"
+            state["pending"] = []
+            if state["block"] == "rego":
+                state["found"] = True
+                yield Event("open", "", event.lang)
+        elif event.kind == "code":
+            if state["block"] == "undecided":
+                state["pending"].append(event.text)
+                if not event.text.strip() or event.text.lstrip().startswith("#"):
+                    return  # blank lines and leading comments are held until the block is decided
+                if event.text.lstrip().startswith("package "):
+                    state["block"] = "rego"
+                    state["found"] = True
+                    yield Event("open", "", event.lang or "rego")
+                    for text in state["pending"]:
+                        yield Event("line", text, "rego")
+                else:
+                    state["block"] = "other"
+                    for text in state["pending"]:
+                        yield Event("other", text, event.lang)
+                state["pending"] = []
+            elif state["block"] == "rego":
+                yield Event("line", event.text, "rego")
+            else:
+                yield Event("other", event.text, event.lang)
+        elif event.kind == "fence_close":
+            if state["block"] == "rego":
+                yield Event("close", "", "rego")
+            state["block"] = None
+        else:
+            yield event
+
+    for chunk in chunks:
+        for event in parser.feed(chunk):
+            yield from handle(event)
+    for event in parser.close():
+        yield from handle(event)
+    if not state["found"]:
+        yield Event("error", "The response contains no Rego code block.", None)
+
+
+def extract_rego_code(text):
+    """
+    (code, problems) for a complete response: the Rego blocks joined by blank lines, and
+    the error messages (empty when the response was well formed).
+    """
+    blocks, problems, prose = [], [], []
+    for event in stream_rego([text]):
+        if event.kind == "open":
+            blocks.append([])
+        elif event.kind == "line":
+            blocks[-1].append(event.text)
+        elif event.kind == "error":
+            problems.append(event.text)
+        elif event.kind == "prose":
+            prose.append(event.text)
+    code = "\n\n".join("\n".join(lines).strip("\n") for lines in blocks)
+    if not blocks and prose and any(line.strip() for line in prose):
+        problems.append("Model said: " + " ".join(line.strip() for line in prose if line.strip()))
+    return code, problems
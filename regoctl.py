@@ -0,0 +1,140 @@
+"""
+One entry point for the Rego tools.
+
+    python regoctl.py <command> [arguments]
+
+    web          Flask chat UI (app.py); 'web --prod [--bind ... --workers ...]' runs serve.py
+    cli-agent    LangChain agent over master.csv (rego_chatbot_advanced.py)
+    converse     Gemini conversation that fills in format.txt (llm_rego_converser.py)
+    rag-query    Rego from the slice-policy RAG (rag_slicepolicy/chatbot.py)
+    rag-build    Build or update the slice-policy vector store (rag_slicepolicy/create_vector_store.py)
+    template     Fixed slice policy templates (rego_chatbot.py)
+    graph        Draw the metamodel hierarchy (generate_hierarchy_graph.py)
+    build        Incrementally rebuild the generated policy bundle (policy_build.py)
+
+This module imports only the standard library. The chosen command's script is run
+as __main__ with the remaining arguments, so each command pays only for the
+dependencies it uses: 'template' never loads pandas or LangChain, and
+'rag-query --server' never loads torch.
+Scripts under rag_slicepolicy/ run from that directory, next to their index and data
+files. Root scripts run in the current directory, as with 'python app.py'.
+
+    python regoctl.py --profile <command> [arguments]
+
+runs the command under 'python -X importtime' and then prints the startup time and
+the slowest imports.
+"""
+
+import os
+import runpy
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# command -> (script relative to ROOT, has its own argument parser, summary)
+COMMANDS = {
+    "web": ("app.py", False, "Flask chat UI (development server); --prod runs the gunicorn server (serve.py)"),
+    "cli-agent": ("rego_chatbot_advanced.py", False, "LangChain agent over master.csv with the Rego generation tools"),
+    "converse": ("llm_rego_converser.py", False, "Gemini conversation that fills in format.txt from master.csv"),
+    "rag-query": (os.path.join("rag_slicepolicy", "chatbot.py"), True, "Generate Rego from the slice-policy RAG"),
+    "rag-build": (os.path.join("rag_slicepolicy", "create_vector_store.py"), True,
+                  "Build or update the slice-policy vector store"),
+    "template": ("rego_chatbot.py", True, "Fill in a fixed slice policy template (capacity_check, rantemplate, sfc)"),
+    "graph": ("generate_hierarchy_graph.py", False, "Draw the metamodel type hierarchy"),
+    "build": ("policy_build.py", True, "Re-render the policies affected by edits to master.csv or the slice sheet"),
+}
+
+PROFILE_TOP = 15
+
+
+def usage():
+    lines = ["usage: regoctl.py [--profile] <command> [arguments]", "", "commands:"]
+    lines += [f"  {name:12s} {summary}" for name, (_, _, summary) in COMMANDS.items()]
+    lines += ["", "'regoctl.py <command> --help' shows the arguments of commands that take any."]
+    return "\n".join(lines)
+
+
+def resolve(command, args):
+    """(script path, arguments, whether the script parses its own arguments) for a command line."""
+    script, has_cli, _ = COMMANDS[command]
+    if command == "web" and "--prod" in args:
+        # serve.py takes --bind, --workers and --config
+        script, has_cli = "serve.py", True
+        args = [a for a in args if a != "--prod"]
+    return os.path.join(ROOT, script), args, has_cli
+
+
+def run_script(path, args):
+    """Runs a script as __main__ with the given arguments, as 'python <path> <args>' would."""
+    directory = os.path.dirname(path)
+    if os.path.normcase(directory) != os.path.normcase(ROOT):
+        # Subproject scripts import their siblings and open their data files by relative path
+        os.chdir(directory)
+    sys.path.insert(0, directory)
+    sys.argv = [path] + list(args)
+    runpy.run_path(path, run_name="__main__")
+
+
+# --- Import profile ---
+def parse_importtime(lines):
+    """[(module, self_us, cumulative_us, depth)] from 'python -X importtime' output."""
+    imports = []
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(fields[0]), int(fields[1]), depth))
+    return imports
+
+
+def print_profile(imports, wall_seconds, top=PROFILE_TOP):
+    total = sum(self_us for _, self_us, _, _ in imports)
+    print(f"\n--- Import profile: {wall_seconds * 1000:.0f}ms wall, {total / 1000:.0f}ms in {len(imports)} imports ---",
+          file=sys.stderr)
+    print(f"{'cumulative':>12s} {'self':>9s}  module (top-level imports)", file=sys.stderr)
+    for name, self_us, cumulative_us, _ in sorted((i for i in imports if i[3] == 0), key=lambda i: -i[2])[:top]:
+        print(f"{cumulative_us / 1000:10.1f}ms {self_us / 1000:7.1f}ms  {name}", file=sys.stderr)
+
+
+def profile(command_line):
+    """Runs regoctl with the command under -X importtime and reports where startup went."""
+    import subprocess
+
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-X", "importtime", os.path.abspath(__file__)] + command_line,
+                               stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - start
+    other = [line for line in completed.stderr.splitlines() if not line.startswith("import time:")]
+    if other:
+        print("\n".join(other), file=sys.stderr)
+    print_profile(parse_importtime(completed.stderr.splitlines()), wall)
+    return completed.returncode
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if argv and argv[0] == "--profile":
+        return profile(argv[1:])
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    command, args = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"Error: unknown command '{command}'.\n\n{usage()}")
+        return 2
+    path, args, has_cli = resolve(command, args)
+    if not has_cli and any(a in ("-h", "--help") for a in args):
+        print(f"regoctl.py {command}: {COMMANDS[command][2]}\n"
+              f"Runs {os.path.relpath(path, ROOT)}; it takes no arguments.")
+        return 0
+    run_script(path, args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+# serve.py
+"""
+Production entry point for app.py: a gunicorn prefork server with the app preloaded in
+the master process (settings in gunicorn.conf.py).
+
+Usage:
+    python serve.py
+    python serve.py --bind 0.0.0.0:8080 --workers 8
+
+Readiness: GET /ready returns 200 once master.csv is loaded.
+"""
+import argparse
+import os
+import runpy
+
+from gunicorn.app.base import BaseApplication
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+
+
+class AppServer(BaseApplication):
+    """Runs app:app under gunicorn with the settings of gunicorn.conf.py plus command line overrides."""
+
+    def __init__(self, options=None, config_path=CONFIG_PATH):
+        self.options = options or {}
+        self.config_path = config_path
+        super().__init__()
+
+    def load_config(self):
+        settings = {}
+        if self.config_path and os.path.exists(self.config_path):
+            settings = runpy.run_path(self.config_path)
+        settings.update({key: value for key, value in self.options.items() if value is not None})
+        for key, value in settings.items():
+            if key in self.cfg.settings:
+                self.cfg.set(key, value)
+
+    def load(self):
+        # With preload_app this runs once, in the master, before the workers are forked
+        from app import app
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve app.py with gunicorn (preloaded, multi-worker).")
+    parser.add_argument('--bind', help="Address to listen on (default from gunicorn.conf.py / BIND).")
+    parser.add_argument('--workers', type=int, help="Number of worker processes (default from WEB_CONCURRENCY).")
+    parser.add_argument('--config', default=CONFIG_PATH, help="gunicorn configuration file.")
+    args = parser.parse_args()
+
+    # Relative paths in app.py (master.csv, metamodel_index.json) are resolved from here
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    AppServer({'bind': args.bind, 'workers': args.workers}, args.config).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -27,7 +27,9 @@ document.addEventListener('DOMContentLoaded', () => {
             .then(data => {
                 appendMessage('bot', data.response);
                 if (data.rego_policy) {
-                    appendMessage('bot', `<pre>${data.rego_policy}</pre>`);
+                    appendPolicy(data.rego_policy);
+                } else if (data.download) {
+                    appendDownloadLinks(data.download);
                 } else if (data.message) { // If there's a message to re-send (e.g., extracted entity)
                     // Simulate sending the extracted message back to the bot
                     setTimeout(() => {
@@ -38,13 +40,40 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    function appendMessage(sender, message) {
+    function appendElement(sender, child) {
         const messageElement = document.createElement('div');
         messageElement.classList.add('chat-message', `${sender}-message`);
-        const p = document.createElement('p');
-        p.innerHTML = message; // Use innerHTML to render <pre> tags
-        messageElement.appendChild(p);
+        messageElement.appendChild(child);
         chatBox.appendChild(messageElement);
         chatBox.scrollTop = chatBox.scrollHeight;
     }
+
+    function appendMessage(sender, message) {
+        const p = document.createElement('p');
+        p.textContent = message; // Messages are plain text; nothing in them is parsed as HTML
+        appendElement(sender, p);
+    }
+
+    function appendPolicy(policy) {
+        const pre = document.createElement('pre');
+        pre.textContent = policy;
+        appendElement('bot', pre);
+    }
+
+    function appendDownloadLinks(links) {
+        // Large policies are streamed from /download instead of being inlined in the chat
+        const p = document.createElement('p');
+        p.append('Download: ');
+        Object.entries(links).forEach(([format, url], i) => {
+            if (i > 0) {
+                p.append(' | ');
+            }
+            const a = document.createElement('a');
+            a.href = url;
+            a.textContent = format;
+            a.setAttribute('download', '');
+            p.appendChild(a);
+        });
+        appendElement('bot', p);
+    }
 });
\ No newline at end of file
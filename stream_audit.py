@@ -0,0 +1,234 @@
+"""
+Streaming audit of large parameter exports against the master.csv rules.
+
+The export (.csv with a header row, or JSON lines) is read as raw blocks of --chunk-rows
+records. Blocks are parsed and checked in a process pool, and at most 2 * workers blocks
+are in flight, so memory stays flat however large the export is. Each block keeps only
+the rules for the MO Types it contains, and only the columns those rules read. Violations
+are appended to the output file as blocks finish, in export order, and a running summary
+is printed.
+
+Usage:
+    python stream_audit.py export.csv --out violations.csv --workers 8
+    python stream_audit.py export.jsonl --out violations.jsonl --summary summary.json
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from consistency_bundle import CSV_PATH
+from consistency_checker import RuleSet
+
+DEFAULT_CHUNK_ROWS = 50000
+
+# --- Reading ---
+def export_kind(path):
+    return "jsonl" if path.lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def iter_blocks(path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Yields (header, text, first_row) blocks of raw records. CSV blocks never end inside
+    a quoted field, so a value containing a newline stays in one block.
+    """
+    kind = export_kind(path)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        header = f.readline() if kind == "csv" else None
+        lines, quotes, first_row, rows = [], 0, 0, 0
+        for line in f:
+            if not line.strip() and not quotes % 2:
+                continue
+            lines.append(line)
+            if kind == "csv":
+                quotes += line.count('"')
+                if quotes % 2:
+                    continue
+            rows += 1
+            if rows >= chunk_rows:
+                yield header, "".join(lines), first_row
+                first_row += rows
+                lines, quotes, rows = [], 0, 0
+        if lines:
+            yield header, "".join(lines), first_row
+
+
+def parse_block(kind, header, text):
+    if kind == "csv":
+        return pd.read_csv(io.StringIO(header + text), dtype=str, keep_default_na=False, na_values=[""])
+    return pd.DataFrame.from_records([json.loads(line) for line in text.splitlines() if line.strip()])
+
+
+# --- Checking (runs in the pool workers) ---
+_worker_rules = None
+_worker_options = None
+
+
+def _init_worker(rules_path, options):
+    global _worker_rules, _worker_options
+    _worker_rules = RuleSet.from_csv(rules_path)
+    _worker_options = options
+
+
+def _audit_block(kind, header, text, first_row):
+    """Parses and checks one block. Returns (violations, rows, rows per MO Type)."""
+    options = _worker_options
+    instances = parse_block(kind, header, text)
+    mo_column = options["mo_type_column"]
+    if instances.empty or mo_column not in instances.columns:
+        return None, len(instances), Counter()
+    mo_counts = Counter(instances[mo_column].astype(str).str.strip())
+
+    # Only the rules for this block's MO Types, and only the columns they read
+    rules = _worker_rules.subset(mo_counts)
+    wanted = {mo_column, options["vendor_column"], options["id_column"]}
+    wanted |= {attribute for attributes in rules.rules.values() for attribute in attributes}
+    instances = instances[[c for c in instances.columns if c in wanted]]
+
+    violations = rules.check(instances, mo_column, options["vendor_column"], options["id_column"], first_row)
+    return (violations if not violations.empty else None), len(instances), mo_counts
+
+
+# --- Output ---
+class ViolationWriter:
+    """Appends violation frames to a .csv (header once) or .jsonl file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.jsonl = export_kind(path) == "jsonl"
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        self._header_written = False
+
+    def write(self, violations):
+        if self.jsonl:
+            if not violations.empty:
+                # Older pandas leaves off the final newline, newer pandas writes it; write exactly one
+                text = violations.to_json(orient="records", lines=True, force_ascii=False)
+                self._file.write(text if text.endswith("\n") else text + "\n")
+        else:
+            violations.to_csv(self._file, index=False, header=not self._header_written, quoting=csv.QUOTE_MINIMAL)
+            self._header_written = True
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class AuditSummary:
+    """Running totals: rows, violations, and violations per MO Type and per attribute."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows = 0
+        self.violations = 0
+        self.rows_by_mo_type = Counter()
+        self.by_mo_type = Counter()
+        self.by_attribute = Counter()
+
+    def add(self, violations, rows, mo_counts):
+        self.rows += rows
+        self.rows_by_mo_type.update(mo_counts)
+        if violations is not None:
+            self.violations += len(violations)
+            self.by_mo_type.update(violations["mo_type"].astype(str).value_counts().to_dict())
+            self.by_attribute.update((violations["mo_type"].astype(str) + "." + violations["attribute"].astype(str))
+                                     .value_counts().to_dict())
+
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.rows / elapsed if elapsed else 0.0
+
+    def progress_line(self):
+        return f"{self.rows:,} rows, {self.violations:,} violations, {self.rate():,.0f} rows/s"
+
+    def to_dict(self, top=20):
+        return {
+            "rows": self.rows,
+            "violations": self.violations,
+            "seconds": round(time.perf_counter() - self.started, 3),
+            "rows_per_second": round(self.rate(), 1),
+            "rows_by_mo_type": dict(self.rows_by_mo_type.most_common()),
+            "violations_by_mo_type": dict(self.by_mo_type.most_common()),
+            "top_attributes": dict(self.by_attribute.most_common(top)),
+        }
+
+
+def audit(export_path, out_path, rules_path=CSV_PATH, chunk_rows=DEFAULT_CHUNK_ROWS, workers=1,
+          mo_type_column="MO Type", vendor_column="Vendor", id_column=None, progress=True):
+    """Audits the export and writes the violations to out_path. Returns the AuditSummary."""
+    kind = export_kind(export_path)
+    options = {"mo_type_column": mo_type_column, "vendor_column": vendor_column, "id_column": id_column}
+    summary = AuditSummary()
+    writer = ViolationWriter(out_path)
+
+    def record(result):
+        violations, rows, mo_counts = result
+        summary.add(violations, rows, mo_counts)
+        if violations is not None:
+            writer.write(violations)
+        if progress:
+            print(summary.progress_line(), end="\r", file=sys.stderr, flush=True)
+
+    try:
+        if workers <= 1:
+            _init_worker(rules_path, options)
+            for header, text, first_row in iter_blocks(export_path, chunk_rows):
+                record(_audit_block(kind, header, text, first_row))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(rules_path, options)) as executor:
+                pending = deque()
+                for header, text, first_row in iter_blocks(export_path, chunk_rows):
+                    pending.append(executor.submit(_audit_block, kind, header, text, first_row))
+                    if len(pending) >= 2 * workers:
+                        record(pending.popleft().result())
+                while pending:
+                    record(pending.popleft().result())
+    finally:
+        writer.close()
+    if progress:
+        print(file=sys.stderr)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a parameter export through the master.csv rules.")
+    parser.add_argument("export", help="Parameter export: .csv with a header row, or .jsonl/.ndjson.")
+    parser.add_argument("--out", default="violations.csv", help="Violations output (.csv or .jsonl).")
+    parser.add_argument("--rules", default=CSV_PATH, help="Rule sheet.")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Records per block.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Checker processes.")
+    parser.add_argument("--mo-type-column", default="MO Type")
+    parser.add_argument("--vendor-column", default="Vendor")
+    parser.add_argument("--id-column", default=None, help="Column identifying an instance (e.g. a DN).")
+    parser.add_argument("--summary", help="Also write the final summary to this JSON file.")
+    parser.add_argument("--quiet", action="store_true", help="No running progress line.")
+    args = parser.parse_args()
+
+    for path in (args.export, args.rules):
+        if not os.path.exists(path):
+            print(f"Error: The file '{path}' was not found.")
+            return
+
+    summary = audit(args.export, args.out, args.rules, args.chunk_rows, args.workers, args.mo_type_column,
+                    args.vendor_column, args.id_column, progress=not args.quiet)
+    result = summary.to_dict()
+    print(f"Audited {result['rows']:,} rows in {result['seconds']:.2f}s ({result['rows_per_second']:,.0f} rows/s): "
+          f"{result['violations']:,} violations written to {args.out}.")
+    for mo_type, count in list(result["violations_by_mo_type"].items())[:10]:
+        print(f"  {mo_type}: {count:,} violations in {result['rows_by_mo_type'].get(mo_type, 0):,} rows")
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,9 @@ from langchain.agents.agent_types import AgentType
 from langchain_experimental.agents.agent_toolkits import create_csv_agent
 from langchain_groq import ChatGroq
 from dotenv import load_dotenv
+from llm_coalesce import coalesced_call
+from llm_metrics import MetricsCallbackHandler, track
+import fake_llm
 
 load_dotenv()
 
@@ -30,7 +33,10 @@ if os.path.exists(file_path):
     st.success(f"File '{file_path}' loaded successfully!")
 
     # Initialize the Groq model
-    llm = ChatGroq(temperature=0, model_name="llama3-70b-8192", groq_api_key=groq_api_key)
+    model_name = "llama3-70b-8192"
+    callbacks = [MetricsCallbackHandler("streamlit_app")]
+    llm = fake_llm.chat_model(lambda: ChatGroq(temperature=0, model_name=model_name, groq_api_key=groq_api_key,
+                                               callbacks=callbacks), model_name, callbacks)
 
     # Create the CSV agent
     agent = create_csv_agent(
@@ -53,7 +59,10 @@ if os.path.exists(file_path):
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
                 try:
-                    response = agent.run(prompt)
+                    # Sessions asking the same question at the same time share one agent run
+                    with track("streamlit_app", "groq", model_name, kind="request") as call:
+                        response = coalesced_call(prompt, f"groq/{model_name}", call.wrap(lambda: agent.run(prompt)),
+                                                  agent="csv", file=file_path)
                     st.markdown(response)
                     # Add assistant response to chat history
                     st.session_state.messages.append({"role": "assistant", "content": response})